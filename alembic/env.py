@@ -10,6 +10,11 @@ from app.db import Base
 # Import models to register them with Base
 from app.models.user import User
 from app.models.recording import Recording
+from app.models.upload_session import UploadSession
+from app.models.recording_stage import RecordingStage
+from app.models.reprocess_batch import ReprocessBatch
+from app.models.summary_cache import SummaryCache
+from app.models.chat_session import ChatSession, ChatMessage
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any, List, Literal
 
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
@@ -6,8 +6,15 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import get_current_admin_user
 from app.models.user import User
-from app.schemas.admin import AdminStats
+from app.schemas.admin import (
+    AdminStats,
+    PipelineMetrics,
+    QueueOverview,
+    ReprocessBatchCreate,
+    ReprocessBatchResponse,
+)
 from app.schemas.auth import UserAdminResponse, UserCreate, UserUpdate
+from app.services import reprocess_service
 from app.services.admin_service import AdminService
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -96,3 +103,74 @@ def get_admin_stats(
     Get admin dashboard statistics.
     """
     return AdminService.get_admin_stats(db)
+
+
+@router.get("/metrics", response_model=PipelineMetrics)
+def get_pipeline_metrics(
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Get pipeline metrics (stage handoff sizes, ...).
+    """
+    return AdminService.get_pipeline_metrics()
+
+
+@router.get("/queues", response_model=QueueOverview)
+def get_queue_stats(
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Get task queue depth and wait times, to size worker pools per stage.
+    """
+    return AdminService.get_queue_stats()
+
+
+@router.post("/reprocess", response_model=ReprocessBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_reprocess_batch(
+    *,
+    db: Session = Depends(get_db),
+    batch_in: ReprocessBatchCreate,
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Re-run pipeline stages on the recordings matching the filters, at a limited rate.
+    """
+    return reprocess_service.create_batch(db=db, payload=batch_in, user_id=current_user.id)
+
+
+@router.get("/reprocess", response_model=List[ReprocessBatchResponse])
+def get_reprocess_batches(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Get reprocess batches and their progress.
+    """
+    return reprocess_service.get_batches(db)
+
+
+@router.get("/reprocess/{batch_id}", response_model=ReprocessBatchResponse)
+def get_reprocess_batch(
+    *,
+    db: Session = Depends(get_db),
+    batch_id: int,
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Get reprocess batch progress.
+    """
+    return reprocess_service.get_batch(db, batch_id)
+
+
+@router.post("/reprocess/{batch_id}/{action}", response_model=ReprocessBatchResponse)
+def update_reprocess_batch(
+    *,
+    db: Session = Depends(get_db),
+    batch_id: int,
+    action: Literal["pause", "resume", "cancel"],
+    current_user: User = Depends(get_current_admin_user),
+) -> Any:
+    """
+    Pause, resume or cancel a reprocess batch.
+    """
+    return reprocess_service.set_batch_state(db, batch_id, action)
@@ -16,9 +16,9 @@ class ChatResponse(BaseModel):
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_endpoint(payload: ChatRequest):
+async def chat_endpoint(payload: ChatRequest):
     try:
-        result = chat_service.chat(payload.message, payload.history)
+        result = await chat_service.achat(payload.message, payload.history)
         return ChatResponse(response=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
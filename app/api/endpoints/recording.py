@@ -1,19 +1,35 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Body
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.schemas.recording import (
     RecordingResponse,
+    RecordingStageResponse,
     RecordingUpdate,
 )
+from app.schemas.upload import (
+    PresignedUploadComplete,
+    PresignedUploadCreate,
+    PresignedUploadResponse,
+    UploadPartInfo,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.schemas.chat import ChatMessageResponse, ChatSessionCreate, ChatSessionResponse
+from app.services import chat_session_service, upload_service
 from app.services.recording_service import (
     delete_recording,
     get_recording,
+    get_recording_stages,
     get_recordings,
+    retry_recording,
     save_uploaded_file,
+    stream_chat_with_recording_transcription,
+    stream_recording_progress,
     update_recording,
     chat_with_recording_transcription,
 )
@@ -25,13 +41,104 @@ router = APIRouter(prefix="/recordings", tags=["recordings"])
 
 
 # Upload binary audio file and return filename
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/",
+    status_code=status.HTTP_201_CREATED,
+    # The body is parsed by hand as it streams in; describe the form for the docs
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return await save_uploaded_file(db=db, request=request, user_id=current_user.id)
+
+
+# Resumable chunked upload: create session, PUT chunks, check offset, complete
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    payload: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return await upload_service.create_upload_session(db=db, user_id=current_user.id, payload=payload)
+
+
+@router.put("/uploads/{session_id}/chunks/{part_number}", response_model=UploadPartInfo)
+async def upload_chunk(
+    session_id: int,
+    part_number: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return await upload_service.upload_chunk(
+        db=db,
+        session_id=session_id,
+        user_id=current_user.id,
+        part_number=part_number,
+        body=request.stream(),
+    )
+
+
+@router.get("/uploads/{session_id}", response_model=UploadSessionResponse)
+async def read_upload(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return await upload_service.get_upload_session(db=db, session_id=session_id, user_id=current_user.id)
+
+
+@router.post("/uploads/{session_id}/complete", response_model=RecordingResponse, status_code=status.HTTP_201_CREATED)
+async def complete_upload(
+    session_id: int,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    return await save_uploaded_file(db=db, file=file, user_id=current_user.id)
+    return await upload_service.complete_upload_session(db=db, session_id=session_id, user_id=current_user.id)
+
+
+@router.delete("/uploads/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    await upload_service.abort_upload_session(db=db, session_id=session_id, user_id=current_user.id)
+    return None
+
+
+# Direct-to-MinIO upload: get a presigned PUT URL, upload, then report completion
+@router.post("/presigned", response_model=PresignedUploadResponse)
+async def create_presigned_upload(
+    payload: PresignedUploadCreate,
+    current_user=Depends(get_current_user),
+):
+    return await upload_service.create_presigned_upload(user_id=current_user.id, payload=payload)
+
+
+@router.post("/presigned/complete", response_model=RecordingResponse, status_code=status.HTTP_201_CREATED)
+async def complete_presigned_upload(
+    payload: PresignedUploadComplete,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return await upload_service.complete_presigned_upload(db=db, user_id=current_user.id, payload=payload)
 
 
 @router.get("/", response_model=List[RecordingResponse])
@@ -82,13 +189,51 @@ async def delete(
     return None
 
 
+@router.get("/{recording_id}/stages", response_model=List[RecordingStageResponse])
+async def read_stages(
+    recording_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return get_recording_stages(db=db, recording_id=recording_id, user_id=current_user.id)
+
+
+@router.post("/{recording_id}/retry", response_model=RecordingResponse)
+async def retry(
+    recording_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return retry_recording(db=db, recording_id=recording_id, user_id=current_user.id)
+
+
+@router.get("/{recording_id}/events")
+async def stream_events(
+    recording_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Live pipeline progress as Server-Sent Events, instead of polling the recording"""
+    events = stream_recording_progress(db=db, recording_id=recording_id, user_id=current_user.id)
+    # The stream can stay open for the whole pipeline; don't hold a DB connection meanwhile
+    db.close()
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class RecordingChatRequest(BaseModel):
     message: str
+    # Either the previous turns, or a chat session whose history the server keeps
     history: list = []
+    session_id: Optional[int] = None
 
 
 class RecordingChatResponse(BaseModel):
     response: str
+    session_id: Optional[int] = None
 
 
 @router.post("/{recording_id}/chat", response_model=RecordingChatResponse)
@@ -104,4 +249,70 @@ async def chat_with_recording(
         user_id=current_user.id,
         message=payload.message,
         history=payload.history,
+        session_id=payload.session_id,
     )
+
+
+@router.post("/{recording_id}/chat/stream")
+async def stream_chat_with_recording(
+    recording_id: int,
+    payload: RecordingChatRequest = Body(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Chat with a recording, streaming the answer as Server-Sent Events"""
+    events = await stream_chat_with_recording_transcription(
+        db=db,
+        recording_id=recording_id,
+        user_id=current_user.id,
+        message=payload.message,
+        history=payload.history,
+        session_id=payload.session_id,
+    )
+    # Context is retrieved already; don't hold a DB connection while the model talks
+    db.close()
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{recording_id}/chat/sessions", response_model=ChatSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_chat_session(
+    recording_id: int,
+    payload: Optional[ChatSessionCreate] = Body(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return chat_session_service.create_session(db, recording_id, current_user.id, payload or ChatSessionCreate())
+
+
+@router.get("/{recording_id}/chat/sessions", response_model=List[ChatSessionResponse])
+async def read_chat_sessions(
+    recording_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return chat_session_service.get_sessions(db, recording_id, current_user.id)
+
+
+@router.get("/{recording_id}/chat/sessions/{session_id}/messages", response_model=List[ChatMessageResponse])
+async def read_chat_messages(
+    recording_id: int,
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    return chat_session_service.get_messages(db, recording_id, current_user.id, session_id)
+
+
+@router.delete("/{recording_id}/chat/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_chat_session(
+    recording_id: int,
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    chat_session_service.delete_session(db, recording_id, current_user.id, session_id)
+    return None
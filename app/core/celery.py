@@ -1,15 +1,26 @@
 import os
+import time
 
 from celery import Celery
+from celery.signals import before_task_publish, task_prerun
+from kombu import Queue
+
+from app.core.config import settings
 
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
+# One queue per kind of work so worker pools can be sized per stage, e.g.
+#   celery -A app.core.celery worker -Q transcription --concurrency=2
+#   celery -A app.core.celery worker -Q summarization,indexing,maintenance
+# A worker started without -Q consumes all of them.
+QUEUES = ["transcription", "summarization", "indexing", "maintenance"]
+
 celery = Celery(
     "sercuescribe",
     broker=CELERY_BROKER_URL,
     backend=CELERY_RESULT_BACKEND,
-    include=["app.tasks.audio_tasks"],
+    include=["app.tasks.audio_tasks", "app.tasks.maintenance_tasks"],
 )
 # Configure Celery
 celery.conf.update(
@@ -22,9 +33,75 @@ celery.conf.update(
     task_time_limit=24 * 60 * 60,  # 24 hours
     task_soft_time_limit=24 * 60 * 60,  # 24 hours
     worker_prefetch_multiplier=1,
+    # Ack after the task ran, so a worker crash redelivers it instead of losing
+    # it; pipeline stages are leased and idempotent (see app/tasks/pipeline.py)
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    broker_transport_options={"visibility_timeout": settings.broker_visibility_timeout_seconds},
     worker_max_tasks_per_child=1000,
+    task_queues=[Queue(name) for name in QUEUES],
+    task_default_queue="maintenance",
+    task_routes={
+        "app.tasks.audio_tasks.transcribe_audio_task": {"queue": "transcription"},
+        "app.tasks.audio_tasks.transcribe_audio_asr_task": {"queue": "transcription"},
+        "app.tasks.audio_tasks.index_recording_task": {"queue": "indexing"},
+        "app.tasks.audio_tasks.generate_summary_task": {"queue": "summarization"},
+        "app.tasks.maintenance_tasks.*": {"queue": "maintenance"},
+    },
+    beat_schedule={
+        "dispatch-fair-queue": {
+            "task": "app.tasks.maintenance_tasks.dispatch_fair_queue_task",
+            "schedule": settings.fair_dispatch_interval_seconds,
+        },
+        "advance-reprocess-batches": {
+            "task": "app.tasks.maintenance_tasks.advance_reprocess_batches_task",
+            "schedule": settings.reprocess_interval_seconds,
+        },
+        "prune-summary-cache": {
+            "task": "app.tasks.maintenance_tasks.prune_summary_cache_task",
+            "schedule": 60 * 60,
+        },
+    },
 )
 
+# Async mode: pipeline stages mostly wait on ASR/LLM HTTP calls, so run many of
+# them per process on threads that share the worker event loop instead of one
+# per prefork child. The thread count caps how many are in flight at once.
+# The threads pool cannot kill a thread, so task_time_limit and
+# task_soft_time_limit are not enforced in this mode; the AI call timeouts
+# (app/utils/resilience.py) are what bound a stuck task.
+if settings.worker_async_mode:
+    celery.conf.update(
+        worker_pool="threads",
+        worker_concurrency=settings.worker_async_concurrency,
+    )
+
+
+@before_task_publish.connect
+def _stamp_enqueue_time(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@task_prerun.connect
+def _record_queue_wait(task=None, **kwargs):
+    """Count how long each task waited in its queue before a worker picked it up"""
+    from app.utils import metrics
+
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    queue = (task.request.delivery_info or {}).get("routing_key")
+    if enqueued_at is None or queue not in QUEUES:
+        return
+    metrics.incr(f"queue.{queue}.started")
+    metrics.incr(f"queue.{queue}.wait_seconds", max(time.time() - float(enqueued_at), 0.0))
+
+
+def queue_depths() -> dict:
+    """Messages waiting in each broker queue"""
+    with celery.connection_for_read() as conn:
+        client = conn.default_channel.client
+        return {name: client.llen(name) for name in QUEUES}
+
 
 # Example simple task
 def add(x: int, y: int) -> int:
@@ -30,6 +30,116 @@ class Settings(BaseSettings):
     # ASR Settings
     asr_diarize: Optional[bool] = None if os.getenv("ASR_DIARIZE") is None else os.getenv("ASR_DIARIZE").lower() == "true"
     use_asr_endpoint: bool = os.getenv("USE_ASR_ENDPOINT", "true").lower() == "true"
+    # Transcode uploads to compact mono speech audio before sending them to ASR
+    asr_normalize_audio: bool = os.getenv("ASR_NORMALIZE_AUDIO", "true").lower() == "true"
+    asr_normalize_codec: str = os.getenv("ASR_NORMALIZE_CODEC", "opus")  # opus or flac
+    asr_normalize_sample_rate: int = int(os.getenv("ASR_NORMALIZE_SAMPLE_RATE", "16000"))
+    asr_opus_bitrate: str = os.getenv("ASR_OPUS_BITRATE", "32k")
+    # Voice activity detection: drop long silences before ASR
+    vad_enabled: bool = os.getenv("VAD_ENABLED", "true").lower() == "true"
+    vad_threshold_db: float = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+    vad_min_energy_db: float = float(os.getenv("VAD_MIN_ENERGY_DB", "-55"))
+    vad_padding_ms: int = int(os.getenv("VAD_PADDING_MS", "300"))
+    vad_min_silence_ms: int = int(os.getenv("VAD_MIN_SILENCE_MS", "1500"))
+    # Skip trimming when it would remove less than this share of the audio
+    vad_min_removed_ratio: float = float(os.getenv("VAD_MIN_REMOVED_RATIO", "0.05"))
+    # Chunked transcription: split long audio and transcribe chunks concurrently
+    asr_chunked_enabled: bool = os.getenv("ASR_CHUNKED_ENABLED", "true").lower() == "true"
+    asr_chunk_max_seconds: float = float(os.getenv("ASR_CHUNK_MAX_SECONDS", "600"))
+    asr_chunk_overlap_seconds: float = float(os.getenv("ASR_CHUNK_OVERLAP_SECONDS", "5"))
+    asr_chunk_concurrency: int = int(os.getenv("ASR_CHUNK_CONCURRENCY", "4"))
+    asr_chunk_retries: int = int(os.getenv("ASR_CHUNK_RETRIES", "2"))
+
+    # Outbound HTTP pool shared by the AI services
+    http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", "32"))
+    http_keepalive_seconds: float = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+
+    # Async worker mode: one process runs many I/O-bound tasks on a thread
+    # pool that shares the worker event loop; the concurrency is the number of
+    # threads. Celery's task time limits are not enforced under a threads pool.
+    worker_async_mode: bool = os.getenv("WORKER_ASYNC_MODE", "false").lower() == "true"
+    worker_async_concurrency: int = int(os.getenv("WORKER_ASYNC_CONCURRENCY", "32"))
+
+    # Per-user fair scheduling of transcriptions (see app/utils/fair_queue.py)
+    fair_scheduling_enabled: bool = os.getenv("FAIR_SCHEDULING_ENABLED", "true").lower() == "true"
+    # Transcription tasks allowed to wait in the broker queue; the rest wait per user
+    fair_dispatch_queue_depth: int = int(os.getenv("FAIR_DISPATCH_QUEUE_DEPTH", "4"))
+    fair_dispatch_interval_seconds: float = float(os.getenv("FAIR_DISPATCH_INTERVAL_SECONDS", "5"))
+    # Recordings up to this long go first within a user's queue (0 disables)
+    fair_short_priority_seconds: int = int(os.getenv("FAIR_SHORT_PRIORITY_SECONDS", "0"))
+
+    # Cluster-wide concurrent calls per external backend (0 = unlimited)
+    limit_asr_concurrency: int = int(os.getenv("LIMIT_ASR_CONCURRENCY", "4"))
+    limit_transcription_concurrency: int = int(os.getenv("LIMIT_TRANSCRIPTION_CONCURRENCY", "4"))
+    limit_summary_concurrency: int = int(os.getenv("LIMIT_SUMMARY_CONCURRENCY", "4"))
+    limit_llm_concurrency: int = int(os.getenv("LIMIT_LLM_CONCURRENCY", "2"))
+    limiter_lease_seconds: float = float(os.getenv("LIMITER_LEASE_SECONDS", "60"))
+    limiter_poll_max_seconds: float = float(os.getenv("LIMITER_POLL_MAX_SECONDS", "2"))
+
+    # AI backend timeouts (see app/utils/resilience.py); transcription calls get
+    # base + audio seconds * factor, capped at the max
+    ai_timeout_base_seconds: float = float(os.getenv("AI_TIMEOUT_BASE_SECONDS", "60"))
+    ai_timeout_realtime_factor: float = float(os.getenv("AI_TIMEOUT_REALTIME_FACTOR", "0.5"))
+    ai_timeout_max_seconds: float = float(os.getenv("AI_TIMEOUT_MAX_SECONDS", "3600"))
+    summary_timeout_seconds: float = float(os.getenv("SUMMARY_TIMEOUT_SECONDS", "600"))
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+    # Retries of transient backend errors (timeouts, connection errors, 429/5xx)
+    ai_retries: int = int(os.getenv("AI_RETRIES", "2"))
+    ai_retry_base_seconds: float = float(os.getenv("AI_RETRY_BASE_SECONDS", "2"))
+    # Circuit breaker: open after this many failures within the window, fail fast
+    # for the cooldown, and requeue tasks up to breaker_max_requeues times
+    breaker_failure_threshold: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    breaker_failure_window_seconds: float = float(os.getenv("BREAKER_FAILURE_WINDOW_SECONDS", "120"))
+    breaker_cooldown_seconds: float = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "60"))
+    breaker_max_requeues: int = int(os.getenv("BREAKER_MAX_REQUEUES", "30"))
+
+    # Only one execution of a pipeline stage per recording at a time; the lease
+    # is renewed while the stage runs and expires this long after a crash
+    stage_lease_seconds: int = int(os.getenv("STAGE_LEASE_SECONDS", "60"))
+    # Requeues of a duplicate delivery waiting for that lease, about one per
+    # lease period (counted apart from breaker_max_requeues)
+    lease_max_requeues: int = int(os.getenv("LEASE_MAX_REQUEUES", "720"))
+    # Unacknowledged tasks are redelivered after this long (acks are late, so
+    # keep it above the longest task)
+    broker_visibility_timeout_seconds: int = int(os.getenv("BROKER_VISIBILITY_TIMEOUT_SECONDS", str(6 * 60 * 60)))
+
+    # Threads for blocking Qdrant, embedding and DB calls on the API's chat path
+    # (per process); extra calls wait for a free thread
+    blocking_pool_size: int = int(os.getenv("BLOCKING_POOL_SIZE", "8"))
+
+    # Chat answers reused for similar questions about the same recording
+    # (cosine similarity of the question embeddings, see app/utils/answer_cache.py)
+    chat_answer_cache_enabled: bool = os.getenv("CHAT_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    chat_answer_cache_threshold: float = float(os.getenv("CHAT_ANSWER_CACHE_THRESHOLD", "0.95"))
+    chat_answer_cache_ttl_seconds: int = int(os.getenv("CHAT_ANSWER_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+    chat_answer_cache_max_entries: int = int(os.getenv("CHAT_ANSWER_CACHE_MAX_ENTRIES", "200"))
+
+    # Chat sessions: past turns sent to the model are limited to this many
+    # (estimated) tokens; older turns are folded into a running summary
+    chat_history_token_budget: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+    chat_summary_max_words: int = int(os.getenv("CHAT_SUMMARY_MAX_WORDS", "150"))
+
+    # Chat re-queues a recording's failed index at most once per this many seconds
+    chat_index_retry_seconds: int = int(os.getenv("CHAT_INDEX_RETRY_SECONDS", "300"))
+
+    # How often running reprocess batches queue their next recordings
+    reprocess_interval_seconds: float = float(os.getenv("REPROCESS_INTERVAL_SECONDS", "30"))
+
+    # Database connection pool (per process)
+    database_pool_size: int = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+    database_max_overflow: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
+    # Map-reduce summarization: summarize windows of whole speaker turns, then
+    # merge the partial summaries; partials are cached by content
+    summary_chunked_enabled: bool = os.getenv("SUMMARY_CHUNKED_ENABLED", "true").lower() == "true"
+    summary_window_chars: int = int(os.getenv("SUMMARY_WINDOW_CHARS", "12000"))
+    summary_map_concurrency: int = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+    summary_partial_ttl_seconds: int = int(os.getenv("SUMMARY_PARTIAL_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+    # Final summaries cached in the DB by transcript and summarizer request; bump
+    # the version when the model behind the endpoint changes to stop reusing old ones
+    summary_model_version: str = os.getenv("SUMMARY_MODEL_VERSION", "1")
+    summary_cache_ttl_days: int = int(os.getenv("SUMMARY_CACHE_TTL_DAYS", "90"))
+    summary_cache_max_mb: int = int(os.getenv("SUMMARY_CACHE_MAX_MB", "256"))
 
     # Redis Configuration
     redis_url: str = os.getenv("REDIS_URL", "redis://redis:6379")
@@ -44,6 +154,17 @@ class Settings(BaseSettings):
     minio_secret_key: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     minio_secure: bool = os.getenv("MINIO_SECURE", "false").lower() == "true"
     minio_bucket_prefix: str = os.getenv("MINIO_BUCKET_PREFIX", "sercuescribe")
+    # Host clients use for presigned URLs, defaults to minio_endpoint
+    minio_public_endpoint: Optional[str] = os.getenv("MINIO_PUBLIC_ENDPOINT")
+    minio_public_secure: bool = os.getenv("MINIO_PUBLIC_SECURE", os.getenv("MINIO_SECURE", "false")).lower() == "true"
+    minio_region: str = os.getenv("MINIO_REGION", "us-east-1")
+
+    # Upload Settings
+    upload_part_size: int = int(os.getenv("UPLOAD_PART_SIZE", str(16 * 1024 * 1024)))
+    presigned_upload_expire_minutes: int = int(os.getenv("PRESIGNED_UPLOAD_EXPIRE_MINUTES", "60"))
+    # A presigned upload can be completed for this long after its URL was issued
+    # (an upload started just before the URL expires may take a while to finish)
+    presigned_upload_complete_hours: int = int(os.getenv("PRESIGNED_UPLOAD_COMPLETE_HOURS", "24"))
 
     # Email Settings (for Meet automation) - keeping existing for compatibility
     email_id: Optional[str] = os.getenv("EMAIL_ID")
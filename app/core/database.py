@@ -8,14 +8,19 @@ from .config import settings
 
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 
+# In async worker mode every task thread holds a session for its whole run
+pool_size = settings.database_pool_size
+if settings.worker_async_mode:
+    pool_size = max(pool_size, settings.worker_async_concurrency)
+
 # Create engine
 engine = create_engine(
     settings.database_url,
     echo=False,
     pool_pre_ping=True,
     pool_recycle=300,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=pool_size,
+    max_overflow=settings.database_max_overflow,
 )
 
 # Create SessionLocal class
@@ -0,0 +1,12 @@
+import redis
+import redis.asyncio
+
+from .config import settings
+
+# Shared client for application state kept in Redis (metrics, locks, progress).
+# Connections are opened lazily from the client's own pool.
+redis_client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+
+# Asyncio client for the API event loop, e.g. pub/sub subscriptions that
+# would otherwise block a thread per listener
+async_redis_client = redis.asyncio.Redis.from_url(settings.redis_url, decode_responses=True)
@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import admin, auth, celery_task, recording
 from app.api.endpoints import chat
 from app.core.config import settings
+from app.utils.http import http_clients
 
 app = FastAPI(
     title="SercueScribe",
@@ -28,6 +29,11 @@ app.include_router(recording.router)
 app.include_router(chat.router)
 
 
+@app.on_event("shutdown")
+async def close_http_clients():
+    await http_clients.aclose()
+
+
 @app.get("/")
 def root():
     return {"message": "Welcome to SercueScribe API", "version": "1.0.0"}
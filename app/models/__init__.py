@@ -1,4 +1,9 @@
 from .user import User
 from .recording import Recording
+from .upload_session import UploadSession
+from .recording_stage import RecordingStage
+from .reprocess_batch import ReprocessBatch
+from .summary_cache import SummaryCache
+from .chat_session import ChatSession, ChatMessage
 
-__all__ = ["User", "Recording"]
+__all__ = ["User", "Recording", "UploadSession", "RecordingStage", "ReprocessBatch", "SummaryCache", "ChatSession", "ChatMessage"]
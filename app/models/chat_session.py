@@ -0,0 +1,37 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+
+from app.db import BaseEntity
+
+
+class ChatSession(BaseEntity):
+    """A conversation about one recording, kept server-side
+
+    Older turns are folded into ``summary`` as the conversation grows; only
+    the turns after ``summarized_until`` are sent to the model verbatim.
+    """
+
+    __tablename__ = "chat_sessions"
+
+    recording_id = Column(Integer, ForeignKey("recordings.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    title = Column(String(200), nullable=True)
+    # Rolling summary of the turns up to and including message summarized_until
+    summary = Column(Text, nullable=True)
+    summarized_until = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"ChatSession({self.id}, recording={self.recording_id})"
+
+
+class ChatMessage(BaseEntity):
+    __tablename__ = "chat_messages"
+
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False, index=True)
+    role = Column(String(10), nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)  # estimated, for history windowing
+
+    def __repr__(self):
+        return f"ChatMessage({self.session_id}, '{self.role}', {self.tokens} tokens)"
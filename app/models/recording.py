@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.orm import relationship
 
@@ -7,6 +7,8 @@ from app.db import BaseEntity
 
 class Recording(BaseEntity):
     __tablename__ = "recordings"
+    # One recording per stored object, so an upload cannot be claimed twice
+    __table_args__ = (UniqueConstraint("bucket_name", "object_name", name="uq_recording_object"),)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     filename = Column(String(255), nullable=False)
@@ -23,8 +25,17 @@ class Recording(BaseEntity):
     status = Column(String(20), default="PENDING")  # PENDING, PROCESSING, SUMMARIZING, COMPLETED, FAILED
     file_size = Column(BigInteger, nullable=True)
     duration = Column(Integer, nullable=True)  # in seconds
+    silence_removed_ratio = Column(Float, nullable=True)  # share of audio cut by VAD before ASR
     is_highlighted = Column(Boolean, nullable=False, default=False)
 
+    # Deduplication: sha256 of the audio bytes and of the pipeline parameters used
+    content_sha256 = Column(String(64), nullable=True, index=True)
+    pipeline_fingerprint = Column(String(64), nullable=True)
+    # JSON options the pipeline was started with (diarize, speakers, ...), reused on retry
+    pipeline_options = Column(Text, nullable=True)
+    # Bulk reprocessing batch that last queued this recording
+    reprocess_batch_id = Column(Integer, ForeignKey("reprocess_batches.id"), nullable=True, index=True)
+
     # Processing metadata
     processing_started_at = Column(DateTime(timezone=True), nullable=True)
     processing_completed_at = Column(DateTime(timezone=True), nullable=True)
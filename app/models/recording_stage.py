@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.mysql import LONGTEXT
+
+from app.db import BaseEntity
+
+
+class RecordingStage(BaseEntity):
+    __tablename__ = "recording_stages"
+    __table_args__ = (UniqueConstraint("recording_id", "stage", name="uq_recording_stage"),)
+
+    recording_id = Column(Integer, ForeignKey("recordings.id"), nullable=False, index=True)
+    stage = Column(String(20), nullable=False)  # fetch, normalize, transcribe, persist, index, summarize, title
+    status = Column(String(20), nullable=False, default="PENDING")  # PENDING, RUNNING, COMPLETED, FAILED
+    attempts = Column(Integer, nullable=False, default=0)
+    # JSON output of the stage, read back by later stages when resuming
+    checkpoint = Column(LONGTEXT, nullable=True)
+    error_message = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"RecordingStage({self.recording_id}, '{self.stage}', '{self.status}')"
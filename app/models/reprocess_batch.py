@@ -0,0 +1,35 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+
+from app.db import BaseEntity
+
+
+class ReprocessBatch(BaseEntity):
+    """Bulk re-run of pipeline stages over existing recordings
+
+    Recordings matching ``filters`` are walked in id order and queued a few at
+    a time by the maintenance beat; ``cursor`` is the last id looked at, so a
+    paused batch resumes where it stopped.
+    """
+
+    __tablename__ = "reprocess_batches"
+
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    from_stage = Column(String(20), nullable=False)  # fetch (re-transcribe), index, summarize
+    # JSON filters: user_id, created_from, created_to, status
+    filters = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False, default="RUNNING")  # RUNNING, PAUSED, COMPLETED, CANCELLED
+    rate_per_minute = Column(Integer, nullable=False, default=10)
+    max_in_flight = Column(Integer, nullable=False, default=10)
+
+    # Only recordings that existed when the batch was created
+    max_recording_id = Column(Integer, nullable=False, default=0)
+    cursor = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    enqueued = Column(Integer, nullable=False, default=0)
+    # Matched but left alone because they were being processed already
+    skipped = Column(Integer, nullable=False, default=0)
+    last_enqueued_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"ReprocessBatch({self.id}, '{self.from_stage}', '{self.status}')"
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.dialects.mysql import LONGTEXT
+
+from app.db import BaseEntity
+
+
+class SummaryCache(BaseEntity):
+    """Meeting notes by summarizer input, reused when the same input comes again"""
+
+    __tablename__ = "summary_cache"
+
+    # sha256 of transcript, prompt, output language and summarizer version
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)
+    summary = Column(LONGTEXT, nullable=False)
+    size = Column(Integer, nullable=False, default=0)  # bytes of summary, for eviction
+    hits = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"SummaryCache('{self.cache_key[:12]}', {self.size} bytes)"
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String
+
+from app.db import BaseEntity
+
+
+class UploadSession(BaseEntity):
+    __tablename__ = "upload_sessions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=True)
+    bucket_name = Column(String(255), nullable=False)
+    object_name = Column(String(255), nullable=False)
+    # MinIO multipart upload id, each chunk is one part of this upload
+    upload_id = Column(String(255), nullable=False)
+    chunk_size = Column(BigInteger, nullable=False)
+    total_size = Column(BigInteger, nullable=True)
+    status = Column(String(20), default="ACTIVE")  # ACTIVE, COMPLETING, COMPLETED, ABORTED
+    recording_id = Column(Integer, ForeignKey("recordings.id"), nullable=True)
+
+    def __repr__(self):
+        return f"UploadSession('{self.filename}', '{self.status}')"
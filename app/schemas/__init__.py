@@ -14,8 +14,29 @@ from .recording import (
     RecordingCreate,
     RecordingUpdate,
     RecordingResponse,
+    RecordingStageResponse,
+)
+from .upload import (
+    UploadSessionCreate,
+    UploadPartInfo,
+    UploadSessionResponse,
+    PresignedUploadCreate,
+    PresignedUploadResponse,
+    PresignedUploadComplete,
+)
+from .admin import (
+    AdminStats,
+    PipelineMetrics,
+    QueueOverview,
+    QueueStats,
+    ReprocessBatchCreate,
+    ReprocessBatchResponse,
+)
+from .chat import (
+    ChatSessionCreate,
+    ChatSessionResponse,
+    ChatMessageResponse,
 )
-from .admin import AdminStats
 from .celery_task import *
 
 __all__ = [
@@ -32,5 +53,20 @@ __all__ = [
     "RecordingCreate",
     "RecordingUpdate",
     "RecordingResponse",
+    "RecordingStageResponse",
+    "UploadSessionCreate",
+    "UploadPartInfo",
+    "UploadSessionResponse",
+    "PresignedUploadCreate",
+    "PresignedUploadResponse",
+    "PresignedUploadComplete",
     "AdminStats",
+    "PipelineMetrics",
+    "QueueStats",
+    "QueueOverview",
+    "ReprocessBatchCreate",
+    "ReprocessBatchResponse",
+    "ChatSessionCreate",
+    "ChatSessionResponse",
+    "ChatMessageResponse",
 ]
@@ -1,6 +1,7 @@
-from typing import List
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class AdminStats(BaseModel):
@@ -13,3 +14,51 @@ class AdminStats(BaseModel):
     total_storage: int
     total_queries: int
     top_users: List[dict]
+
+
+class PipelineMetrics(BaseModel):
+    counters: Dict[str, float]
+
+
+class QueueStats(BaseModel):
+    name: str
+    depth: int
+    started: int
+    avg_wait_seconds: Optional[float] = None
+
+
+class QueueOverview(BaseModel):
+    queues: List[QueueStats]
+    # Transcriptions still waiting in the per-user fair queue
+    fair_queue_pending: int
+    fair_queue_users: int
+    fair_queue_avg_wait_seconds: Optional[float] = None
+
+
+class ReprocessBatchCreate(BaseModel):
+    # fetch re-transcribes, index re-indexes, summarize re-summarizes; later stages follow
+    from_stage: Literal["fetch", "index", "summarize"]
+    user_id: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    status: Optional[str] = None
+    rate_per_minute: int = Field(10, ge=1)
+    max_in_flight: int = Field(10, ge=1)
+
+
+class ReprocessBatchResponse(BaseModel):
+    id: int
+    from_stage: str
+    filters: Dict[str, Any]
+    status: str
+    rate_per_minute: int
+    max_in_flight: int
+    total: int
+    enqueued: int
+    skipped: int
+    # Of the enqueued recordings
+    in_flight: int
+    completed: int
+    failed: int
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
@@ -33,6 +33,7 @@ class RecordingResponse(RecordingBase):
     status: str
     file_size: Optional[int] = None
     duration: Optional[int] = None
+    silence_removed_ratio: Optional[float] = None
     processing_started_at: Optional[datetime] = None
     processing_completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
@@ -41,3 +42,15 @@ class RecordingResponse(RecordingBase):
 
     class Config:
         from_attributes = True
+
+
+class RecordingStageResponse(BaseModel):
+    stage: str
+    status: str
+    attempts: int
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,52 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    total_size: Optional[int] = None
+
+    @field_validator("total_size")
+    @classmethod
+    def validate_total_size(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("total_size must be positive")
+        return v
+
+
+class UploadPartInfo(BaseModel):
+    part_number: int
+    size: int
+
+
+class UploadSessionResponse(BaseModel):
+    id: int
+    filename: str
+    status: str
+    chunk_size: int
+    total_size: Optional[int] = None
+    received_bytes: int = 0
+    # Byte offset the client should resume from (end of the contiguous prefix)
+    next_offset: int = 0
+    next_part_number: int = 1
+    parts: List[UploadPartInfo] = []
+    recording_id: Optional[int] = None
+
+
+class PresignedUploadCreate(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+
+
+class PresignedUploadResponse(BaseModel):
+    url: str
+    method: str = "PUT"
+    object_name: str
+    expires_in: int
+
+
+class PresignedUploadComplete(BaseModel):
+    object_name: str
+    filename: Optional[str] = None
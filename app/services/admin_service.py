@@ -6,9 +6,10 @@ from sqlalchemy.orm import Session
 
 from app.models.recording import Recording
 from app.models.user import User
-from app.schemas.admin import AdminStats
+from app.schemas.admin import AdminStats, PipelineMetrics, QueueOverview, QueueStats
 from app.schemas.auth import UserAdminResponse, UserCreate, UserUpdate
 from app.services.auth_service import AuthService
+from app.utils import fair_queue, metrics
 
 
 class AdminService:
@@ -181,3 +182,40 @@ class AdminService:
             total_queries=0,  # Placeholder
             top_users=top_users,
         )
+
+    @staticmethod
+    def get_pipeline_metrics() -> PipelineMetrics:
+        """Get pipeline counters shared by the API and workers."""
+        return PipelineMetrics(counters=metrics.get_counters())
+
+    @staticmethod
+    def get_queue_stats() -> QueueOverview:
+        """Get depth and average wait time of each task queue."""
+        from app.core.celery import QUEUES, queue_depths
+
+        def average(total: float, count: float):
+            return round(total / count, 2) if count else None
+
+        try:
+            depths = queue_depths()
+            fair = fair_queue.stats()
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Broker unavailable: {e}")
+        counters = metrics.get_counters()
+        queues = []
+        for name in QUEUES:
+            started = counters.get(f"queue.{name}.started", 0)
+            queues.append(
+                QueueStats(
+                    name=name,
+                    depth=depths.get(name, 0),
+                    started=int(started),
+                    avg_wait_seconds=average(counters.get(f"queue.{name}.wait_seconds", 0), started),
+                )
+            )
+        return QueueOverview(
+            queues=queues,
+            fair_queue_pending=fair["pending"],
+            fair_queue_users=fair["users"],
+            fair_queue_avg_wait_seconds=average(counters.get("fairq.wait_seconds", 0), counters.get("fairq.dispatched", 0)),
+        )
@@ -1,8 +1,11 @@
 from langchain_community.chat_models import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 import os
 
+from app.core.config import settings
+from app.utils.resilience import call_backend, stream_backend
+
 SYSTEM_PROMPT_GUIDELINE = """You are a professional, dedicated AI assistant supporting the user in analyzing meeting content.  
 Answer CONCISELY, CLEARLY, and PROFESSIONALLY, relying solely on the transcript or provided data.  
 
@@ -21,6 +24,17 @@ Below is the meeting content (context):
 """
 
 
+HISTORY_SUMMARY_PROMPT = """Summarize the conversation below between a user and an assistant about a meeting.
+Write in Vietnamese, at most {max_words} words. Keep the facts, names, numbers and decisions discussed and what the user asked for; drop greetings and repetition.
+
+Summary of the conversation before this part:
+{summary}
+
+Conversation:
+{conversation}
+"""
+
+
 def prepare_messages_for_ai(
     history: List[Dict[str, str]], message: str, context
 ) -> List:
@@ -50,14 +64,40 @@ class ChatService:
     ):
         if base_url is None:
             base_url = os.environ.get("OLLAMA_API_BASE", "http://ollama:11434")
-        self.llm = ChatOllama(base_url=base_url, model=model)
+        self.llm = ChatOllama(
+            base_url=base_url, model=model, timeout=settings.llm_timeout_seconds
+        )
 
-    def chat(
+    async def achat(
         self, message: str, history: List[Dict[str, str]] = None, context: str = None
     ) -> str:
+        """Answer ``message`` about ``context``, on the event loop without a thread"""
         messages = prepare_messages_for_ai(history or [], message, context)
-        response = self.llm.invoke(messages)
+        response = await call_backend(
+            "llm", lambda: self.llm.ainvoke(messages), timeout=settings.llm_timeout_seconds
+        )
         return response.content
 
+    async def summarize_history(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        """Fold ``turns`` into the running ``summary`` of a conversation"""
+        prompt = HISTORY_SUMMARY_PROMPT.format(
+            max_words=settings.chat_summary_max_words,
+            summary=summary or "(none)",
+            conversation="\n".join(f"{turn['role']}: {turn['content']}" for turn in turns),
+        )
+        response = await call_backend(
+            "llm", lambda: self.llm.ainvoke([HumanMessage(content=prompt)]), timeout=settings.llm_timeout_seconds
+        )
+        return response.content.strip()
+
+    async def stream_chat(
+        self, message: str, history: List[Dict[str, str]] = None, context: str = None
+    ) -> AsyncIterator[str]:
+        """Yield the answer piece by piece as the model generates it"""
+        messages = prepare_messages_for_ai(history or [], message, context)
+        async for chunk in stream_backend("llm", lambda: self.llm.astream(messages)):
+            if chunk.content:
+                yield chunk.content
+
 
 chat_service = ChatService()
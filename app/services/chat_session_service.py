@@ -0,0 +1,152 @@
+"""
+Server-side chat sessions about a recording
+
+The client sends only its new message with the session id; the history sent
+to the model is built here. It is the session's running summary of older
+turns plus the most recent turns that fit CHAT_HISTORY_TOKEN_BUDGET. Once
+the unsummarized turns outgrow the budget, the oldest of them are folded
+into the summary by the LLM, so prompts stay bounded however long the
+conversation gets. Every message is still stored and can be listed.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from pytz import timezone
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ChatMessage, ChatSession, Recording
+from app.schemas.chat import ChatMessageResponse, ChatSessionCreate, ChatSessionResponse
+from app.services.chat_service import chat_service
+from app.utils.blocking import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token of Vietnamese/English text, for budgeting only
+CHARS_PER_TOKEN = 3
+# Unsummarized messages looked at when building a prompt
+MAX_WINDOW_MESSAGES = 100
+
+
+def now() -> datetime:
+    return datetime.now(timezone("Asia/Ho_Chi_Minh"))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def get_owned_session(db: Session, recording_id: int, user_id: int, session_id: int) -> ChatSession:
+    session = (
+        db.query(ChatSession)
+        .filter(
+            ChatSession.id == session_id,
+            ChatSession.recording_id == recording_id,
+            ChatSession.user_id == user_id,
+            ~ChatSession.is_deleted,
+        )
+        .first()
+    )
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return session
+
+
+def create_session(db: Session, recording_id: int, user_id: int, payload: ChatSessionCreate) -> ChatSessionResponse:
+    recording = db.query(Recording.id).filter(Recording.id == recording_id, Recording.user_id == user_id, ~Recording.is_deleted).first()
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    session = ChatSession(recording_id=recording_id, user_id=user_id, title=payload.title)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return ChatSessionResponse.model_validate(session)
+
+
+def get_sessions(db: Session, recording_id: int, user_id: int) -> List[ChatSessionResponse]:
+    sessions = db.query(ChatSession).filter(ChatSession.recording_id == recording_id, ChatSession.user_id == user_id, ~ChatSession.is_deleted).order_by(ChatSession.id.desc()).all()
+    return [ChatSessionResponse.model_validate(s) for s in sessions]
+
+
+def get_messages(db: Session, recording_id: int, user_id: int, session_id: int) -> List[ChatMessageResponse]:
+    session = get_owned_session(db, recording_id, user_id, session_id)
+    messages = db.query(ChatMessage).filter(ChatMessage.session_id == session.id, ~ChatMessage.is_deleted).order_by(ChatMessage.id).all()
+    return [ChatMessageResponse.model_validate(m) for m in messages]
+
+
+def delete_session(db: Session, recording_id: int, user_id: int, session_id: int) -> None:
+    session = get_owned_session(db, recording_id, user_id, session_id)
+    session.is_deleted = True
+    db.commit()
+
+
+def session_history(db: Session, session: ChatSession) -> List[Dict[str, str]]:
+    """Summary of older turns plus the latest turns within the token budget"""
+    recent = db.query(ChatMessage.role, ChatMessage.content, ChatMessage.tokens).filter(ChatMessage.session_id == session.id, ChatMessage.id > session.summarized_until).order_by(ChatMessage.id.desc()).limit(MAX_WINDOW_MESSAGES).all()
+    kept, used = [], 0
+    for role, content, tokens in recent:
+        if kept and used + tokens > settings.chat_history_token_budget:
+            break
+        kept.append({"role": role, "content": content})
+        used += tokens
+    kept.reverse()
+    if session.summary:
+        kept.insert(0, {"role": "system", "content": f"Tóm tắt các lượt trao đổi trước: {session.summary}"})
+    return kept
+
+
+def _append_turn(db: Session, session_id: int, question: str, answer: str) -> Optional[Dict[str, Any]]:
+    """Store a question and its answer; returns the turns to fold into the summary, if any"""
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if session is None:
+        return None
+    db.add(ChatMessage(session_id=session_id, role="user", content=question, tokens=estimate_tokens(question)))
+    db.add(ChatMessage(session_id=session_id, role="assistant", content=answer, tokens=estimate_tokens(answer)))
+    session.message_count += 2
+    session.last_message_at = now()
+    if not session.title:
+        session.title = question[:200]
+    db.commit()
+
+    pending = db.query(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.tokens).filter(ChatMessage.session_id == session_id, ChatMessage.id > session.summarized_until).order_by(ChatMessage.id).all()
+    total = sum(m.tokens for m in pending)
+    if total <= settings.chat_history_token_budget:
+        return None
+    # Fold the oldest turns until half the budget is left, always keeping the latest turn
+    fold = []
+    for message in pending[:-2]:
+        if total <= settings.chat_history_token_budget // 2:
+            break
+        fold.append(message)
+        total -= message.tokens
+    if not fold:
+        return None
+    return {
+        "summary": session.summary,
+        "from": session.summarized_until,
+        "until": fold[-1].id,
+        "turns": [{"role": m.role, "content": m.content} for m in fold],
+    }
+
+
+def _save_summary(db: Session, session_id: int, fold: Dict[str, Any], summary: str) -> None:
+    # Only if no other request folded these turns meanwhile
+    db.query(ChatSession).filter(ChatSession.id == session_id, ChatSession.summarized_until == fold["from"]).update({"summary": summary, "summarized_until": fold["until"]}, synchronize_session=False)
+    db.commit()
+
+
+async def record_turn(db: Session, session_id: int, question: str, answer: str) -> None:
+    """Append a turn to the session and fold older turns into its summary if needed"""
+    fold = await run_blocking(_append_turn, db, session_id, question, answer)
+    if fold is None:
+        return
+    try:
+        summary = await chat_service.summarize_history(fold["summary"], fold["turns"])
+    except Exception as e:
+        # The turns stay unsummarized and are folded after a later turn
+        logger.warning(f"Summarizing chat session {session_id} failed: {e}")
+        return
+    await run_blocking(_save_summary, db, session_id, fold, summary)
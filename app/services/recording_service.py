@@ -1,20 +1,30 @@
+import asyncio
 import json
 import os
-import subprocess
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import HTTPException, UploadFile
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from pytz import timezone
 from sqlalchemy.orm import Session
 
-from app.models import Recording
-from app.schemas import RecordingResponse, RecordingUpdate
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Recording, RecordingStage, User
+from app.schemas import RecordingResponse, RecordingStageResponse, RecordingUpdate
+from app.services import chat_session_service
 from app.utils.ai import summarization_service
+from app.utils.blocking import run_blocking
+from app.utils.audio_meta import HEAD_BYTES, TAIL_BYTES, probe_audio
 from app.utils.ai import meeting_vectorstore
-from app.utils.recording_utils import apply_recording_update
-from app.utils.text import md_to_html
+from app.utils import answer_cache, metrics, progress
+from app.utils.recording_utils import apply_recording_update, pipeline_fingerprint
+from app.utils.stream import ChunkQueueReader, HashingReader, MultipartFileParser
+from app.utils.text import format_transcript_turns, md_to_html
 
 SYSTEM_PROMPT_GUIDELINE = (
     "Bạn là một trợ lý AI chuyên nghiệp, thân thiện, tận tâm hỗ trợ người dùng phân tích nội dung cuộc họp. "
@@ -41,15 +51,33 @@ SYSTEM_PROMPT_GUIDELINE = (
 
 class RecordingChatResponse(BaseModel):
     response: str
+    session_id: Optional[int] = None
 
 
-async def chat_with_recording_transcription(
+@dataclass
+class ChatContext:
+    """What a chat answer is generated from, or the cached answer"""
+
+    context: str = ""
+    history: List[Dict] = field(default_factory=list)
+    cached_answer: Optional[str] = None
+    # Set when the answer may be cached: (transcript hash, question embedding)
+    cache_entry: Optional[Tuple[str, List[float]]] = None
+
+    def remember(self, recording_id: int, message: str, answer: str) -> None:
+        if self.cache_entry is not None:
+            answer_cache.store(recording_id, self.cache_entry[0], message, self.cache_entry[1], answer)
+
+
+def _chat_context(
     db: Session,
     recording_id: int,
     user_id: int,
     message: str,
     history: List[Dict] = None,
-) -> RecordingChatResponse:
+    session_id: Optional[int] = None,
+) -> ChatContext:
+    """Transcript passages relevant to ``message``, from the recording's index"""
     # Query recording
     recording = (
         db.query(Recording)
@@ -64,6 +92,10 @@ async def chat_with_recording_transcription(
         raise HTTPException(
             status_code=404, detail="Recording or transcription not found"
         )
+    if session_id is not None:
+        # History comes from the session, not the client
+        session = chat_session_service.get_owned_session(db, recording_id, user_id, session_id)
+        history = chat_session_service.session_history(db, session)
 
     # Logging input
     print("[CHAT] Incoming chat request:")
@@ -71,122 +103,380 @@ async def chat_with_recording_transcription(
     print(f"  user_id: {user_id}")
     print(f"  message: {message}")
     print(f"  history: {history}")
-    transcription = recording.transcription
-    try:
-        transcription_json = json.loads(transcription.replace("'", '"'))
-        formatted_transcript_for_llm = (
-            f"{transcription_json[0]['speaker']}:{transcription_json[0]['sentence']}"
-        )
-        for i, turn in enumerate(transcription_json[1:]):
-            if turn["speaker"] == transcription_json[i - 1]["speaker"]:
-                formatted_transcript_for_llm += " " + turn["sentence"]
-            else:
-                formatted_transcript_for_llm += (
-                    f"\n\n{turn['speaker']}:{turn['sentence']}"
-                )
-    except Exception as e:
-        print("===" * 100)
-        print("Error parsing transcription JSON:", e)
-        formatted_transcript_for_llm = transcription
+    formatted_transcript_for_llm = format_transcript_turns(recording.transcription)
+
+    # Chat only reads the index, built by the pipeline's index stage
+    from app.tasks.pipeline import request_index
 
-    # Đảm bảo transcript đã được index vào Qdrant
-    meeting_vectorstore.ensure_indexed(recording_id, formatted_transcript_for_llm)
+    index_status = request_index(db, recording)
+    if index_status == "FAILED":
+        metrics.incr("chat.index_failed")
+        raise HTTPException(
+            status_code=503,
+            detail="Transcript indexing failed, try again later",
+            headers={"Retry-After": str(settings.chat_index_retry_seconds)},
+        )
+    if index_status != "COMPLETED":
+        metrics.incr("chat.index_not_ready")
+        raise HTTPException(
+            status_code=409,
+            detail="Transcript indexing in progress, try again shortly",
+            headers={"Retry-After": "5"},
+        )
+    # Embed the question once, for the answer cache and the retrieval
+    vector = meeting_vectorstore.embed_query(message)
+    cache_entry = None
+    if settings.chat_answer_cache_enabled and not history:
+        transcript_sha = answer_cache.transcript_hash(formatted_transcript_for_llm)
+        cached = answer_cache.lookup(recording_id, transcript_sha, vector)
+        if cached is not None:
+            print("[CHAT] Answer served from cache")
+            return ChatContext(cached_answer=cached)
+        cache_entry = (transcript_sha, vector)
     # Lấy context phù hợp từ Qdrant retriever
-    context = meeting_vectorstore.retrieve_context(recording_id, message)
+    context = meeting_vectorstore.retrieve_context(recording_id, message, vector=vector)
+    return ChatContext(context=context, history=history or [], cache_entry=cache_entry)
 
-    # Gọi chat model (dùng ai.py)
-    response = await summarization_service.chat_with_transcription(
-        transcription=context,
-        message=message,
-        message_history=history or [],
-    )
 
-    # Logging output
-    print("[CHAT] Model response:")
-    print(f" response: {response}")
+async def chat_with_recording_transcription(
+    db: Session,
+    recording_id: int,
+    user_id: int,
+    message: str,
+    history: List[Dict] = None,
+    session_id: Optional[int] = None,
+) -> RecordingChatResponse:
+    chat = await run_blocking(_chat_context, db, recording_id, user_id, message, history, session_id)
+    if chat.cached_answer is not None:
+        response = chat.cached_answer
+    else:
+        # Gọi chat model (dùng ai.py)
+        response = await summarization_service.chat_with_transcription(
+            transcription=chat.context,
+            message=message,
+            message_history=chat.history,
+        )
+
+        # Logging output
+        print("[CHAT] Model response:")
+        print(f" response: {response}")
 
-    return RecordingChatResponse(response=response)
+        await run_blocking(chat.remember, recording_id, message, response)
+    if session_id is not None:
+        await chat_session_service.record_turn(db, session_id, message, response)
+    return RecordingChatResponse(response=response, session_id=session_id)
 
 
-async def save_uploaded_file(
-    db: Session, file: UploadFile, user_id: int
-) -> RecordingResponse:
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chat_with_recording_transcription(
+    db: Session,
+    recording_id: int,
+    user_id: int,
+    message: str,
+    history: List[Dict] = None,
+    session_id: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """Server-Sent Events variant of ``chat_with_recording_transcription``
+
+    Emits ``token`` events ({"delta": ...}) as the model generates them, then
+    one ``done`` event with the full response, or an ``error`` event.
+    Time to first token is recorded in the chat.stream.* metrics.
+    """
+    started = time.monotonic()
+    chat = await run_blocking(_chat_context, db, recording_id, user_id, message, history, session_id)
+
+    async def generate():
+        if chat.cached_answer is not None:
+            yield chat.cached_answer
+            return
+        async for token in summarization_service.stream_chat_with_transcription(
+            transcription=chat.context,
+            message=message,
+            message_history=chat.history,
+        ):
+            yield token
+
+    async def events():
+        await metrics.aincr("chat.stream.requests")
+        parts = []
+        try:
+            async for token in generate():
+                if not parts:
+                    await metrics.aincr("chat.stream.first_tokens")
+                    await metrics.aincr("chat.stream.ttft_seconds", time.monotonic() - started)
+                parts.append(token)
+                yield _sse("token", {"delta": token})
+        except Exception as e:
+            print(f"[CHAT] Streaming failed: {e}")
+            await metrics.aincr("chat.stream.errors")
+            yield _sse("error", {"detail": str(e)})
+            return
+        await metrics.aincr("chat.stream.seconds", time.monotonic() - started)
+        response = "".join(parts)
+        if chat.cached_answer is None:
+            await run_blocking(chat.remember, recording_id, message, response)
+        if session_id is not None:
+            # The request's session is closed while streaming; write the turn with our own
+            turn_db = SessionLocal()
+            try:
+                await chat_session_service.record_turn(turn_db, session_id, message, response)
+            finally:
+                turn_db.close()
+        yield _sse("done", {"response": response, "session_id": session_id})
+
+    return events()
+
+
+def get_user_bucket_name(user_id: int) -> str:
     from app.core.config import settings
-    from app.utils.minio import minio_client
 
-    # Create temp directory
-    upload_dir = f"audio_sessions/tmp_{user_id}"
-    os.makedirs(upload_dir, exist_ok=True)
-    filename = file.filename
-    file_path = os.path.join(upload_dir, filename)
+    return f"{settings.minio_bucket_prefix}-user-{user_id}"
 
-    # Save file temporarily
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
 
-    # Upload to MinIO
-    bucket_name = f"{settings.minio_bucket_prefix}-user-{user_id}"
-    object_name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
+def build_object_name(filename: str) -> str:
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
 
-    try:
-        minio_client.upload_file(file_path, bucket_name, object_name)
-    except Exception as e:
-        os.remove(file_path)
-        raise HTTPException(
-            status_code=500, detail=f"Failed to upload file to MinIO: {str(e)}"
-        )
 
-    # Use ffmpeg to get duration
+async def probe_duration(
+    bucket_name: str,
+    object_name: str,
+    file_size: int,
+    head: Optional[bytes] = None,
+    tail: Optional[bytes] = None,
+) -> Optional[float]:
+    """Read the duration of a stored object from its container headers
+
+    ``head``/``tail`` are the first/last bytes of the object if the caller
+    already has them; otherwise they are fetched with range reads. Unknown
+    formats fall back to ffprobe over a presigned URL in a worker thread.
+    """
+    from app.utils.minio import minio_client
+
+    def read_range(offset: int, length: int) -> bytes:
+        return minio_client.read_range(bucket_name, object_name, offset, length)
+
     try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "error",
-                "-show_entries",
-                "format=duration",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-                file_path,
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
+        if head is None:
+            head = await run_in_threadpool(read_range, 0, HEAD_BYTES)
+        if tail is None:
+            tail = await run_in_threadpool(read_range, max(file_size - TAIL_BYTES, 0), TAIL_BYTES) if file_size > len(head) else b""
+        info = await probe_audio(
+            head,
+            tail,
+            file_size,
+            read_range=read_range,
+            fallback_source=lambda: minio_client.presigned_get_url(bucket_name, object_name),
         )
-        print(result.stdout.strip())
-        duration = float(result.stdout.strip())
     except Exception as e:
         print("[ERROR READING FILE LENGTH]: ", e)
-        duration = None
+        return None
+    return info.duration if info else None
+
+
+async def hash_stored_object(bucket_name: str, object_name: str) -> Optional[HashingReader]:
+    """Read a stored object back once to get its SHA-256, head and tail
+
+    For uploads that reach MinIO without passing through us in order
+    (chunked sessions, presigned PUTs). Returns None if the object could not
+    be read; the recording is then just not deduplicated.
+    """
+    from app.utils.minio import minio_client
+
+    def read_through() -> HashingReader:
+        with minio_client.open_object(bucket_name, object_name) as stream:
+            reader = HashingReader(stream, head_size=HEAD_BYTES, tail_size=TAIL_BYTES)
+            while reader.read(settings.upload_part_size):
+                pass
+        return reader
+
+    try:
+        return await run_in_threadpool(read_through)
+    except Exception as e:
+        print(f"[UPLOAD] Failed to hash {object_name}: {e}")
+        return None
+
+
+def get_pipeline_params(user: User) -> Dict:
+    """Parameters the processing pipeline runs with for this user's uploads"""
+    from app.core.config import settings
+
+    return {
+        "use_asr_endpoint": settings.use_asr_endpoint,
+        "language": None,
+        "diarize": False,
+        "summary_prompt": user.summary_prompt,
+        "output_language": user.output_language,
+    }
+
+
+def find_processed_duplicate(
+    db: Session, user_id: int, content_sha256: str, fingerprint: str
+) -> Optional[Recording]:
+    """Latest completed recording of the same audio processed with the same parameters"""
+    return (
+        db.query(Recording)
+        .filter(
+            Recording.user_id == user_id,
+            Recording.content_sha256 == content_sha256,
+            Recording.pipeline_fingerprint == fingerprint,
+            Recording.status == "COMPLETED",
+            ~Recording.is_deleted,
+        )
+        .order_by(Recording.id.desc())
+        .first()
+    )
+
+
+def create_recording_for_object(
+    db: Session,
+    user_id: int,
+    filename: str,
+    bucket_name: str,
+    object_name: str,
+    file_size: int,
+    duration: Optional[float],
+    content_sha256: Optional[str] = None,
+) -> RecordingResponse:
+    """Create the Recording row for an object already in MinIO and start processing
+
+    If the same user already has this audio processed with the same pipeline
+    parameters, its transcription and summary are copied instead.
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    fingerprint = pipeline_fingerprint(get_pipeline_params(user))
 
     recording = Recording(
         user_id=user_id,
         filename=filename,
         title=f"Recording - {os.path.splitext(filename)[0]}",
-        original_filename=file.filename,
+        original_filename=filename,
         audio_path=f"minio://{bucket_name}/{object_name}",
         bucket_name=bucket_name,
         object_name=object_name,
         duration=duration,
-        file_size=len(content),
+        file_size=file_size,
         status="PENDING",
         summary=None,
         transcription=None,
+        content_sha256=content_sha256,
+        pipeline_fingerprint=fingerprint,
     )
+
+    duplicate = None
+    if content_sha256:
+        duplicate = find_processed_duplicate(db, user_id, content_sha256, fingerprint)
+    if duplicate:
+        print(f"[UPLOAD] {object_name} duplicates recording {duplicate.id}, reusing its results")
+        now = datetime.now(timezone("Asia/Ho_Chi_Minh"))
+        recording.transcription = duplicate.transcription
+        recording.summary = duplicate.summary
+        recording.participants = duplicate.participants
+        recording.duration = recording.duration or duplicate.duration
+        recording.status = "COMPLETED"
+        recording.processing_started_at = now
+        recording.processing_completed_at = now
+
     db.add(recording)
     db.commit()
     db.refresh(recording)
 
-    # Trigger audio processing task
-    from app.tasks.audio_tasks import transcribe_audio_task
+    if not duplicate:
+        # Trigger audio processing task
+        from app.tasks.audio_tasks import schedule_transcription
 
-    transcribe_audio_task.delay(recording.id, bucket_name, object_name)
+        schedule_transcription(recording)
 
     return RecordingResponse.model_validate(recording, from_attributes=True)
 
 
+async def save_uploaded_file(
+    db: Session, request: Request, user_id: int
+) -> RecordingResponse:
+    """Stream a multipart/form-data upload (field ``file``) into MinIO
+
+    The body is parsed as it arrives and the file's bytes are piped into a
+    multipart MinIO upload, so neither memory nor local disk ever holds the
+    whole file (``UploadFile`` would spool it to disk before we run).
+    """
+    from app.utils.minio import minio_client
+
+    try:
+        parser = MultipartFileParser(request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The object name needs the filename, so read up to the file part's headers
+    body = request.stream()
+    first_chunks: List[bytes] = []
+    try:
+        async for data in body:
+            first_chunks = parser.feed(data)
+            if parser.started:
+                break
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    if not parser.started:
+        raise HTTPException(status_code=400, detail="No 'file' field in the upload")
+
+    filename = parser.filename
+    bucket_name = get_user_bucket_name(user_id)
+    object_name = build_object_name(filename)
+
+    # Upload part by part in a worker thread, hashing and counting on the way,
+    # while the loop keeps receiving the body
+    source = ChunkQueueReader(asyncio.get_running_loop())
+    reader = HashingReader(source, head_size=HEAD_BYTES, tail_size=TAIL_BYTES)
+    upload = asyncio.ensure_future(
+        run_in_threadpool(minio_client.upload_stream, reader, bucket_name, object_name, parser.content_type)
+    )
+
+    async def receive():
+        for chunk in first_chunks:
+            await source.put(chunk)
+        async for data in body:
+            for chunk in parser.feed(data):
+                await source.put(chunk)
+            if parser.finished:
+                break
+        if not parser.finished:
+            raise ValueError("Upload ended before the file was complete")
+        await source.finish()
+
+    receiver = asyncio.ensure_future(receive())
+    try:
+        await asyncio.wait({receiver, upload}, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Whichever side stopped first, don't leave the other waiting on it
+        if not receiver.done():
+            receiver.cancel()
+        if not upload.done():
+            source.abort(Exception("Upload aborted"))
+        await asyncio.gather(receiver, upload, return_exceptions=True)
+
+    if not receiver.cancelled() and receiver.exception():
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {receiver.exception()}")
+    if upload.exception():
+        raise HTTPException(
+            status_code=500, detail=f"Failed to upload file to MinIO: {str(upload.exception())}"
+        )
+
+    duration = await probe_duration(bucket_name, object_name, reader.size, reader.head, reader.tail)
+
+    return create_recording_for_object(
+        db,
+        user_id=user_id,
+        filename=filename,
+        bucket_name=bucket_name,
+        object_name=object_name,
+        file_size=reader.size,
+        duration=duration,
+        content_sha256=reader.sha256,
+    )
+
+
 def get_recordings(
     db: Session, user_id: int, skip: int = 0, limit: int = 100
 ) -> List[RecordingResponse]:
@@ -253,6 +543,92 @@ def delete_recording(db: Session, recording_id: int, user_id: int) -> None:
     if recording:
         recording.is_deleted = True
         db.commit()
+        if recording.status == "PENDING":
+            from app.utils import fair_queue
+
+            fair_queue.remove(user_id, recording_id)
+
+
+def get_recording_stages(db: Session, recording_id: int, user_id: int) -> List[RecordingStageResponse]:
+    from app.tasks.pipeline import STAGES
+
+    recording = (
+        db.query(Recording)
+        .filter(
+            Recording.id == recording_id,
+            Recording.user_id == user_id,
+            ~Recording.is_deleted,
+        )
+        .first()
+    )
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    rows = db.query(RecordingStage).filter(RecordingStage.recording_id == recording_id).all()
+    rows.sort(key=lambda row: STAGES.index(row.stage) if row.stage in STAGES else len(STAGES))
+    return [RecordingStageResponse.model_validate(row, from_attributes=True) for row in rows]
+
+
+def retry_recording(db: Session, recording_id: int, user_id: int) -> RecordingResponse:
+    """Resume processing from the first stage that has not completed"""
+    from app.tasks.pipeline import resume_pipeline
+
+    recording = (
+        db.query(Recording)
+        .filter(
+            Recording.id == recording_id,
+            Recording.user_id == user_id,
+            ~Recording.is_deleted,
+        )
+        .first()
+    )
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    if recording.status not in ("FAILED", "COMPLETED"):
+        raise HTTPException(status_code=409, detail="Recording is still being processed")
+
+    stage = resume_pipeline(db, recording)
+    if stage is None:
+        raise HTTPException(status_code=400, detail="Nothing to retry, all stages are completed")
+    print(f"[RETRY] Recording {recording_id} resumed from stage {stage}")
+    db.refresh(recording)
+    return RecordingResponse.model_validate(recording, from_attributes=True)
+
+
+def stream_recording_progress(db: Session, recording_id: int, user_id: int) -> AsyncIterator[str]:
+    """Server-Sent Events with the pipeline progress of a recording
+
+    The first event is the current state; the stream ends once the recording
+    is completed or failed.
+    """
+    recording = (
+        db.query(Recording)
+        .filter(
+            Recording.id == recording_id,
+            Recording.user_id == user_id,
+            ~Recording.is_deleted,
+        )
+        .first()
+    )
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    initial = {
+        "recording_id": recording.id,
+        "status": recording.status,
+        "stage": None,
+        "stage_status": None,
+        "progress": 100 if recording.status == "COMPLETED" else 0,
+        "message": None,
+        "error": recording.error_message,
+    }
+
+    async def events():
+        async for snapshot in progress.subscribe(recording_id, initial):
+            if snapshot is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+
+    return events()
 
 
 def add_html_fields_to_recording(recording: Recording) -> Recording:
@@ -0,0 +1,190 @@
+"""
+Bulk reprocessing of existing recordings
+
+A batch selects recordings by filter and re-runs a part of the pipeline on
+them, e.g. re-transcribing after an ASR upgrade or re-summarizing after a
+prompt change. Creating a batch queues nothing by itself: the maintenance
+beat calls ``advance_batch``, which queues a few recordings at a time within
+the batch's rate and in-flight limits.
+"""
+
+import json
+import logging
+import math
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from pytz import timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from app.models import Recording, ReprocessBatch
+from app.schemas.admin import ReprocessBatchCreate, ReprocessBatchResponse
+
+logger = logging.getLogger(__name__)
+
+# Recordings in these states are not being processed and may be queued again
+IDLE_STATUSES = ("COMPLETED", "FAILED")
+
+
+def now() -> datetime:
+    return datetime.now(timezone("Asia/Ho_Chi_Minh"))
+
+
+def _filtered(db: Session, filters: dict) -> Query:
+    query = db.query(Recording).filter(~Recording.is_deleted)
+    if filters.get("user_id") is not None:
+        query = query.filter(Recording.user_id == filters["user_id"])
+    if filters.get("created_from"):
+        query = query.filter(Recording.created_at >= datetime.fromisoformat(filters["created_from"]))
+    if filters.get("created_to"):
+        query = query.filter(Recording.created_at <= datetime.fromisoformat(filters["created_to"]))
+    if filters.get("status"):
+        query = query.filter(Recording.status == filters["status"])
+    return query
+
+
+def _build_response(db: Session, batch: ReprocessBatch) -> ReprocessBatchResponse:
+    counts = dict(db.query(Recording.status, func.count(Recording.id)).filter(Recording.reprocess_batch_id == batch.id).group_by(Recording.status).all())
+    return ReprocessBatchResponse(
+        id=batch.id,
+        from_stage=batch.from_stage,
+        filters=json.loads(batch.filters or "{}"),
+        status=batch.status,
+        rate_per_minute=batch.rate_per_minute,
+        max_in_flight=batch.max_in_flight,
+        total=batch.total,
+        enqueued=batch.enqueued,
+        skipped=batch.skipped,
+        in_flight=sum(n for s, n in counts.items() if s not in IDLE_STATUSES),
+        completed=counts.get("COMPLETED", 0),
+        failed=counts.get("FAILED", 0),
+        created_at=batch.created_at,
+        completed_at=batch.completed_at,
+    )
+
+
+def _get_batch(db: Session, batch_id: int) -> ReprocessBatch:
+    batch = db.query(ReprocessBatch).filter(ReprocessBatch.id == batch_id, ~ReprocessBatch.is_deleted).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Reprocess batch not found")
+    return batch
+
+
+def create_batch(db: Session, payload: ReprocessBatchCreate, user_id: Optional[int] = None) -> ReprocessBatchResponse:
+    filters = {
+        "user_id": payload.user_id,
+        "created_from": payload.created_from.isoformat() if payload.created_from else None,
+        "created_to": payload.created_to.isoformat() if payload.created_to else None,
+        "status": payload.status,
+    }
+    filters = {key: value for key, value in filters.items() if value is not None}
+    max_id = db.query(func.max(Recording.id)).scalar() or 0
+    total = _filtered(db, filters).filter(Recording.id <= max_id).count()
+    if not total:
+        raise HTTPException(status_code=400, detail="No recordings match these filters")
+
+    batch = ReprocessBatch(
+        created_by=user_id,
+        from_stage=payload.from_stage,
+        filters=json.dumps(filters),
+        status="RUNNING",
+        rate_per_minute=payload.rate_per_minute,
+        max_in_flight=payload.max_in_flight,
+        max_recording_id=max_id,
+        cursor=0,
+        total=total,
+        enqueued=0,
+        skipped=0,
+    )
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+    logger.info(f"Reprocess batch {batch.id} created: {total} recordings from stage {batch.from_stage}")
+    return _build_response(db, batch)
+
+
+def get_batches(db: Session) -> List[ReprocessBatchResponse]:
+    batches = db.query(ReprocessBatch).filter(~ReprocessBatch.is_deleted).order_by(ReprocessBatch.id.desc()).all()
+    return [_build_response(db, batch) for batch in batches]
+
+
+def get_batch(db: Session, batch_id: int) -> ReprocessBatchResponse:
+    return _build_response(db, _get_batch(db, batch_id))
+
+
+# action -> (statuses it applies to, resulting status)
+_TRANSITIONS = {
+    "pause": (("RUNNING",), "PAUSED"),
+    "resume": (("PAUSED",), "RUNNING"),
+    "cancel": (("RUNNING", "PAUSED"), "CANCELLED"),
+}
+
+
+def set_batch_state(db: Session, batch_id: int, action: str) -> ReprocessBatchResponse:
+    """Pause, resume or cancel a batch; recordings already queued still finish"""
+    allowed, target = _TRANSITIONS[action]
+    batch = _get_batch(db, batch_id)
+    if batch.status not in allowed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot {action} a batch that is {batch.status.lower()}",
+        )
+    batch.status = target
+    if target == "CANCELLED":
+        batch.completed_at = now()
+    db.commit()
+    return _build_response(db, batch)
+
+
+def advance_batch(db: Session, batch: ReprocessBatch) -> int:
+    """Queue the next recordings of a running batch; returns how many were queued"""
+    from app.tasks.pipeline import reprocess_pipeline
+
+    in_flight = db.query(func.count(Recording.id)).filter(Recording.reprocess_batch_id == batch.id, Recording.status.notin_(IDLE_STATUSES)).scalar()
+    # Token bucket refilled at rate_per_minute, holding at most one minute's worth
+    if batch.last_enqueued_at is None:
+        tokens = batch.rate_per_minute
+    else:
+        last = batch.last_enqueued_at
+        if last.tzinfo is None:
+            last = last.replace(tzinfo=now().tzinfo)
+        elapsed = (now() - last).total_seconds()
+        tokens = min(batch.rate_per_minute, math.floor(batch.rate_per_minute * elapsed / 60))
+    limit = min(batch.max_in_flight - in_flight, tokens)
+    if limit <= 0:
+        return 0
+
+    candidates = _filtered(db, json.loads(batch.filters or "{}")).filter(Recording.id > batch.cursor, Recording.id <= batch.max_recording_id).order_by(Recording.id).limit(limit).all()
+    if not candidates:
+        if in_flight == 0:
+            batch.status = "COMPLETED"
+            batch.completed_at = now()
+            db.commit()
+            logger.info(f"Reprocess batch {batch.id} completed")
+        return 0
+
+    queued = 0
+    for recording in candidates:
+        batch.cursor = recording.id
+        needs = recording.object_name if batch.from_stage == "fetch" else recording.transcription
+        if recording.status not in IDLE_STATUSES or not needs:
+            batch.skipped += 1
+            db.commit()
+            continue
+        recording.reprocess_batch_id = batch.id
+        try:
+            reprocess_pipeline(db, recording, batch.from_stage)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Reprocess batch {batch.id}: queueing recording {recording.id} failed: {e}")
+            batch.cursor = recording.id
+            batch.skipped += 1
+            db.commit()
+            continue
+        batch.enqueued += 1
+        batch.last_enqueued_at = now()
+        db.commit()
+        queued += 1
+    return queued
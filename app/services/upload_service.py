@@ -0,0 +1,415 @@
+from datetime import timedelta
+from typing import AsyncIterator, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from minio.datatypes import Part
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import async_redis_client
+from app.models import Recording, UploadSession
+from app.schemas import RecordingResponse
+from app.schemas.upload import (
+    PresignedUploadComplete,
+    PresignedUploadCreate,
+    PresignedUploadResponse,
+    UploadPartInfo,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from app.services.recording_service import (
+    build_object_name,
+    create_recording_for_object,
+    get_user_bucket_name,
+    hash_stored_object,
+    probe_duration,
+)
+
+# S3/MinIO multipart limit
+MAX_PART_NUMBER = 10000
+
+
+def presigned_key(bucket_name: str, object_name: str) -> str:
+    """Redis key of a presigned upload that was issued and not completed yet"""
+    return f"upload:presigned:{bucket_name}:{object_name}"
+
+
+def _get_session(db: Session, session_id: int, user_id: int, for_update: bool = False) -> UploadSession:
+    query = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id,
+        ~UploadSession.is_deleted,
+    )
+    if for_update:
+        query = query.with_for_update()
+    upload_session = query.first()
+    if not upload_session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload_session
+
+
+def _get_active_session(db: Session, session_id: int, user_id: int, for_update: bool = False) -> UploadSession:
+    upload_session = _get_session(db, session_id, user_id, for_update=for_update)
+    if upload_session.status != "ACTIVE":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload session is {upload_session.status.lower()}",
+        )
+    return upload_session
+
+
+def _build_response(upload_session: UploadSession, parts: List[Part]) -> UploadSessionResponse:
+    parts = sorted(parts, key=lambda p: p.part_number)
+    received_bytes = sum(p.size or 0 for p in parts)
+
+    # Resume point is the end of the contiguous run of full-size parts from 1
+    next_offset = 0
+    next_part_number = 1
+    for part in parts:
+        if part.part_number != next_part_number:
+            break
+        next_offset += part.size or 0
+        next_part_number += 1
+        if part.size != upload_session.chunk_size:
+            break
+
+    return UploadSessionResponse(
+        id=upload_session.id,
+        filename=upload_session.filename,
+        status=upload_session.status,
+        chunk_size=upload_session.chunk_size,
+        total_size=upload_session.total_size,
+        received_bytes=received_bytes,
+        next_offset=next_offset,
+        next_part_number=next_part_number,
+        parts=[UploadPartInfo(part_number=p.part_number, size=p.size or 0) for p in parts],
+        recording_id=upload_session.recording_id,
+    )
+
+
+async def create_upload_session(db: Session, user_id: int, payload: UploadSessionCreate) -> UploadSessionResponse:
+    from app.utils.minio import minio_client
+
+    chunk_size = settings.upload_part_size
+    if payload.total_size and -(-payload.total_size // chunk_size) > MAX_PART_NUMBER:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+
+    bucket_name = get_user_bucket_name(user_id)
+    object_name = build_object_name(payload.filename)
+    try:
+        upload_id = await run_in_threadpool(
+            minio_client.create_multipart_upload,
+            bucket_name,
+            object_name,
+            payload.content_type,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start upload: {str(e)}")
+
+    upload_session = UploadSession(
+        user_id=user_id,
+        filename=payload.filename,
+        content_type=payload.content_type,
+        bucket_name=bucket_name,
+        object_name=object_name,
+        upload_id=upload_id,
+        chunk_size=chunk_size,
+        total_size=payload.total_size,
+        status="ACTIVE",
+    )
+    db.add(upload_session)
+    db.commit()
+    db.refresh(upload_session)
+    return _build_response(upload_session, [])
+
+
+async def upload_chunk(
+    db: Session,
+    session_id: int,
+    user_id: int,
+    part_number: int,
+    body: AsyncIterator[bytes],
+) -> UploadPartInfo:
+    from app.utils.minio import minio_client
+
+    upload_session = _get_active_session(db, session_id, user_id)
+    if part_number < 1 or part_number > MAX_PART_NUMBER:
+        raise HTTPException(status_code=400, detail=f"part_number must be between 1 and {MAX_PART_NUMBER}")
+
+    # Read at most one chunk of the request body
+    buffer = bytearray()
+    async for piece in body:
+        buffer.extend(piece)
+        if len(buffer) > upload_session.chunk_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Chunk exceeds chunk_size of {upload_session.chunk_size} bytes",
+            )
+    if not buffer:
+        raise HTTPException(status_code=400, detail="Empty chunk")
+
+    try:
+        await run_in_threadpool(
+            minio_client.upload_part,
+            upload_session.bucket_name,
+            upload_session.object_name,
+            upload_session.upload_id,
+            part_number,
+            bytes(buffer),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store chunk: {str(e)}")
+
+    return UploadPartInfo(part_number=part_number, size=len(buffer))
+
+
+async def get_upload_session(db: Session, session_id: int, user_id: int) -> UploadSessionResponse:
+    from app.utils.minio import minio_client
+
+    upload_session = _get_session(db, session_id, user_id)
+    if upload_session.status != "ACTIVE":
+        return _build_response(upload_session, [])
+
+    parts = await run_in_threadpool(
+        minio_client.list_parts,
+        upload_session.bucket_name,
+        upload_session.object_name,
+        upload_session.upload_id,
+    )
+    return _build_response(upload_session, parts)
+
+
+async def _assembled_size(upload_session: UploadSession) -> Optional[int]:
+    """Size of the session's final object, or None if it was not assembled yet"""
+    from app.utils.minio import minio_client
+
+    try:
+        stat = await run_in_threadpool(minio_client.stat_object, upload_session.bucket_name, upload_session.object_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to check uploaded file: {str(e)}")
+    return stat.size if stat is not None and stat.size else None
+
+
+async def _assemble(db: Session, upload_session: UploadSession) -> int:
+    """Validate the uploaded parts and assemble them into the final object; returns its size"""
+    from app.utils.minio import minio_client
+
+    try:
+        parts = await run_in_threadpool(
+            minio_client.list_parts,
+            upload_session.bucket_name,
+            upload_session.object_name,
+            upload_session.upload_id,
+        )
+    except Exception as e:
+        # The multipart upload is gone once assembled; then only the recording is missing
+        file_size = await _assembled_size(upload_session)
+        if file_size is not None:
+            return file_size
+        raise HTTPException(status_code=500, detail=f"Failed to list uploaded chunks: {str(e)}")
+    parts = sorted(parts, key=lambda p: p.part_number)
+    if not parts:
+        raise HTTPException(status_code=400, detail="No chunks uploaded")
+
+    # Every part but the last must be a full chunk and numbers must be contiguous
+    missing = sorted(set(range(1, parts[-1].part_number + 1)) - {p.part_number for p in parts})
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing chunks: {missing[:20]}")
+    short = [p.part_number for p in parts[:-1] if p.size != upload_session.chunk_size]
+    if short:
+        raise HTTPException(status_code=400, detail=f"Chunks smaller than chunk_size: {short[:20]}")
+    file_size = sum(p.size or 0 for p in parts)
+    if upload_session.total_size is not None and file_size != upload_session.total_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Received {file_size} bytes, expected {upload_session.total_size}",
+        )
+
+    # From here on the session no longer takes chunks; a retry resumes from this point
+    upload_session.status = "COMPLETING"
+    db.commit()
+    try:
+        await run_in_threadpool(
+            minio_client.complete_multipart_upload,
+            upload_session.bucket_name,
+            upload_session.object_name,
+            upload_session.upload_id,
+            parts,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to finalize upload: {str(e)}")
+    return file_size
+
+
+async def complete_upload_session(db: Session, session_id: int, user_id: int) -> RecordingResponse:
+    """Assemble the session's chunks and create its recording
+
+    Safe to retry: a session left COMPLETING by a failure after its object was
+    assembled only gets its recording created, and a COMPLETED session
+    returns the recording it already has.
+    """
+    # Lock the row so concurrent finalize calls cannot both create a recording
+    upload_session = _get_session(db, session_id, user_id, for_update=True)
+    if upload_session.status == "COMPLETED" and upload_session.recording_id:
+        recording = db.query(Recording).filter(Recording.id == upload_session.recording_id).first()
+        return RecordingResponse.model_validate(recording, from_attributes=True)
+    if upload_session.status not in ("ACTIVE", "COMPLETING"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload session is {upload_session.status.lower()}",
+        )
+
+    file_size = None
+    if upload_session.status == "COMPLETING":
+        file_size = await _assembled_size(upload_session)
+    if file_size is None:
+        file_size = await _assemble(db, upload_session)
+
+    # Chunks may arrive in any order, so hash the assembled object in one pass
+    stored = await hash_stored_object(upload_session.bucket_name, upload_session.object_name)
+    duration = await probe_duration(
+        upload_session.bucket_name,
+        upload_session.object_name,
+        file_size,
+        stored.head if stored else None,
+        stored.tail if stored else None,
+    )
+    try:
+        recording = create_recording_for_object(
+            db,
+            user_id=user_id,
+            filename=upload_session.filename,
+            bucket_name=upload_session.bucket_name,
+            object_name=upload_session.object_name,
+            file_size=file_size,
+            duration=duration,
+            content_sha256=stored.sha256 if stored else None,
+        )
+    except IntegrityError:
+        # A concurrent retry created it first
+        db.rollback()
+        existing = (
+            db.query(Recording)
+            .filter(
+                Recording.bucket_name == upload_session.bucket_name,
+                Recording.object_name == upload_session.object_name,
+            )
+            .first()
+        )
+        recording = RecordingResponse.model_validate(existing, from_attributes=True)
+
+    upload_session.status = "COMPLETED"
+    upload_session.recording_id = recording.id
+    db.commit()
+    return recording
+
+
+async def abort_upload_session(db: Session, session_id: int, user_id: int) -> None:
+    from app.utils.minio import minio_client
+
+    upload_session = _get_active_session(db, session_id, user_id, for_update=True)
+    try:
+        await run_in_threadpool(
+            minio_client.abort_multipart_upload,
+            upload_session.bucket_name,
+            upload_session.object_name,
+            upload_session.upload_id,
+        )
+    except Exception as e:
+        print(f"[UPLOAD] Failed to abort multipart upload {upload_session.upload_id}: {e}")
+    upload_session.status = "ABORTED"
+    db.commit()
+
+
+async def create_presigned_upload(user_id: int, payload: PresignedUploadCreate) -> PresignedUploadResponse:
+    from app.utils.minio import minio_client
+
+    bucket_name = get_user_bucket_name(user_id)
+    object_name = build_object_name(payload.filename)
+    expires = timedelta(minutes=settings.presigned_upload_expire_minutes)
+    try:
+        url = await run_in_threadpool(minio_client.presigned_put_url, bucket_name, object_name, expires)
+        # Only objects we issued a URL for can be completed, and each only once
+        await async_redis_client.set(
+            presigned_key(bucket_name, object_name),
+            payload.filename,
+            ex=settings.presigned_upload_complete_hours * 3600,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create upload URL: {str(e)}")
+
+    return PresignedUploadResponse(
+        url=url,
+        object_name=object_name,
+        expires_in=int(expires.total_seconds()),
+    )
+
+
+async def complete_presigned_upload(db: Session, user_id: int, payload: PresignedUploadComplete) -> RecordingResponse:
+    from app.utils.minio import minio_client
+
+    # The bucket comes from the caller's identity, so only their own objects can be claimed
+    bucket_name = get_user_bucket_name(user_id)
+    existing = (
+        db.query(Recording)
+        .filter(
+            Recording.bucket_name == bucket_name,
+            Recording.object_name == payload.object_name,
+        )
+        .first()
+    )
+    if existing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+
+    # Consuming the issued key claims the upload; concurrent calls get nothing
+    key = presigned_key(bucket_name, payload.object_name)
+    try:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.ttl(key)
+            pipe.getdel(key)
+            ttl, issued_filename = await pipe.execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to check upload: {str(e)}")
+    if issued_filename is None:
+        raise HTTPException(status_code=404, detail="No pending upload for this object")
+
+    try:
+        try:
+            stat = await run_in_threadpool(minio_client.stat_object, bucket_name, payload.object_name)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to check uploaded file: {str(e)}")
+        if stat is None or not stat.size:
+            raise HTTPException(status_code=404, detail="Uploaded file not found")
+
+        filename = payload.filename or issued_filename
+        # The client PUT the object straight to MinIO; read it back to hash it
+        stored = await hash_stored_object(bucket_name, payload.object_name)
+        duration = await probe_duration(
+            bucket_name,
+            payload.object_name,
+            stat.size,
+            stored.head if stored else None,
+            stored.tail if stored else None,
+        )
+        return create_recording_for_object(
+            db,
+            user_id=user_id,
+            filename=filename,
+            bucket_name=bucket_name,
+            object_name=payload.object_name,
+            file_size=stat.size,
+            duration=duration,
+            content_sha256=stored.sha256 if stored else None,
+        )
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+    except BaseException:
+        # Not completed, e.g. the client called before its PUT finished: keep it claimable
+        try:
+            await async_redis_client.set(key, issued_filename, ex=max(ttl, 1), nx=True)
+        except Exception as e:
+            print(f"[UPLOAD] Failed to restore pending upload {payload.object_name}: {e}")
+        raise
@@ -1,218 +1,239 @@
 """
 Celery tasks for audio processing
+
+The recording pipeline (see ``pipeline.py``) is split over three tasks that
+hand over to each other: the audio stages, indexing, and summary + title.
 """
 
+import json
+import logging
 import os
-from datetime import datetime
-from typing import Optional
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Optional
 
 from celery import current_task
-from pytz import timezone
 
 from app.core.celery import celery
+from app.core.config import settings
 from app.models import Recording
-from app.utils.ai import asr_service, summarization_service, transcription_service
-from app.utils.text import generate_title_from_transcription
+from app.utils import fair_queue
+from app.utils.lease import LeaseBusy
+from app.utils.metrics import record_handoff
+from app.utils.resilience import BackendUnavailable
 
 from .base import get_db_session, safe_db_operation
+from .pipeline import (
+    AUDIO_STAGES,
+    INDEX_STAGES,
+    SUMMARY_STAGES,
+    StageContext,
+    run_stages,
+    stages_completed,
+    transcript_digest,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def progress_reporter() -> Callable[[int, str], None]:
+    """Progress callback for the running task
+
+    Binds the task id now, as the callback may be called from the worker
+    event loop thread, where ``current_task`` is not set.
+    """
+    task = current_task
+    task_id = task.request.id if task else None
+
+    def report_progress(current: int, status: str) -> None:
+        if task_id is None:
+            return
+        task.update_state(
+            task_id=task_id,
+            state="PROGRESS",
+            meta={"current": current, "total": 100, "status": status},
+        )
 
-import asyncio
+    return report_progress
 
 
-@celery.task(bind=True)
-def transcribe_audio_task(
-    self,
-    recording_id: int,
-    bucket_name: str,
-    object_name: str,
-    language: Optional[str] = None,
-    diarize: bool = False,
-    min_speakers: Optional[int] = None,
-    max_speakers: Optional[int] = None,
-):
-    """Celery task to transcribe audio"""
-    from app.utils.minio import minio_client
+def get_recording(db, recording_id: int) -> Recording:
+    def query(session):
+        return session.query(Recording).filter(Recording.id == recording_id).first()
 
-    db = get_db_session()
+    recording = safe_db_operation(db, query)
+    if not recording:
+        raise Exception("Recording not found")
+    return recording
 
-    # Create temp directory
-    temp_dir = f"audio_tmp/{recording_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    audio_file_path = os.path.join(temp_dir, object_name)
 
-    # Download file from MinIO
-    try:
-        minio_client.download_file(bucket_name, object_name, audio_file_path)
-    except Exception as e:
-        raise Exception(f"Failed to download file from MinIO: {str(e)}")
+def schedule_transcription(recording: Recording, **options) -> None:
+    """Queue the audio stages of a recording
 
-    try:
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 0, "total": 100, "status": "Starting transcription..."},
-        )
+    With fair scheduling the recording waits in its owner's queue and the
+    dispatcher interleaves it with other users' work.
+    """
+    if not settings.fair_scheduling_enabled:
+        transcribe_audio_task.apply_async(args=[recording.id, recording.bucket_name, recording.object_name], kwargs=options)
+        return
 
-        # Get recording
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
+    from app.tasks.maintenance_tasks import dispatch_fair_queue_task
 
-        recording = safe_db_operation(db, get_recording)
-        if not recording:
-            raise Exception("Recording not found")
+    fair_queue.push(
+        recording.user_id,
+        recording.id,
+        recording.duration,
+        {"bucket_name": recording.bucket_name, "object_name": recording.object_name, "options": options},
+    )
+    dispatch_fair_queue_task.delay()
 
-        # Update recording status
-        recording.status = "PROCESSING"
-        recording.processing_started_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
-        db.commit()
 
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 25, "total": 100, "status": "Transcribing audio..."},
-        )
+def enqueue_index(recording: Recording, handoff: bool = True) -> None:
+    """Queue the index stage with only the recording id
 
-        # Choose transcription service
-        from app.core.config import settings
-
-        if settings.use_asr_endpoint and diarize:
-            # Use ASR service for diarization
-            result = asyncio.run(asr_service.transcribe_audio_asr(audio_file_path, diarize, min_speakers, max_speakers))
-            transcription = result.get("transcript", "")
-        else:
-            # Use OpenAI Whisper
-            result = asyncio.run(transcription_service.process_audio(audio_file_path))
-            transcription = result.get("transcript", "")
-            print("=====" * 100)
-            print(transcription)
-
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 75, "total": 100, "status": "Processing transcription..."},
-        )
+    Without ``handoff`` the task only indexes and does not queue the summary.
+    """
+    kwargs = {} if handoff else {"handoff": False}
+    index_recording_task.apply_async(args=[recording.id], kwargs=kwargs)
+    record_handoff("index", [[recording.id], kwargs], recording.transcription)
 
-        # Update recording with transcription
-        recording.transcription = str(transcription)
-        recording.status = "SUMMARIZING"
 
-        # Generate title if not provided
-        if not recording.title:
-            recording.title = generate_title_from_transcription(str(transcription))
+def enqueue_summary(recording: Recording) -> None:
+    """Queue the summary stage with only the recording id and a transcript reference
 
-        db.commit()
+    The transcription itself is read back from the DB by the summary task, so
+    it never travels through the broker or the result backend.
+    """
+    kwargs = {
+        "custom_prompt": recording.owner.summary_prompt,
+        "output_language": recording.owner.output_language,
+        "transcript_ref": transcript_digest(recording.transcription),
+    }
+    generate_summary_task.apply_async(args=[recording.id], kwargs=kwargs)
+    record_handoff("summary", [[recording.id], kwargs], recording.transcription)
 
-        # Start summarization task
-        generate_summary_task.delay(
-            recording_id,
-            transcription,
-            recording.owner.summary_prompt,
-            recording.owner.output_language,
-        )
 
-        return {
-            "status": "SUCCESS",
-            "recording_id": recording_id,
-            "transcription_length": len(transcription),
-        }
+# Message headers counting requeues per reason, carried from one delivery to
+# the next; request.retries counts both and is not used for either limit
+REQUEUE_HEADERS = ("breaker_requeues", "lease_requeues")
 
-    except Exception as e:
-        # Update recording with error
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
 
-        recording = safe_db_operation(db, get_recording)
-        if recording:
-            recording.status = "FAILED"
-            recording.error_message = str(e)
-            recording.processing_completed_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
-            db.commit()
+def requeue_count(task, header: str) -> int:
+    return int(getattr(task.request, header, None) or 0)
 
-        raise Exception(f"Transcription failed: {str(e)}")
 
-    finally:
-        db.close()
+def can_requeue(task) -> bool:
+    """Whether a task stopped by an open circuit breaker may run again later"""
+    return requeue_count(task, "breaker_requeues") < settings.breaker_max_requeues
 
 
-@celery.task(bind=True)
-def generate_summary_task(
-    self,
-    recording_id: int,
-    transcription: str,
-    custom_prompt: Optional[str] = None,
-    output_language: Optional[str] = None,
-):
-    """Celery task to generate summary"""
-    db = get_db_session()
+def requeue_task(task, error: BackendUnavailable | LeaseBusy):
+    """Put ``task`` back on its queue until it may make progress again
 
-    try:
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 0, "total": 100, "status": "Starting summarization..."},
-        )
+    After an open circuit breaker that is when the backend's cooldown has
+    passed, and for a stage leased by another execution, when the lease
+    would expire. That execution renews its lease until it finishes, after
+    which the requeued task finds the stage completed and does nothing.
 
-        # Get recording
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
+    Returns the exception for the caller to raise: Celery's ``Retry``, or
+    ``error`` itself once the requeues for its reason are used up.
+    """
+    if isinstance(error, BackendUnavailable):
+        header, limit = "breaker_requeues", settings.breaker_max_requeues
+    else:
+        header, limit = "lease_requeues", settings.lease_max_requeues
+    count = requeue_count(task, header) + 1
+    if count > limit:
+        logger.error(f"Giving up on {task.name} after {limit} requeues: {error}")
+        return error
+    logger.warning(f"Requeueing {task.name} in {error.retry_after:.0f}s ({header} {count}/{limit}): {error}")
+    headers = {name: requeue_count(task, name) for name in REQUEUE_HEADERS}
+    headers[header] = count
+    # The tasks have max_retries=None; the limits are enforced above
+    return task.retry(exc=error, countdown=error.retry_after, headers=headers)
 
-        recording = safe_db_operation(db, get_recording)
-        if not recording:
-            raise Exception("Recording not found")
 
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 50, "total": 100, "status": "Generating summary..."},
-        )
-
-        # Generate summary
-        # summary = asyncio.run(
-        #     summarization_service.generate_summary(
-        #         transcription, custom_prompt, output_language or "English"
-        #     )
-        # )
-        summary = asyncio.run(summarization_service.generate_summary(transcription))
-        print("====--===-=-=-=-=" * 100)
-        print("summary hererererer", summary)
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 90, "total": 100, "status": "Finalizing..."},
-        )
+def run_audio_stages(
+    recording_id: int,
+    bucket_name: str,
+    object_name: str,
+    options: Dict[str, Any],
+    requeue: bool = False,
+) -> Dict[str, Any]:
+    """Fetch, normalize, transcribe and persist, then hand over to indexing"""
+    db = get_db_session()
 
-        # Update recording
-        recording.summary = summary
-        recording.status = "COMPLETED"
-        recording.processing_completed_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
+    # Own temp directory per execution; a duplicate delivery must not clean up ours
+    os.makedirs("audio_tmp", exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f"{recording_id}_", dir="audio_tmp")
 
+    try:
+        recording = get_recording(db, recording_id)
+        recording.bucket_name = recording.bucket_name or bucket_name
+        recording.object_name = recording.object_name or object_name
+        # Kept so a retry runs with the same options
+        recording.pipeline_options = json.dumps(options)
         db.commit()
 
+        ctx = StageContext(db, recording, temp_dir=temp_dir, options=options, progress=progress_reporter())
+        run_stages(ctx, AUDIO_STAGES, requeue=requeue)
+
+        if not stages_completed(ctx, INDEX_STAGES + SUMMARY_STAGES):
+            enqueue_index(recording)
+
         return {
             "status": "SUCCESS",
             "recording_id": recording_id,
-            "summary_length": len(summary),
+            "transcription_length": len(recording.transcription or ""),
         }
 
-    except Exception as e:
-        # Update recording with error
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
+    finally:
+        db.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if settings.fair_scheduling_enabled:
+            # A transcription slot is free, let the next waiting user in
+            from app.tasks.maintenance_tasks import dispatch_fair_queue_task
 
-        recording = safe_db_operation(db, get_recording)
-        if recording:
-            recording.status = "FAILED"
-            recording.error_message = str(e)
-            recording.processing_completed_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
-            db.commit()
+            dispatch_fair_queue_task.delay()
 
-        raise Exception(f"Summarization failed: {str(e)}")
 
-    finally:
-        db.close()
+@celery.task(bind=True, max_retries=None)
+def transcribe_audio_task(
+    self,
+    recording_id: int,
+    bucket_name: str,
+    object_name: str,
+    language: Optional[str] = None,
+    diarize: bool = False,
+    min_speakers: Optional[int] = None,
+    max_speakers: Optional[int] = None,
+    use_asr: Optional[bool] = None,
+):
+    """Celery task to transcribe audio
+
+    Uses the ASR endpoint for diarization, otherwise Whisper, unless
+    ``use_asr`` says otherwise.
+    """
+    options = {
+        "language": language,
+        "diarize": diarize,
+        "min_speakers": min_speakers,
+        "max_speakers": max_speakers,
+        "use_asr": settings.use_asr_endpoint and diarize if use_asr is None else use_asr,
+    }
+    try:
+        return run_audio_stages(recording_id, bucket_name, object_name, options, requeue=can_requeue(self))
+    except LeaseBusy as e:
+        raise requeue_task(self, e)
+    except BackendUnavailable as e:
+        if can_requeue(self):
+            raise requeue_task(self, e)
+        raise Exception(f"Transcription failed: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Transcription failed: {str(e)}")
 
 
-@celery.task(bind=True)
+@celery.task(bind=True, max_retries=None)
 def transcribe_audio_asr_task(
     self,
     recording_id: int,
@@ -223,107 +244,100 @@ def transcribe_audio_asr_task(
     max_speakers: Optional[int] = None,
 ):
     """Celery task to transcribe audio using ASR endpoint"""
-    from app.utils.minio import minio_client
+    options = {
+        "language": None,
+        "diarize": diarize,
+        "min_speakers": min_speakers,
+        "max_speakers": max_speakers,
+        "use_asr": True,
+    }
+    try:
+        return run_audio_stages(recording_id, bucket_name, object_name, options, requeue=can_requeue(self))
+    except LeaseBusy as e:
+        raise requeue_task(self, e)
+    except BackendUnavailable as e:
+        if can_requeue(self):
+            raise requeue_task(self, e)
+        raise Exception(f"ASR transcription failed: {str(e)}")
+    except Exception as e:
+        raise Exception(f"ASR transcription failed: {str(e)}")
 
-    db = get_db_session()
 
-    # Create temp directory
-    temp_dir = f"audio_tmp/{recording_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    audio_file_path = os.path.join(temp_dir, object_name)
+@celery.task(bind=True, max_retries=None)
+def index_recording_task(self, recording_id: int, handoff: bool = True):
+    """Celery task to index the transcription for chat, then hand over to summary
 
-    # Download file from MinIO
-    try:
-        minio_client.download_file(bucket_name, object_name, audio_file_path)
-    except Exception as e:
-        raise Exception(f"Failed to download file from MinIO: {str(e)}")
+    ``handoff=False`` (indexing requested by chat) skips the summary handoff.
+    """
+    db = get_db_session()
 
     try:
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 0,
-                "total": 100,
-                "status": "Starting ASR transcription...",
-            },
-        )
+        recording = get_recording(db, recording_id)
+        ctx = StageContext(db, recording, progress=progress_reporter())
+        run_stages(ctx, INDEX_STAGES, requeue=can_requeue(self))
 
-        # Get recording
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
+        if handoff and not stages_completed(ctx, SUMMARY_STAGES):
+            enqueue_summary(recording)
 
-        recording = safe_db_operation(db, get_recording)
-        if not recording:
-            raise Exception("Recording not found")
+        return {"status": "SUCCESS", "recording_id": recording_id}
 
-        # Update recording status
-        recording.status = "PROCESSING"
-        recording.processing_started_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
-        db.commit()
+    except LeaseBusy as e:
+        raise requeue_task(self, e)
+    except BackendUnavailable as e:
+        if can_requeue(self):
+            raise requeue_task(self, e)
+        raise Exception(f"Indexing failed: {str(e)}")
 
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 25, "total": 100, "status": "Processing with ASR..."},
-        )
+    except Exception as e:
+        raise Exception(f"Indexing failed: {str(e)}")
 
-        # Use ASR service
-        result = asyncio.run(asr_service.transcribe_audio_asr(audio_file_path, diarize, min_speakers, max_speakers))
-        transcription = result.get("transcript", "")
+    finally:
+        db.close()
 
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 75, "total": 100, "status": "Processing transcription..."},
-        )
 
-        # Update recording with transcription
-        import json
+@celery.task(bind=True, max_retries=None)
+def generate_summary_task(
+    self,
+    recording_id: int,
+    transcription: Optional[str] = None,
+    custom_prompt: Optional[str] = None,
+    output_language: Optional[str] = None,
+    transcript_ref: Optional[str] = None,
+):
+    """Celery task to generate summary and title
 
-        if isinstance(transcription, dict) or isinstance(transcription, list):
-            recording.transcription = json.dumps(transcription, ensure_ascii=False)
-        else:
-            recording.transcription = transcription
-        recording.status = "SUMMARIZING"
+    The transcription is read from the recording. The ``transcription``
+    argument is only accepted for messages queued before the handoff carried
+    a ``transcript_ref`` instead.
+    """
+    db = get_db_session()
 
-        # Generate title if not provided
-        if not recording.title:
-            if isinstance(transcription, (dict, list)):
-                text_for_title = json.dumps(transcription, ensure_ascii=False)
-            else:
-                text_for_title = transcription
-            recording.title = generate_title_from_transcription(text_for_title)
+    try:
+        recording = get_recording(db, recording_id)
 
-        db.commit()
+        if transcript_ref is not None and transcript_ref != transcript_digest(recording.transcription):
+            # Re-transcribed since this task was queued; the newer run queues its own summary
+            return {"status": "SKIPPED", "recording_id": recording_id, "reason": "stale transcript"}
 
-        # Start summarization task
-        generate_summary_task.delay(
-            recording_id,
-            transcription,
-            recording.owner.summary_prompt,
-            recording.owner.output_language,
-        )
+        options = {"custom_prompt": custom_prompt, "output_language": output_language}
+        ctx = StageContext(db, recording, options=options, progress=progress_reporter())
+        run_stages(ctx, SUMMARY_STAGES, requeue=can_requeue(self))
 
         return {
             "status": "SUCCESS",
             "recording_id": recording_id,
-            "transcription_length": len(transcription),
+            "summary_length": len(recording.summary or ""),
         }
 
-    except Exception as e:
-        # Update recording with error
-        def get_recording(session):
-            return session.query(Recording).filter(Recording.id == recording_id).first()
-
-        recording = safe_db_operation(db, get_recording)
-        if recording:
-            recording.status = "FAILED"
-            recording.error_message = str(e)
-            recording.processing_completed_at = datetime.now(timezone("Asia/Ho_Chi_Minh"))
-            db.commit()
+    except LeaseBusy as e:
+        raise requeue_task(self, e)
+    except BackendUnavailable as e:
+        if can_requeue(self):
+            raise requeue_task(self, e)
+        raise Exception(f"Summarization failed: {str(e)}")
 
-        raise Exception(f"ASR transcription failed: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Summarization failed: {str(e)}")
 
     finally:
         db.close()
@@ -0,0 +1,104 @@
+"""
+Celery tasks for housekeeping: scheduling and other periodic work
+"""
+
+import logging
+import time
+import uuid
+
+from app.core.celery import celery, queue_depths
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.utils import fair_queue, metrics
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_LOCK_KEY = "fairq:dispatch_lock"
+REPROCESS_LOCK_KEY = "reprocess:lock"
+
+# Only delete a lock we still hold; it may have expired and been taken over
+_RELEASE_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+)
+
+
+@celery.task(bind=True)
+def dispatch_fair_queue_task(self):
+    """Move transcriptions from the per-user queues to the broker
+
+    Only tops the transcription queue up to FAIR_DISPATCH_QUEUE_DEPTH so most
+    work waits in the fair queue, where the next pick rotates between users.
+    Runs on beat and whenever a transcription is queued or finishes.
+    """
+    from app.tasks.audio_tasks import transcribe_audio_task
+
+    # One dispatcher at a time, otherwise two could both see free capacity
+    token = uuid.uuid4().hex
+    if not redis_client.set(DISPATCH_LOCK_KEY, token, nx=True, ex=60):
+        return {"dispatched": 0}
+    try:
+        capacity = settings.fair_dispatch_queue_depth - queue_depths()["transcription"]
+        items = fair_queue.pop(capacity) if capacity > 0 else []
+        for item in items:
+            transcribe_audio_task.apply_async(
+                args=[item["recording_id"], item["bucket_name"], item["object_name"]],
+                kwargs=item.get("options") or {},
+            )
+            metrics.incr("fairq.dispatched")
+            metrics.incr("fairq.wait_seconds", max(time.time() - item["enqueued_at"], 0.0))
+    finally:
+        _RELEASE_SCRIPT(keys=[DISPATCH_LOCK_KEY], args=[token])
+    if items:
+        logger.info(f"Dispatched {len(items)} transcriptions from the fair queue")
+    return {"dispatched": len(items)}
+
+
+@celery.task(bind=True)
+def advance_reprocess_batches_task(self):
+    """Queue the next recordings of every running reprocess batch"""
+    from app.models import ReprocessBatch
+    from app.services.reprocess_service import advance_batch
+
+    from .base import get_db_session
+
+    token = uuid.uuid4().hex
+    if not redis_client.set(REPROCESS_LOCK_KEY, token, nx=True, ex=300):
+        return {"queued": 0}
+    db = get_db_session()
+    queued = 0
+    try:
+        batches = db.query(ReprocessBatch).filter(ReprocessBatch.status == "RUNNING", ~ReprocessBatch.is_deleted).all()
+        for batch in batches:
+            try:
+                queued += advance_batch(db, batch)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Advancing reprocess batch {batch.id} failed: {e}")
+    finally:
+        db.close()
+        _RELEASE_SCRIPT(keys=[REPROCESS_LOCK_KEY], args=[token])
+    if queued:
+        logger.info(f"Queued {queued} recordings for reprocessing")
+    return {"queued": queued}
+
+
+@celery.task
+def prune_summary_cache_task():
+    """Evict expired and least recently used summary cache entries"""
+    from app.utils import summary_cache
+
+    from .base import get_db_session
+
+    db = get_db_session()
+    try:
+        removed = summary_cache.prune(db)
+    finally:
+        db.close()
+    if removed:
+        logger.info(f"Evicted {removed} summary cache entries")
+    return {"removed": removed}
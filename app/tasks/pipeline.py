@@ -0,0 +1,647 @@
+"""
+Stage-level processing pipeline for recordings
+
+A recording goes through fetch -> normalize -> transcribe -> persist -> index
+-> summarize -> title. Every stage records its outcome in a RecordingStage row
+with a JSON checkpoint of what it produced. A failed recording is resumed from
+its first incomplete stage, so retrying a failed summary never repeats ASR.
+
+Stages that share local files run inside the same Celery task (the audio
+stages); whatever a later task needs is kept in the checkpoints, the
+recording row or MinIO.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pytz import timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis import redis_client
+from app.models import Recording, RecordingStage
+from app.utils import summary_cache
+from app.utils.ai import asr_service, meeting_vectorstore, summarization_service, transcription_service
+from app.utils.audio_processing import (
+    apply_vad,
+    asr_extension,
+    fetch_audio_for_asr,
+    local_audio_duration,
+    normalize_for_asr,
+    normalized_object_name,
+    transcode_for_asr,
+)
+from app.utils.chunked_transcription import transcribe_chunked
+from app.utils.lease import lease
+from app.utils.minio import minio_client
+from app.utils.progress import publish as publish_progress
+from app.utils.resilience import BackendUnavailable
+from app.utils.summarization import plan_signature, summarize_transcript, transcript_turns
+from app.utils.text import format_transcript_turns, generate_title_from_transcription
+from app.utils.vad import offset_map_to_json, remap_timestamps, silence_cut_points, vad_result_from_json
+
+from .runtime import run_async
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["fetch", "normalize", "transcribe", "persist", "index", "summarize", "title"]
+AUDIO_STAGES = ["fetch", "normalize", "transcribe", "persist"]
+INDEX_STAGES = ["index"]
+SUMMARY_STAGES = ["summarize", "title"]
+# A failed index is recorded but does not fail the recording
+OPTIONAL_STAGES = {"index"}
+
+# Recording.status while a stage runs
+STAGE_RECORDING_STATUS = {
+    "fetch": "PROCESSING",
+    "normalize": "PROCESSING",
+    "transcribe": "PROCESSING",
+    "persist": "PROCESSING",
+    "index": "SUMMARIZING",
+    "summarize": "SUMMARIZING",
+    "title": "SUMMARIZING",
+}
+
+STAGE_LABELS = {
+    "fetch": "Downloading audio...",
+    "normalize": "Preparing audio...",
+    "transcribe": "Transcribing audio...",
+    "persist": "Saving transcription...",
+    "index": "Indexing transcript...",
+    "summarize": "Generating summary...",
+    "title": "Finalizing...",
+}
+
+ProgressFn = Callable[[int, str], None]
+
+
+def now():
+    return datetime.now(timezone("Asia/Ho_Chi_Minh"))
+
+
+def transcript_digest(text: Optional[str]) -> str:
+    """Content reference for a stored transcription"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def load_transcription(text: Optional[str]):
+    """Stored transcription as the structure the transcription stage produced"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def dump_transcription(transcription: Any) -> str:
+    if isinstance(transcription, (dict, list)):
+        return json.dumps(transcription, ensure_ascii=False)
+    return transcription
+
+
+def run_transcription(
+    audio_file_path: str,
+    temp_dir: str,
+    use_asr: bool,
+    diarize: bool = False,
+    min_speakers: Optional[int] = None,
+    max_speakers: Optional[int] = None,
+    cut_points: Optional[List[float]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    completed: Optional[Dict[str, Any]] = None,
+    on_chunk: Optional[Callable[[str, Any], None]] = None,
+):
+    """Transcribe a local file, in parallel chunks when it is long"""
+
+    async def transcribe(path: str):
+        if use_asr:
+            result = await asr_service.transcribe_audio_asr(path, diarize, min_speakers, max_speakers)
+        else:
+            result = await transcription_service.process_audio(path)
+        return None if result is None else result.get("transcript", "")
+
+    duration = local_audio_duration(audio_file_path) if settings.asr_chunked_enabled else None
+    if duration and duration > settings.asr_chunk_max_seconds:
+        return run_async(transcribe_chunked(audio_file_path, duration, transcribe, temp_dir, cut_points, progress, completed, on_chunk))
+
+    transcription = run_async(transcribe(audio_file_path))
+    if transcription is None:
+        raise Exception("Transcription service returned no result")
+    return transcription
+
+
+def publish_stage(
+    recording: Recording,
+    stage: str,
+    stage_status: str,
+    fraction: float = 0.0,
+    message: Optional[str] = None,
+    error: Optional[str] = None,
+) -> int:
+    """Broadcast where the recording is in the pipeline; returns the percentage"""
+    step = 100 / len(STAGES)
+    percent = int(step * (STAGES.index(stage) + fraction))
+    publish_progress(
+        recording.id,
+        {
+            "status": recording.status,
+            "stage": stage,
+            "stage_status": stage_status,
+            "progress": percent,
+            "message": message or STAGE_LABELS[stage],
+            "error": error,
+        },
+    )
+    return percent
+
+
+class StageContext:
+    """State shared by the stages of one task run"""
+
+    def __init__(
+        self,
+        db: Session,
+        recording: Recording,
+        temp_dir: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        progress: Optional[ProgressFn] = None,
+    ) -> None:
+        self.db = db
+        self.recording = recording
+        self.temp_dir = temp_dir
+        self.options = options or {}
+        self.progress = progress
+        # Outputs of completed stages, keyed by stage name
+        self.checkpoints: Dict[str, Dict[str, Any]] = {}
+        self.rows: Dict[str, RecordingStage] = {}
+        self._local_files: Dict[str, str] = {}
+
+    def local_file(self, object_name: str) -> str:
+        """Local copy of an object of this recording's bucket, downloaded once per run"""
+        path = self._local_files.get(object_name)
+        if path and os.path.exists(path):
+            return path
+        path = os.path.join(self.temp_dir, os.path.basename(object_name))
+        minio_client.download_file(self.recording.bucket_name, object_name, path)
+        self._local_files[object_name] = path
+        return path
+
+    def keep_local(self, object_name: str, path: str) -> None:
+        self._local_files[object_name] = path
+
+    def report(self, stage: str, fraction: float = 0.0, status: Optional[str] = None) -> None:
+        percent = self.publish(stage, "RUNNING", fraction, status)
+        if self.progress:
+            self.progress(percent, status or STAGE_LABELS[stage])
+
+    def publish(
+        self,
+        stage: str,
+        stage_status: str,
+        fraction: float = 0.0,
+        message: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> int:
+        return publish_stage(self.recording, stage, stage_status, fraction, message, error)
+
+
+# === Stages ===
+# Each stage takes the context and returns its checkpoint (JSON-serializable).
+
+
+def fetch_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    if minio_client.stat_object(recording.bucket_name, recording.object_name) is None:
+        raise Exception(f"Audio object {recording.object_name} not found")
+    path, fetched_object = fetch_audio_for_asr(recording.bucket_name, recording.object_name, ctx.temp_dir)
+    ctx.keep_local(fetched_object, path)
+    return {"object": fetched_object, "size": os.path.getsize(path)}
+
+
+def _store_asr_input(ctx: StageContext, path: str) -> str:
+    """Object holding the ASR input, uploading it when it is not stored yet"""
+    recording = ctx.recording
+    name = os.path.basename(path)
+    if name == os.path.basename(recording.object_name):
+        return recording.object_name
+    norm_object = normalized_object_name(recording.object_name)
+    if name == os.path.basename(norm_object) and minio_client.stat_object(recording.bucket_name, norm_object) is not None:
+        return norm_object
+    object_name = f"pipeline/{recording.id}/{name}"
+    minio_client.upload_file(path, recording.bucket_name, object_name)
+    return object_name
+
+
+def normalize_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    path = ctx.local_file(ctx.checkpoints["fetch"]["object"])
+    path = normalize_for_asr(path, recording.bucket_name, recording.object_name, ctx.temp_dir)
+
+    # Drop long silences so ASR only processes speech
+    source_path = path
+    path, vad_result = apply_vad(path, recording.bucket_name, recording.object_name, ctx.temp_dir)
+    trimmed = path != source_path
+    if trimmed and settings.asr_normalize_audio:
+        encoded_path = os.path.join(ctx.temp_dir, f"speech.{asr_extension()}")
+        try:
+            transcode_for_asr(path, encoded_path)
+            os.remove(path)
+            path = encoded_path
+        except Exception as e:
+            logger.warning(f"Encoding trimmed audio of recording {recording.id} failed, sending WAV: {e}")
+    if vad_result:
+        recording.silence_removed_ratio = vad_result.removed_ratio
+
+    asr_object = _store_asr_input(ctx, path)
+    ctx.keep_local(asr_object, path)
+    return {
+        "asr_object": asr_object,
+        "trimmed": trimmed,
+        "vad": offset_map_to_json(vad_result) if vad_result else None,
+    }
+
+
+def transcribe_stage(ctx: StageContext) -> Dict[str, Any]:
+    checkpoint = ctx.checkpoints["normalize"]
+    path = ctx.local_file(checkpoint["asr_object"])
+    vad_result = vad_result_from_json(checkpoint["vad"]) if checkpoint.get("vad") else None
+    cut_points = silence_cut_points(vad_result, checkpoint["trimmed"]) if vad_result else None
+
+    def progress(done: int, total: int):
+        ctx.report("transcribe", done / total, f"Transcribed {done}/{total} chunks...")
+
+    options = ctx.options
+    # Chunks finished by an earlier attempt on the same audio and options,
+    # e.g. before a breaker requeue, are kept in the stage's checkpoint
+    partial_key = transcript_digest(json.dumps([checkpoint["asr_object"], options.get("use_asr", False), options.get("diarize", False)]))
+    row = ctx.rows.get("transcribe")
+    saved = json.loads(row.checkpoint or "{}") if row is not None else {}
+    chunks = dict(saved.get("chunks") or {}) if saved.get("partial_key") == partial_key else {}
+
+    def chunk_done(key: str, transcript: Any):
+        chunks[key] = transcript
+        save_stage_checkpoint(ctx.recording.id, "transcribe", {"partial_key": partial_key, "chunks": chunks})
+
+    transcription = run_transcription(
+        path,
+        ctx.temp_dir,
+        use_asr=options.get("use_asr", False),
+        diarize=options.get("diarize", False),
+        min_speakers=options.get("min_speakers"),
+        max_speakers=options.get("max_speakers"),
+        cut_points=cut_points,
+        progress=progress,
+        completed=chunks,
+        on_chunk=chunk_done,
+    )
+    # Timestamps of trimmed audio are shifted back onto the original recording
+    if vad_result and checkpoint["trimmed"]:
+        transcription = remap_timestamps(transcription, vad_result.offset_map)
+    return {"transcript": transcription}
+
+
+def persist_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    transcription = ctx.checkpoints["transcribe"]["transcript"]
+    recording.transcription = dump_transcription(transcription)
+
+    # The transcript now lives on the recording, drop the copy in the checkpoint
+    transcribe_row = ctx.rows.get("transcribe")
+    if transcribe_row is not None:
+        transcribe_row.checkpoint = json.dumps({"persisted": True})
+
+    asr_object = ctx.checkpoints["normalize"]["asr_object"]
+    if asr_object.startswith(f"pipeline/{recording.id}/"):
+        try:
+            minio_client.remove_object(recording.bucket_name, asr_object)
+        except Exception as e:
+            logger.warning(f"Removing {asr_object} failed: {e}")
+
+    return {
+        "transcript_ref": transcript_digest(recording.transcription),
+        "segments": len(transcription) if isinstance(transcription, list) else None,
+    }
+
+
+def index_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    meeting_vectorstore.ensure_indexed(recording.id, format_transcript_turns(recording.transcription), replace=True)
+    return {"transcript_ref": transcript_digest(recording.transcription)}
+
+
+def summarize_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    # Keyed on what generate_summary actually sends, which excludes the user's prompt and language
+    summarizer = summarization_service.summary_signature()
+    mode = f"chunked:{plan_signature()}" if settings.summary_chunked_enabled else "single:turns"
+    key = summary_cache.cache_key(recording.transcription, f"{summarizer}#{mode}")
+    cached = summary_cache.get(ctx.db, key)
+    if cached is not None:
+        recording.summary = cached
+        return {"summary_length": len(cached), "cache_hit": True}
+
+    transcription = load_transcription(recording.transcription)
+    if not settings.summary_chunked_enabled:
+        # The same "SPEAKER: text" turns the chunked path sends, never the repr of the segments
+        summary = run_async(summarization_service.generate_summary("\n".join(transcript_turns(transcription))))
+        recording.summary = summary
+        summary_cache.put(ctx.db, key, summary)
+        return {"summary_length": len(summary or "")}
+
+    def progress(done: int, total: int):
+        ctx.report("summarize", done / total, f"Summarizing part {done}/{total}...")
+
+    result = run_async(
+        summarize_transcript(
+            transcription,
+            summarization_service.generate_summary,
+            summarization_service.merge_summaries,
+            namespace=f"{summarizer}#{settings.summary_model_version}",
+            progress=progress,
+        )
+    )
+    recording.summary = result.pop("summary")
+    summary_cache.put(ctx.db, key, recording.summary)
+    return {"summary_length": len(recording.summary or ""), **result}
+
+
+def title_stage(ctx: StageContext) -> Dict[str, Any]:
+    recording = ctx.recording
+    if not recording.title:
+        recording.title = generate_title_from_transcription(recording.transcription)
+    return {"title": recording.title}
+
+
+STAGE_FUNCTIONS: Dict[str, Callable[[StageContext], Dict[str, Any]]] = {
+    "fetch": fetch_stage,
+    "normalize": normalize_stage,
+    "transcribe": transcribe_stage,
+    "persist": persist_stage,
+    "index": index_stage,
+    "summarize": summarize_stage,
+    "title": title_stage,
+}
+
+
+# === Runner ===
+
+
+def save_stage_checkpoint(recording_id: int, stage: str, checkpoint: Dict[str, Any]) -> None:
+    """Store the progress of a running stage, in its own transaction
+
+    Called midway through a stage, possibly from the event loop thread, so it
+    does not touch the stage's session.
+    """
+    db = SessionLocal()
+    try:
+        db.query(RecordingStage).filter(RecordingStage.recording_id == recording_id, RecordingStage.stage == stage).update({"checkpoint": json.dumps(checkpoint, ensure_ascii=False)}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Checkpointing {stage} of recording {recording_id} failed: {e}")
+    finally:
+        db.close()
+
+
+def load_stages(db: Session, recording_id: int) -> Dict[str, RecordingStage]:
+    rows = db.query(RecordingStage).filter(RecordingStage.recording_id == recording_id).all()
+    return {row.stage: row for row in rows}
+
+
+def stage_lease_key(recording_id: int, stage: str) -> str:
+    return f"pipeline:lease:{recording_id}:{stage}"
+
+
+def stages_completed(ctx: StageContext, stages: List[str]) -> bool:
+    return all(ctx.rows.get(stage) is not None and ctx.rows[stage].status == "COMPLETED" for stage in stages)
+
+
+def run_stages(ctx: StageContext, stages: List[str], requeue: bool = False) -> None:
+    """Run ``stages`` in order, skipping those already completed
+
+    Safe to call again for the same recording, e.g. when the broker redelivers
+    a task: completed stages are no-ops, and a stage running elsewhere raises
+    ``LeaseBusy`` rather than running twice.
+
+    Each stage is committed with its checkpoint as soon as it finishes. A
+    failing stage marks itself and the recording FAILED and re-raises, unless
+    it is optional. With ``requeue``, a stage stopped by an open circuit
+    breaker goes back to PENDING instead, as the caller will run it again.
+    """
+    db, recording = ctx.db, ctx.recording
+    ctx.rows = load_stages(db, recording.id)
+    for row in ctx.rows.values():
+        if row.status == "COMPLETED":
+            ctx.checkpoints[row.stage] = json.loads(row.checkpoint or "{}")
+
+    for stage in stages:
+        row = ctx.rows.get(stage)
+        if row is not None and row.status == "COMPLETED":
+            continue
+
+        # Only one execution of a stage at a time; whatever another one did
+        # before we got the lease is read back once we hold it
+        with lease(stage_lease_key(recording.id, stage), settings.stage_lease_seconds):
+            db.expire_all()
+            row = db.query(RecordingStage).filter(RecordingStage.recording_id == recording.id, RecordingStage.stage == stage).first()
+            if row is None:
+                row = RecordingStage(recording_id=recording.id, stage=stage, status="PENDING", attempts=0)
+                db.add(row)
+            ctx.rows[stage] = row
+            if row.status == "COMPLETED":
+                ctx.checkpoints[stage] = json.loads(row.checkpoint or "{}")
+                continue
+
+            row.status = "RUNNING"
+            row.attempts = (row.attempts or 0) + 1
+            row.error_message = None
+            row.started_at = now()
+            row.completed_at = None
+            recording.status = STAGE_RECORDING_STATUS[stage]
+            recording.error_message = None
+            if not recording.processing_started_at:
+                recording.processing_started_at = now()
+            db.commit()
+            ctx.report(stage)
+
+            try:
+                output = STAGE_FUNCTIONS[stage](ctx) or {}
+            except Exception as e:
+                db.rollback()
+                row.error_message = str(e)
+                if requeue and isinstance(e, BackendUnavailable):
+                    logger.warning(f"Stage {stage} of recording {recording.id} postponed: {e}")
+                    row.status = "PENDING"
+                    recording.status = "PENDING"
+                    db.commit()
+                    ctx.publish(stage, "PENDING", error=str(e))
+                    raise
+                row.status = "FAILED"
+                if stage in OPTIONAL_STAGES:
+                    logger.warning(f"Optional stage {stage} of recording {recording.id} failed: {e}")
+                    db.commit()
+                    ctx.publish(stage, "FAILED", 1.0, error=str(e))
+                    continue
+                recording.status = "FAILED"
+                recording.error_message = f"{stage} failed: {e}"
+                recording.processing_completed_at = now()
+                db.commit()
+                ctx.publish(stage, "FAILED", error=recording.error_message)
+                raise
+
+            row.status = "COMPLETED"
+            row.checkpoint = json.dumps(output, ensure_ascii=False)
+            row.completed_at = now()
+            ctx.checkpoints[stage] = output
+            db.commit()
+            ctx.publish(stage, "COMPLETED", 1.0)
+
+    last = ctx.rows.get(STAGES[-1])
+    if last is not None and last.status == "COMPLETED" and recording.status != "COMPLETED":
+        recording.status = "COMPLETED"
+        recording.processing_completed_at = now()
+        db.commit()
+        ctx.publish(STAGES[-1], "COMPLETED", 1.0)
+
+
+# === Resume ===
+
+
+def backfill_stages(db: Session, recording: Recording) -> None:
+    """Mark the stages of a recording processed before stages were tracked
+
+    Results already on the recording count as completed, so retrying an old
+    recording whose summary failed does not transcribe it again.
+    """
+    if load_stages(db, recording.id):
+        return
+    done = []
+    if recording.transcription:
+        done += AUDIO_STAGES
+    if recording.summary:
+        done.append("summarize")
+    if recording.status == "COMPLETED":
+        done.append("title")
+    for stage in done:
+        db.add(
+            RecordingStage(
+                recording_id=recording.id,
+                stage=stage,
+                status="COMPLETED",
+                attempts=0,
+                checkpoint=json.dumps({"backfilled": True}),
+                completed_at=now(),
+            )
+        )
+    db.commit()
+
+
+def first_incomplete_stage(db: Session, recording_id: int) -> Optional[str]:
+    rows = load_stages(db, recording_id)
+    for stage in STAGES:
+        row = rows.get(stage)
+        if row is None or row.status != "COMPLETED":
+            return stage
+    return None
+
+
+def enqueue_stage(recording: Recording, stage: str) -> None:
+    """Queue the task that runs ``stage`` (and the stages after it)"""
+    from app.tasks import audio_tasks
+
+    if stage in AUDIO_STAGES:
+        audio_tasks.schedule_transcription(recording, **json.loads(recording.pipeline_options or "{}"))
+    elif stage in INDEX_STAGES:
+        audio_tasks.enqueue_index(recording)
+    else:
+        audio_tasks.enqueue_summary(recording)
+
+
+def claim_index_retry(recording_id: int) -> bool:
+    """True at most once per CHAT_INDEX_RETRY_SECONDS for a recording"""
+    try:
+        return bool(redis_client.set(f"index:retry:{recording_id}", 1, nx=True, ex=settings.chat_index_retry_seconds))
+    except Exception as e:
+        logger.warning(f"Index retry throttle unavailable: {e}")
+        return True
+
+
+def request_index(db: Session, recording: Recording) -> str:
+    """Status of the recording's index stage, queuing the stage if nothing else will
+
+    For chat, which only reads the index: recordings transcribed before the
+    stage existed, whose indexing failed or whose transcript was edited since
+    get indexed on first use. Only the index stage is queued, never the
+    summary, and a failed index is retried at most once per
+    CHAT_INDEX_RETRY_SECONDS; until then its status stays FAILED.
+    """
+    from app.tasks import audio_tasks
+
+    backfill_stages(db, recording)
+    row = load_stages(db, recording.id).get("index")
+    if row is not None and row.status == "COMPLETED":
+        indexed = json.loads(row.checkpoint or "{}").get("transcript_ref")
+        if indexed == transcript_digest(recording.transcription):
+            return row.status
+    elif row is not None and row.status in ("PENDING", "RUNNING"):
+        return row.status
+    elif row is not None and row.status == "FAILED" and not claim_index_retry(recording.id):
+        return row.status
+    if row is None:
+        row = RecordingStage(recording_id=recording.id, stage="index", status="PENDING", attempts=0)
+        db.add(row)
+    else:
+        row.status = "PENDING"
+        row.checkpoint = None
+        row.error_message = None
+        row.completed_at = None
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request queued it meanwhile
+        db.rollback()
+        return "PENDING"
+    audio_tasks.enqueue_index(recording, handoff=False)
+    return "PENDING"
+
+
+def resume_pipeline(db: Session, recording: Recording) -> Optional[str]:
+    """Queue a recording again from its first incomplete stage
+
+    Returns that stage, or None when every stage is already completed.
+    """
+    backfill_stages(db, recording)
+    stage = first_incomplete_stage(db, recording.id)
+    if stage is None:
+        return None
+    recording.status = "PENDING"
+    recording.error_message = None
+    recording.processing_completed_at = None
+    db.commit()
+    # Replaces the outcome of the previous run for anyone following progress
+    publish_stage(recording, stage, "PENDING", message="Queued")
+    enqueue_stage(recording, stage)
+    return stage
+
+
+def reprocess_pipeline(db: Session, recording: Recording, from_stage: str) -> Optional[str]:
+    """Run ``from_stage`` and every stage after it again, e.g. after an ASR or prompt upgrade
+
+    Returns the stage the recording was queued from, which is earlier than
+    ``from_stage`` if an earlier stage never completed.
+    """
+    backfill_stages(db, recording)
+    rows = load_stages(db, recording.id)
+    for stage in STAGES[STAGES.index(from_stage) :]:
+        row = rows.get(stage)
+        if row is not None:
+            row.status = "PENDING"
+            row.checkpoint = None
+            row.error_message = None
+            row.completed_at = None
+    db.commit()
+    return resume_pipeline(db, recording)
@@ -0,0 +1,100 @@
+"""
+Worker-scoped async runtime for Celery tasks
+
+Each worker process keeps one event loop running in a background thread for
+its whole lifetime. Tasks submit coroutines to it instead of calling
+``asyncio.run`` (which builds and tears down a loop per call), so the pooled
+HTTP clients in ``app.utils.http`` stay alive and keep their connections
+across tasks.
+
+In async worker mode (``WORKER_ASYNC_MODE``) the worker runs on a thread pool
+and every task thread submits to the same loop, so one process overlaps many
+ASR/LLM waits. Each task thread blocks on its own coroutine, so the pool size
+(``WORKER_ASYNC_CONCURRENCY``) is what caps how many are in flight.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+
+from app.core.config import settings
+from app.utils.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        # A loop inherited through fork has no thread driving it
+        return self._loop is not None and self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="worker-async-runtime", daemon=True)
+            self._thread.start()
+            logger.info(f"Started worker async runtime in process {self._pid}")
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine on the worker loop and wait for its result
+
+        Safe to call from any number of task threads at once.
+        """
+        if not self.running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.running:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(http_clients.aclose(), self._loop).result(timeout=10)
+            except Exception as e:
+                logger.warning(f"Closing HTTP clients failed: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            logger.info(f"Stopped worker async runtime in process {self._pid}")
+
+
+runtime = WorkerRuntime()
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Drop-in replacement for ``asyncio.run`` inside Celery tasks"""
+    return runtime.run(coro)
+
+
+@worker_process_init.connect
+def _start_runtime(**kwargs) -> None:
+    runtime.start()
+
+
+@worker_ready.connect
+def _start_runtime_threads(**kwargs) -> None:
+    # The threads pool has no child processes, so worker_process_init never fires
+    if settings.worker_async_mode:
+        runtime.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _stop_runtime(**kwargs) -> None:
+    runtime.stop()
@@ -2,16 +2,20 @@
 AI services for transcription and summarization
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aiohttp
-import httpx
 
 from app.core.config import settings
+from app.utils.http import http_clients
+from app.utils.audio_processing import local_audio_duration
+from app.utils.resilience import BackendUnavailable, audio_timeout, call_backend
 from app.services.chat_service import chat_service
 
 # === Qdrant VectorStore cho transcript meeting ===
@@ -25,6 +29,14 @@ import uuid
 logger = logging.getLogger(__name__)
 
 
+def _audio_duration(path: str) -> Optional[float]:
+    try:
+        return local_audio_duration(path)
+    except Exception as e:
+        logger.warning(f"Could not read duration of {path}: {e}")
+        return None
+
+
 class TranscriptionService:
     """Dịch vụ chuyển đổi âm thanh thành văn bản"""
 
@@ -43,13 +55,18 @@ class TranscriptionService:
             audio_path: Đường dẫn file âm thanh
         Returns:
             Dictionary chứa transcript và số lượng token
+        Raises:
+            BackendUnavailable: backend đang bị ngắt (circuit open), cần thử lại sau
         """
         try:
             endpoint = f"{self.base_url}/api/v1/meeting-note/audio-to-transcript"
             if not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Không tìm thấy file âm thanh: {audio_path}")
             logger.debug(f"Xử lý file âm thanh: {audio_path}")
-            async with aiohttp.ClientSession() as session:
+            timeout = audio_timeout(_audio_duration(audio_path))
+
+            async def request() -> Dict[str, Any]:
+                session = http_clients.aiohttp_session()
                 with open(audio_path, "rb") as audio_file:
                     data = aiohttp.FormData()
                     data.add_field(
@@ -63,48 +80,52 @@ class TranscriptionService:
                         endpoint,
                         headers={"accept": "application/json"},
                         data=data,
-                        timeout=10000000000,
+                        timeout=aiohttp.ClientTimeout(total=timeout),
                     ) as response:
                         logger.debug(f"Trạng thái response: {response.status}")
                         response.raise_for_status()
-                        data = await response.read()
-                        result = json.loads(data.decode("utf-8"))
-                        logger.debug(f"Nhận dữ liệu response hoàn chỉnh")
-                        transcript = result.get("transcript", "")
-                        transcript = re.sub(
-                            r"\s\[\d{2}/\d{2}/\d{4} \d{2}:\d{2} (AM|PM)\]",
-                            ":",
-                            transcript,
-                        ).strip()
-                        entries = re.split(r"(?=SPEAKER_\d+:)", transcript.strip())
-
-                        # Convert to desired structure
-                        trs: List[Dict[str, str]] = []
-                        for entry in entries:
-                            match = re.match(r"(SPEAKER_\d+):\s*(.*)", entry, re.DOTALL)
-                            if match:
-                                speaker = match.group(1).strip()
-                                sentence = re.sub(r"\s+", " ", match.group(2).strip())
-                                if sentence:
-                                    trs.append(
-                                        {
-                                            "speaker": speaker,
-                                            "sentence": re.sub(
-                                                r"[^a-zA-Z0-9À-ỹ\s]",
-                                                "",
-                                                sentence.lower(),
-                                            ),
-                                        }
-                                    )
-                        print("Kết quả:", trs)
-                        return {
-                            "transcript": trs,
-                            "tokens": result.get(
-                                "tokens",
-                                {"totalTokens": 0, "cachedContentTokenCount": 0},
-                            ),
-                        }
-        except aiohttp.ClientError as e:
+                        body = await response.read()
+                        return json.loads(body.decode("utf-8"))
+
+            result = await call_backend("transcription", request, timeout)
+            logger.debug(f"Nhận dữ liệu response hoàn chỉnh")
+            transcript = result.get("transcript", "")
+            transcript = re.sub(
+                r"\s\[\d{2}/\d{2}/\d{4} \d{2}:\d{2} (AM|PM)\]",
+                ":",
+                transcript,
+            ).strip()
+            entries = re.split(r"(?=SPEAKER_\d+:)", transcript.strip())
+
+            # Convert to desired structure
+            trs: List[Dict[str, str]] = []
+            for entry in entries:
+                match = re.match(r"(SPEAKER_\d+):\s*(.*)", entry, re.DOTALL)
+                if match:
+                    speaker = match.group(1).strip()
+                    sentence = re.sub(r"\s+", " ", match.group(2).strip())
+                    if sentence:
+                        trs.append(
+                            {
+                                "speaker": speaker,
+                                "sentence": re.sub(
+                                    r"[^a-zA-Z0-9À-ỹ\s]",
+                                    "",
+                                    sentence.lower(),
+                                ),
+                            }
+                        )
+            print("Kết quả:", trs)
+            return {
+                "transcript": trs,
+                "tokens": result.get(
+                    "tokens",
+                    {"totalTokens": 0, "cachedContentTokenCount": 0},
+                ),
+            }
+        except BackendUnavailable:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Lỗi API request: {str(e)}")
             return None
         except Exception as e:
@@ -125,32 +146,40 @@ class ASRService:
         min_speakers: Optional[int] = None,
         max_speakers: Optional[int] = None,
     ) -> Dict[str, Any]:
-        """Transcribe audio using ASR endpoint"""
+        """Transcribe audio using ASR endpoint
+
+        Raises BackendUnavailable unchanged while the ASR circuit is open.
+        """
         if not self.base_url:
             raise Exception("ASR endpoint not configured")
 
-        try:
-            async with httpx.AsyncClient(timeout=300.0) as client:
-                with open(audio_file_path, "rb") as audio_file:
-                    files = {"file": audio_file}
-                    data = {
-                        "diarize": str(diarize).lower(),
-                    }
-
-                    if min_speakers is not None:
-                        data["min_speakers"] = str(min_speakers)
-                    if max_speakers is not None:
-                        data["max_speakers"] = str(max_speakers)
-
-                    response = await client.post(
-                        f"{self.base_url}/transcribe", files=files, data=data
-                    )
-                    response.raise_for_status()
-
-                    return response.json()
+        data = {
+            "diarize": str(diarize).lower(),
+        }
+        if min_speakers is not None:
+            data["min_speakers"] = str(min_speakers)
+        if max_speakers is not None:
+            data["max_speakers"] = str(max_speakers)
+        timeout = audio_timeout(_audio_duration(audio_file_path))
+
+        async def request() -> Dict[str, Any]:
+            client = http_clients.httpx_client()
+            with open(audio_file_path, "rb") as audio_file:
+                response = await client.post(
+                    f"{self.base_url}/transcribe",
+                    files={"file": audio_file},
+                    data=data,
+                    timeout=timeout,
+                )
+                response.raise_for_status()
+                return response.json()
 
+        try:
+            return await call_backend("asr", request, timeout)
+        except BackendUnavailable:
+            raise
         except Exception as e:
-            raise Exception(f"ASR transcription failed: {str(e)}")
+            raise Exception(f"ASR transcription failed: {str(e) or type(e).__name__}")
 
 
 class SummarizationService:
@@ -164,6 +193,22 @@ class SummarizationService:
             "x-header-checksum": "fixed-checksum-that-never-changes-123456789",
         }
 
+    @property
+    def summary_endpoint(self) -> str:
+        return f"{self.base_url}/api/v2/meeting-note/post-messages"
+
+    def summary_payload(self, transcription: str, email: str | None = None) -> Dict[str, str]:
+        """Request body sent to the summary endpoint"""
+        return {"prompt": str(transcription), "email": email or ""}
+
+    def summary_signature(self) -> str:
+        """Hash of the request template, for cache keys of summaries made by this service
+
+        Changes whenever the endpoint or the shape of the prompt sent changes.
+        """
+        template = {"endpoint": self.summary_endpoint, "payload": self.summary_payload("{transcript}")}
+        return hashlib.sha256(json.dumps(template, sort_keys=True).encode("utf-8")).hexdigest()
+
     async def generate_summary(
         self, transcription: str, email: str | None = None
     ) -> str:
@@ -174,29 +219,46 @@ class SummarizationService:
             email: Email người dùng (nếu có)
         Returns:
             Summary string
+        Raises:
+            BackendUnavailable: backend đang bị ngắt (circuit open), cần thử lại sau
         """
         try:
-            endpoint = f"{self.base_url}/api/v2/meeting-note/post-messages"
-            payload = {"prompt": str(transcription)}
-            if email:
-                payload["email"] = email
-            else:
-                payload["email"] = ""
-            async with aiohttp.ClientSession() as session:
+            endpoint = self.summary_endpoint
+            payload = self.summary_payload(transcription, email)
+            timeout = settings.summary_timeout_seconds
+
+            async def request() -> str:
+                session = http_clients.aiohttp_session()
                 async with session.post(
-                    endpoint, headers=self.headers, json=payload
+                    endpoint,
+                    headers=self.headers,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
                 ) as response:
                     response.raise_for_status()
                     result = await response.json()
                     # Giả sử API trả về summary trong trường 'summary'
                     return result.get("meeting_note", "")
-        except aiohttp.ClientError as e:
+
+            return await call_backend("summary", request, timeout)
+        except BackendUnavailable:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Lỗi khi gửi post_message: {str(e)}")
-            raise Exception(f"Lỗi khi gửi post_message: {str(e)}")
+            raise Exception(f"Lỗi khi gửi post_message: {str(e) or type(e).__name__}")
         except Exception as e:
             logger.error(f"Lỗi không xác định trong generate_summary: {str(e)}")
             raise Exception(f"Lỗi không xác định trong generate_summary: {str(e)}")
 
+    async def merge_summaries(self, prompt: str) -> str:
+        """Merge partial meeting notes into one
+
+        ``prompt`` is a reduce prompt built by ``app.utils.summarization``,
+        which tells the model its input is partial notes rather than a
+        transcript; it goes to the same meeting-note endpoint.
+        """
+        return await self.generate_summary(prompt)
+
     async def chat_with_transcription(
         self,
         transcription: str,
@@ -207,22 +269,35 @@ class SummarizationService:
         if not transcription.strip():
             return "No transcription available to chat with."
 
-        # Build conversation history
-        messages = []
-
-        # Add message history if provided
-        if message_history:
-            messages.extend(message_history)
-
-        # Add current message
-        messages.append({"role": "user", "content": message})
         print(transcription)
         try:
             # Gọi chat_service (Ollama)
-            return chat_service.chat(
-                message=message, history=messages, context=transcription
-            )
+            # chat_service appends the message itself after the history
+            return await chat_service.achat(message=message, history=message_history or [], context=transcription)
+
+        except BackendUnavailable:
+            raise
+        except Exception as e:
+            raise Exception(f"Chat failed: {str(e)}")
 
+    async def stream_chat_with_transcription(
+        self,
+        transcription: str,
+        message: str,
+        message_history: List[Dict[str, str]] = None,
+    ) -> AsyncIterator[str]:
+        """Streaming variant of ``chat_with_transcription``, yields the answer as it is generated"""
+        if not transcription.strip():
+            yield "No transcription available to chat with."
+            return
+
+        try:
+            async for token in chat_service.stream_chat(
+                message=message, history=message_history or [], context=transcription
+            ):
+                yield token
+        except BackendUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Chat failed: {str(e)}")
 
@@ -288,13 +363,17 @@ class QdrantMeetingVectorStore:
             ),
         )
 
-    def ensure_indexed(self, recording_id: int, transcript: str):
+    def ensure_indexed(self, recording_id: int, transcript: str, replace: bool = False):
+        """Index the transcript lines of a recording; with ``replace``, drop an existing index first"""
         collection_name = f"meeting_{recording_id}"
         print(f"Ensuring indexing for collection: {collection_name}")
+        existing = [c.name for c in self.client.get_collections().collections]
+        if replace and collection_name in existing:
+            # Re-transcribed or edited since it was indexed
+            self.client.delete_collection(collection_name=collection_name)
+            existing.remove(collection_name)
         # Check collection exists, if not create
-        if collection_name not in [
-            c.name for c in self.client.get_collections().collections
-        ]:
+        if collection_name not in existing:
             print(
                 f"Collection {collection_name} does not exist. Creating new collection."
             )
@@ -329,7 +408,11 @@ class QdrantMeetingVectorStore:
         print(f"Adding {len(docs)} documents to vectorstore.")
         vectorstore.add_documents(documents=docs, ids=uuids)
 
-    def retrieve_context(self, recording_id: int, query: str, k: int = 4):
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding.embed_query(query)
+
+    def retrieve_context(self, recording_id: int, query: str, k: int = 4, vector: Optional[List[float]] = None):
+        """Top ``k`` transcript lines for ``query``; pass its ``vector`` if already embedded"""
         collection_name = f"meeting_{recording_id}"
         print(
             f"Retrieving context from collection: {collection_name} with query: '{query}' (top {k})"
@@ -339,7 +422,10 @@ class QdrantMeetingVectorStore:
             collection_name=collection_name,
             embedding=self.embedding,
         )
-        docs = vectorstore.similarity_search(query, k=k)
+        if vector is not None:
+            docs = vectorstore.similarity_search_by_vector(vector, k=k)
+        else:
+            docs = vectorstore.similarity_search(query, k=k)
         print(f"Retrieved {len(docs)} documents for context.")
         return "\n".join([doc.page_content for doc in docs])
 
@@ -0,0 +1,90 @@
+"""
+Per-recording cache of chat answers, matched by question similarity
+
+People chatting with the same meeting ask the same questions in slightly
+different words. Each answered question is kept with its embedding, the
+vector already computed for retrieval; a new question whose embedding is
+close enough (cosine similarity >= CHAT_ANSWER_CACHE_THRESHOLD) to a cached
+one gets that answer without retrieval or generation.
+
+Entries are tagged with a hash of the transcript they were answered from;
+once the transcript changes the recording's entries are dropped on the next
+lookup. Only questions without conversation history are cached, since the
+answer to a follow-up depends on what came before.
+
+Keys per recording:
+    chat:answers:<id>    LIST of entries (JSON), newest first
+"""
+
+import hashlib
+import json
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def key(recording_id: int) -> str:
+    return f"chat:answers:{recording_id}"
+
+
+def transcript_hash(transcript: str) -> str:
+    return hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+
+def lookup(recording_id: int, transcript_sha: str, vector: List[float]) -> Optional[str]:
+    """Cached answer to the most similar question above the threshold, or None"""
+    try:
+        entries = [json.loads(raw) for raw in redis_client.lrange(key(recording_id), 0, -1)]
+    except Exception as e:
+        logger.warning(f"Answer cache unavailable: {e}")
+        return None
+    if entries and entries[0].get("transcript") != transcript_sha:
+        invalidate(recording_id)
+        entries = []
+    entries = [entry for entry in entries if entry.get("transcript") == transcript_sha]
+    if not entries:
+        metrics.incr("chat.answer_cache.miss")
+        return None
+
+    query = np.asarray(vector, dtype=np.float32)
+    cached = np.asarray([entry["vector"] for entry in entries], dtype=np.float32)
+    norms = np.linalg.norm(cached, axis=1) * np.linalg.norm(query)
+    scores = cached @ query / np.where(norms == 0, 1, norms)
+    best = int(np.argmax(scores))
+    if scores[best] < settings.chat_answer_cache_threshold:
+        metrics.incr("chat.answer_cache.miss")
+        return None
+    metrics.incr("chat.answer_cache.hit")
+    return entries[best]["answer"]
+
+
+def store(recording_id: int, transcript_sha: str, question: str, vector: List[float], answer: str) -> None:
+    """Remember an answer; keeps the newest CHAT_ANSWER_CACHE_MAX_ENTRIES per recording"""
+    if not answer:
+        return
+    entry = json.dumps(
+        {"transcript": transcript_sha, "question": question, "vector": list(vector), "answer": answer},
+        ensure_ascii=False,
+    )
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.lpush(key(recording_id), entry)
+        pipe.ltrim(key(recording_id), 0, settings.chat_answer_cache_max_entries - 1)
+        pipe.expire(key(recording_id), settings.chat_answer_cache_ttl_seconds)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Answer cache unavailable: {e}")
+
+
+def invalidate(recording_id: int) -> None:
+    try:
+        redis_client.delete(key(recording_id))
+    except Exception as e:
+        logger.warning(f"Answer cache unavailable: {e}")
@@ -0,0 +1,442 @@
+"""
+Audio metadata probing from container headers
+
+Reads duration, sample rate and channel count for WAV, MP3, M4A/MP4, OGG
+(Opus/Vorbis), FLAC and WebM/Matroska by parsing a bounded number of header
+bytes instead of spawning ffprobe. Containers whose header does not carry a
+duration (e.g. browser-recorded WebM) return ``duration=None`` so the caller
+can fall back to ffprobe.
+"""
+
+import asyncio
+import struct
+import subprocess
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# How much of the start / end of a file we keep for probing
+HEAD_BYTES = 256 * 1024
+TAIL_BYTES = 64 * 1024
+
+# Reader signature: (offset, length) -> bytes, or None if the range is not available
+RangeReader = Callable[[int, int], Optional[bytes]]
+
+
+@dataclass
+class AudioInfo:
+    format: str
+    duration: Optional[float] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+class BufferedSource:
+    """Serves reads from the head and tail bytes of a file of known size"""
+
+    def __init__(self, head: bytes, tail: bytes = b"", total_size: Optional[int] = None) -> None:
+        self.head = head
+        self.tail = tail
+        self.total_size = total_size if total_size is not None else len(head)
+
+    def read(self, offset: int, length: int) -> Optional[bytes]:
+        end = min(offset + length, self.total_size)
+        if offset < len(self.head):
+            # A read running past the head is served short rather than not at all
+            return self.head[offset:end]
+        tail_start = self.total_size - len(self.tail)
+        if offset >= tail_start:
+            return self.tail[offset - tail_start : end - tail_start]
+        return None
+
+
+def _chain(*readers: RangeReader) -> RangeReader:
+    def read(offset: int, length: int) -> Optional[bytes]:
+        for reader in readers:
+            data = reader(offset, length)
+            if data is not None:
+                return data
+        return None
+
+    return read
+
+
+# === WAV ===
+def _probe_wav(head: bytes, total_size: int) -> Optional[AudioInfo]:
+    info = AudioInfo(format="wav")
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(head):
+        chunk_id = head[pos : pos + 4]
+        chunk_size = struct.unpack_from("<I", head, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt " and body + 16 <= len(head):
+            _, channels, sample_rate, byte_rate = struct.unpack_from("<HHII", head, body)
+            info.channels = channels
+            info.sample_rate = sample_rate
+        elif chunk_id == b"data":
+            # Streaming writers leave the size as 0 or 0xFFFFFFFF
+            if chunk_size in (0, 0xFFFFFFFF) or body + chunk_size > total_size:
+                chunk_size = total_size - body
+            if byte_rate:
+                info.duration = chunk_size / byte_rate
+            break
+        pos = body + chunk_size + (chunk_size & 1)
+    return info
+
+
+# === MP3 ===
+_MP3_BITRATES = {
+    # (mpeg1, layer3) and (mpeg2/2.5, layer3) in kbps
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _id3v2_size(head: bytes) -> int:
+    if head[:3] != b"ID3" or len(head) < 10:
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe_mp3(read: RangeReader, head: bytes, total_size: int) -> Optional[AudioInfo]:
+    start = _id3v2_size(head)
+    if start >= len(head):
+        head = read(start, 4096) or b""
+        base = start
+    else:
+        base = 0
+    pos = start - base
+    # Find the first frame sync within the buffered data
+    while pos + 4 <= len(head):
+        if head[pos] == 0xFF and (head[pos + 1] & 0xE0) == 0xE0:
+            break
+        pos += 1
+    else:
+        return None
+
+    b1, b2, b3 = head[pos + 1], head[pos + 2], head[pos + 3]
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_idx = (b2 >> 4) & 0x0F
+    sr_idx = (b2 >> 2) & 0x03
+    channel_mode = (b3 >> 6) & 0x03
+    if version_bits == 1 or layer_bits != 1 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    sample_rate = _MP3_SAMPLE_RATES[version_bits][sr_idx]
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_idx] * 1000
+    channels = 1 if channel_mode == 3 else 2
+    samples_per_frame = 1152 if mpeg1 else 576
+    info = AudioInfo(format="mp3", sample_rate=sample_rate, channels=channels)
+
+    # VBR files carry the frame count in a Xing/Info or VBRI header
+    side_info = (17 if channels == 1 else 32) if mpeg1 else (9 if channels == 1 else 17)
+    xing = pos + 4 + side_info
+    if head[xing : xing + 4] in (b"Xing", b"Info") and xing + 12 <= len(head):
+        flags = struct.unpack_from(">I", head, xing + 4)[0]
+        if flags & 0x01:
+            frames = struct.unpack_from(">I", head, xing + 8)[0]
+            info.duration = frames * samples_per_frame / sample_rate
+            return info
+    vbri = pos + 4 + 32
+    if head[vbri : vbri + 4] == b"VBRI" and vbri + 18 <= len(head):
+        frames = struct.unpack_from(">I", head, vbri + 14)[0]
+        info.duration = frames * samples_per_frame / sample_rate
+        return info
+
+    # Constant bitrate: derive from the audio payload size
+    audio_bytes = total_size - (base + pos)
+    trailer = read(total_size - 128, 128) if total_size > 128 else None
+    if trailer and trailer[:3] == b"TAG":
+        audio_bytes -= 128
+    info.duration = audio_bytes * 8 / bitrate
+    return info
+
+
+# === MP4 / M4A ===
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+# Only the start of moov is needed: mvhd and stsd come before the sample tables
+_MOOV_READ_BYTES = 64 * 1024
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1 and pos + 16 <= end:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _walk_mp4(data: bytes, start: int, end: int, info: AudioInfo) -> None:
+    for box_type, body, box_end in _iter_boxes(data, start, end):
+        if box_type in _MP4_CONTAINERS:
+            _walk_mp4(data, body, box_end, info)
+        elif box_type == b"mvhd" and body + 4 <= box_end:
+            version = data[body]
+            if version == 1 and body + 32 <= box_end:
+                timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+            elif body + 20 <= box_end:
+                timescale, duration = struct.unpack_from(">II", data, body + 12)
+            else:
+                continue
+            if timescale:
+                info.duration = duration / timescale
+        elif box_type == b"stsd" and info.sample_rate is None:
+            # Full box header (4) + entry count (4), then the first sample entry
+            entry = body + 8
+            if entry + 36 <= box_end and data[entry + 4 : entry + 8] in (b"mp4a", b"alac", b"Opus", b"fLaC", b"ac-3", b"ec-3"):
+                channels = struct.unpack_from(">H", data, entry + 24)[0]
+                sample_rate = struct.unpack_from(">I", data, entry + 32)[0] >> 16
+                info.channels = channels or None
+                info.sample_rate = sample_rate or None
+
+
+def _probe_mp4(read: RangeReader, total_size: int) -> Optional[AudioInfo]:
+    info = AudioInfo(format="m4a")
+    pos = 0
+    # Top-level boxes are few (ftyp, free, mdat, moov), so hop header to header
+    while pos + 8 <= total_size:
+        header = read(pos, 16)
+        if not header or len(header) < 8:
+            return info
+        size, box_type = struct.unpack_from(">I4s", header, 0)
+        if size == 1 and len(header) >= 16:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = total_size - pos
+        if size < 8:
+            return info
+        if box_type == b"moov":
+            moov = read(pos, min(size, _MOOV_READ_BYTES))
+            if moov:
+                _walk_mp4(moov, 0, len(moov), info)
+            return info
+        pos += size
+    return info
+
+
+# === OGG ===
+def _probe_ogg(head: bytes, tail: bytes) -> Optional[AudioInfo]:
+    if len(head) < 28:
+        return None
+    segments = head[26]
+    packet = head[27 + segments :]
+    if packet[:8] == b"OpusHead" and len(packet) >= 16:
+        channels = packet[9]
+        pre_skip = struct.unpack_from("<H", packet, 10)[0]
+        input_rate = struct.unpack_from("<I", packet, 12)[0]
+        info = AudioInfo(format="ogg", sample_rate=input_rate or 48000, channels=channels)
+        granule_rate = 48000
+    elif packet[:7] == b"\x01vorbis" and len(packet) >= 16:
+        channels = packet[11]
+        rate = struct.unpack_from("<I", packet, 12)[0]
+        info = AudioInfo(format="ogg", sample_rate=rate, channels=channels)
+        pre_skip = 0
+        granule_rate = rate
+    else:
+        return None
+
+    # Duration is the granule position of the last page
+    last = tail.rfind(b"OggS")
+    if last != -1 and last + 14 <= len(tail) and granule_rate:
+        granule = struct.unpack_from("<q", tail, last + 6)[0]
+        if granule > 0:
+            info.duration = max(granule - pre_skip, 0) / granule_rate
+    return info
+
+
+# === FLAC ===
+def _probe_flac(head: bytes) -> Optional[AudioInfo]:
+    # fLaC + metadata block header (4) + STREAMINFO; sample info starts at byte 18
+    if len(head) < 26:
+        return None
+    packed = int.from_bytes(head[18:26], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    info = AudioInfo(format="flac", sample_rate=sample_rate or None, channels=channels)
+    if sample_rate and total_samples:
+        info.duration = total_samples / sample_rate
+    return info
+
+
+# === WebM / Matroska ===
+_EBML_MASTER = {
+    0x18538067,  # Segment
+    0x1549A966,  # Info
+    0x1654AE6B,  # Tracks
+    0xAE,  # TrackEntry
+    0xE1,  # Audio
+}
+_EBML_CLUSTER = 0x1F43B675
+
+
+def _read_vint(data: bytes, pos: int, keep_marker: bool):
+    if pos >= len(data):
+        return None, pos
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(data):
+        return None, pos
+    value = first if keep_marker else first & (mask - 1)
+    for b in data[pos + 1 : pos + length]:
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return (-1 if unknown else value), pos + length
+
+
+def _walk_ebml(data: bytes, start: int, end: int, state: dict) -> None:
+    pos = start
+    while pos < end:
+        element_id, pos = _read_vint(data, pos, keep_marker=True)
+        size, body = _read_vint(data, pos, keep_marker=False)
+        if element_id is None or size is None:
+            return
+        if element_id == _EBML_CLUSTER:
+            # Media data starts here, all header elements are behind us
+            state["done"] = True
+            return
+        if size == -1:
+            size = end - body
+        box_end = min(body + size, end)
+        if element_id in _EBML_MASTER:
+            _walk_ebml(data, body, box_end, state)
+            if state.get("done"):
+                return
+        elif element_id == 0x2AD7B1:  # TimecodeScale
+            state["timecode_scale"] = int.from_bytes(data[body:box_end], "big")
+        elif element_id == 0x4489:  # Duration
+            raw = data[body:box_end]
+            if len(raw) in (4, 8):
+                state["duration"] = struct.unpack(">f" if len(raw) == 4 else ">d", raw)[0]
+        elif element_id == 0xB5 and "sample_rate" not in state:  # SamplingFrequency
+            raw = data[body:box_end]
+            if len(raw) in (4, 8):
+                state["sample_rate"] = struct.unpack(">f" if len(raw) == 4 else ">d", raw)[0]
+        elif element_id == 0x9F and "channels" not in state:  # Channels
+            state["channels"] = int.from_bytes(data[body:box_end], "big")
+        pos = body + size
+
+
+def _probe_webm(head: bytes) -> Optional[AudioInfo]:
+    # Skip the EBML header element, then walk the Segment
+    _, pos = _read_vint(head, 0, keep_marker=True)
+    size, body = _read_vint(head, pos, keep_marker=False)
+    if size is None or size < 0:
+        return None
+    state: dict = {}
+    _walk_ebml(head, body + size, len(head), state)
+    info = AudioInfo(format="webm", channels=state.get("channels"))
+    if state.get("sample_rate"):
+        info.sample_rate = int(state["sample_rate"])
+    if state.get("duration"):
+        info.duration = state["duration"] * state.get("timecode_scale", 1_000_000) / 1e9
+    return info
+
+
+def probe_audio_header(
+    head: bytes,
+    tail: bytes = b"",
+    total_size: Optional[int] = None,
+    read_range: Optional[RangeReader] = None,
+) -> Optional[AudioInfo]:
+    """Read audio metadata from container headers without decoding
+
+    Args:
+        head: First bytes of the file (``HEAD_BYTES`` is plenty for most files)
+        tail: Last bytes of the file, used by formats that keep length at the end
+        total_size: Full file size, defaults to ``len(head)``
+        read_range: Optional reader for ranges outside head/tail (e.g. MP4 moov at the end)
+    Returns:
+        AudioInfo, or None if the format is not recognised
+    """
+    total_size = total_size if total_size is not None else len(head)
+    buffered = BufferedSource(head, tail, total_size)
+    read = _chain(buffered.read, read_range) if read_range else buffered.read
+
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return _probe_wav(head, total_size)
+        if head[:4] == b"OggS":
+            return _probe_ogg(head, tail or (head if total_size <= len(head) else b""))
+        if head[:4] == b"fLaC":
+            return _probe_flac(head)
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return _probe_webm(head)
+        if head[4:8] in (b"ftyp", b"moov", b"free", b"mdat", b"wide"):
+            return _probe_mp4(read, total_size)
+        if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+            return _probe_mp3(read, head, total_size)
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
+
+
+def ffprobe_duration(source: str) -> Optional[float]:
+    """Get duration with ffprobe, ``source`` may be a path or URL"""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                source,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        return float(result.stdout.strip())
+    except Exception as e:
+        print("[ERROR READING FILE LENGTH]: ", e)
+        return None
+
+
+async def probe_audio(
+    head: bytes,
+    tail: bytes = b"",
+    total_size: Optional[int] = None,
+    read_range: Optional[RangeReader] = None,
+    fallback_source: Optional[Callable[[], str]] = None,
+) -> Optional[AudioInfo]:
+    """Probe headers in-process and fall back to ffprobe in a worker thread
+
+    ``fallback_source`` is only called when the header has no duration, so
+    building e.g. a presigned URL is skipped on the fast path.
+    """
+    if read_range is not None:
+        # Range reads may hit the network, keep them off the event loop
+        info = await asyncio.to_thread(probe_audio_header, head, tail, total_size, read_range)
+    else:
+        info = probe_audio_header(head, tail, total_size)
+    if info is not None and info.duration is not None:
+        return info
+    if fallback_source is None:
+        return info
+
+    duration = await asyncio.to_thread(lambda: ffprobe_duration(fallback_source()))
+    if info is None:
+        info = AudioInfo(format="unknown")
+    info.duration = duration
+    return info
@@ -0,0 +1,166 @@
+"""
+Audio preparation for the ASR pipeline
+"""
+
+import io
+import json
+import logging
+import os
+import subprocess
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.utils.audio_meta import HEAD_BYTES, TAIL_BYTES, ffprobe_duration, probe_audio_header
+from app.utils.vad import VadResult, offset_map_to_json, trim_silence
+
+logger = logging.getLogger(__name__)
+
+# codec -> (file extension, ffmpeg encoder arguments)
+_CODECS = {
+    "opus": ("ogg", ["-c:a", "libopus", "-application", "voip"]),
+    "flac": ("flac", ["-c:a", "flac", "-sample_fmt", "s16"]),
+}
+
+
+def normalized_object_name(object_name: str) -> str:
+    """Object name of the cached ASR copy, encoding settings are part of the name"""
+    codec = settings.asr_normalize_codec
+    ext = _CODECS[codec][0]
+    variant = f"{settings.asr_normalize_sample_rate // 1000}k-mono"
+    if codec == "opus":
+        variant += f"-{settings.asr_opus_bitrate}"
+    return f"normalized/{object_name}.{variant}.{ext}"
+
+
+def transcode_for_asr(src_path: str, dst_path: str) -> None:
+    """Transcode any audio/video input to mono speech audio at the ASR sample rate"""
+    codec = settings.asr_normalize_codec
+    if codec not in _CODECS:
+        raise ValueError(f"Unsupported ASR codec: {codec}")
+    args = list(_CODECS[codec][1])
+    if codec == "opus":
+        args += ["-b:a", settings.asr_opus_bitrate]
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-y",
+            "-v",
+            "error",
+            "-i",
+            src_path,
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(settings.asr_normalize_sample_rate),
+            *args,
+            dst_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+
+def asr_extension() -> str:
+    """File extension of audio encoded for ASR"""
+    return _CODECS[settings.asr_normalize_codec][0]
+
+
+def fetch_audio_for_asr(bucket_name: str, object_name: str, temp_dir: str) -> Tuple[str, str]:
+    """Download the audio to send to ASR
+
+    The normalized copy cached in MinIO is preferred, so retries and re-runs
+    download the small file and skip transcoding. Returns the local path and
+    the object that was downloaded.
+    """
+    from app.utils.minio import minio_client
+
+    if settings.asr_normalize_audio:
+        norm_object = normalized_object_name(object_name)
+        if minio_client.stat_object(bucket_name, norm_object) is not None:
+            norm_path = os.path.join(temp_dir, os.path.basename(norm_object))
+            minio_client.download_file(bucket_name, norm_object, norm_path)
+            return norm_path, norm_object
+
+    original_path = os.path.join(temp_dir, os.path.basename(object_name))
+    minio_client.download_file(bucket_name, object_name, original_path)
+    return original_path, object_name
+
+
+def normalize_for_asr(audio_path: str, bucket_name: str, object_name: str, temp_dir: str) -> str:
+    """Transcode a fetched file for ASR and cache the result in MinIO
+
+    A file that already is the normalized copy is returned as is. If
+    transcoding fails the original upload is used unchanged.
+    """
+    from app.utils.minio import minio_client
+
+    norm_object = normalized_object_name(object_name)
+    norm_path = os.path.join(temp_dir, os.path.basename(norm_object))
+    if not settings.asr_normalize_audio or audio_path == norm_path:
+        return audio_path
+
+    try:
+        transcode_for_asr(audio_path, norm_path)
+    except Exception as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        logger.warning(f"Transcoding {object_name} for ASR failed, using original: {e} {stderr.decode(errors='ignore')}")
+        return audio_path
+
+    original_size = os.path.getsize(audio_path)
+    norm_size = os.path.getsize(norm_path)
+    logger.info(f"Normalized {object_name} for ASR: {original_size} -> {norm_size} bytes")
+    try:
+        minio_client.upload_file(norm_path, bucket_name, norm_object)
+    except Exception as e:
+        logger.warning(f"Caching normalized audio {norm_object} failed: {e}")
+    os.remove(audio_path)
+    return norm_path
+
+
+def apply_vad(audio_path: str, bucket_name: str, object_name: str, temp_dir: str) -> Tuple[str, Optional[VadResult]]:
+    """Trim silence from the ASR input
+
+    Returns the path to send to ASR and the VAD result (None if VAD is
+    disabled or failed). The offset map is stored in MinIO as
+    ``vad/<object>.json`` so transcript timestamps can be mapped back later.
+    """
+    from app.utils.minio import minio_client
+
+    if not settings.vad_enabled:
+        return audio_path, None
+
+    speech_path = os.path.join(temp_dir, "speech.wav")
+    try:
+        result = trim_silence(audio_path, speech_path, settings.asr_normalize_sample_rate)
+    except Exception as e:
+        logger.warning(f"VAD failed for {object_name}, using untrimmed audio: {e}")
+        return audio_path, None
+
+    logger.info(f"VAD removed {result.removed_ratio:.1%} of {object_name} ({result.original_duration:.0f}s -> {result.speech_duration:.0f}s)")
+    try:
+        payload = json.dumps(offset_map_to_json(result)).encode("utf-8")
+        minio_client.upload_stream(io.BytesIO(payload), bucket_name, f"vad/{object_name}.json", "application/json")
+    except Exception as e:
+        logger.warning(f"Storing VAD offset map for {object_name} failed: {e}")
+
+    # Not worth sending a re-encoded file for a small saving, and never send nothing
+    if not result.speech_duration or result.removed_ratio < settings.vad_min_removed_ratio:
+        os.remove(speech_path)
+        return audio_path, result
+    return speech_path, result
+
+
+def local_audio_duration(path: str) -> Optional[float]:
+    """Duration of a local audio file from its headers, ffprobe as fallback"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+        f.seek(max(size - TAIL_BYTES, 0))
+        tail = f.read(TAIL_BYTES)
+    info = probe_audio_header(head, tail, size)
+    if info is not None and info.duration is not None:
+        return info.duration
+    return ffprobe_duration(path)
@@ -0,0 +1,28 @@
+"""
+Bounded thread pool for blocking calls made from async request handlers
+
+Qdrant lookups, embedding requests and SQLAlchemy queries on the chat path
+are synchronous. Running them here keeps the event loop free for other
+requests, and the pool size caps how many run at once so a burst of chats
+queues up instead of taking every thread of the process.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.blocking_pool_size),
+    thread_name_prefix="blocking",
+)
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run ``func(*args, **kwargs)`` on the pool and wait for it without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,273 @@
+"""
+Parallel chunked transcription for long recordings
+
+Long audio is split into bounded-length chunks, preferably at silence
+boundaries found by VAD, and the chunks are transcribed concurrently with a
+configurable fan-out. Each chunk starts a few seconds before its cut point so
+neighbouring chunks share some speech; that overlap is used to drop duplicated
+sentences and to reconcile per-chunk speaker labels (SPEAKER_00 in one chunk
+is not necessarily SPEAKER_00 in the next). Failed chunks are retried on
+their own, and finished chunks can be checkpointed so a requeued task only
+transcribes the rest.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import subprocess
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.resilience import BackendUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Trailing/leading segments compared between neighbouring chunks
+_OVERLAP_SEGMENTS = 6
+_MATCH_RATIO = 0.6
+
+TranscribeFn = Callable[[str], Awaitable[Any]]
+
+
+def plan_chunks(
+    duration: float,
+    cut_points: List[float],
+    max_chunk_s: float,
+    overlap_s: float,
+) -> List[Tuple[float, float]]:
+    """Split [0, duration] into chunks no longer than ``max_chunk_s``
+
+    Cuts are taken at the latest silence boundary that keeps the chunk within
+    bounds, falling back to a hard cut when there is none. Every chunk after
+    the first starts ``overlap_s`` before its cut point.
+    """
+    cut_points = sorted(p for p in cut_points if 0 < p < duration)
+    min_chunk_s = max_chunk_s / 4
+    chunks = []
+    pos = 0.0
+    while duration - pos > max_chunk_s:
+        limit = pos + max_chunk_s
+        candidates = [p for p in cut_points if pos + min_chunk_s <= p <= limit - overlap_s]
+        cut = candidates[-1] if candidates else limit - overlap_s
+        chunks.append((max(pos - overlap_s, 0.0) if chunks else 0.0, cut))
+        pos = cut
+    chunks.append((max(pos - overlap_s, 0.0) if chunks else 0.0, duration))
+    return chunks
+
+
+def cut_chunk(src_path: str, dst_path: str, start: float, end: float) -> None:
+    """Extract [start, end) of the audio as 16 kHz mono FLAC"""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-y",
+            "-v",
+            "error",
+            "-ss",
+            f"{start:.3f}",
+            "-t",
+            f"{end - start:.3f}",
+            "-i",
+            src_path,
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(settings.asr_normalize_sample_rate),
+            "-c:a",
+            "flac",
+            dst_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", str(text).lower())).strip()
+
+
+def _segment_text(segment: Any) -> str:
+    if isinstance(segment, dict):
+        return segment.get("sentence") or segment.get("text") or ""
+    return str(segment)
+
+
+def _reconcile(
+    previous: List[Dict[str, Any]],
+    current: List[Dict[str, Any]],
+    known_speakers: List[str],
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """Align ``current`` with the tail of ``previous`` (already in global labels)
+
+    Returns ``current`` with the duplicated overlap dropped, plus the mapping
+    from this chunk's speaker labels to global labels.
+    """
+    tail = previous[-_OVERLAP_SEGMENTS:]
+    head = current[:_OVERLAP_SEGMENTS]
+    votes: Dict[str, Counter] = {}
+    last_match = -1
+    for j, seg in enumerate(head):
+        text = _normalize(_segment_text(seg))
+        if not text:
+            continue
+        for prev_seg in tail:
+            if SequenceMatcher(None, text, _normalize(_segment_text(prev_seg))).ratio() >= _MATCH_RATIO:
+                last_match = j
+                local, known = seg.get("speaker"), prev_seg.get("speaker")
+                if local and known:
+                    votes.setdefault(local, Counter())[known] += 1
+                break
+
+    # Overlap evidence first, then keep the label as-is when it is free
+    mapping: Dict[str, str] = {}
+    for local, counter in votes.items():
+        for known, _ in counter.most_common():
+            if known not in mapping.values():
+                mapping[local] = known
+                break
+    for local in dict.fromkeys(seg.get("speaker") for seg in current if seg.get("speaker")):
+        if local in mapping:
+            continue
+        if local not in mapping.values():
+            mapping[local] = local
+        else:
+            free = [s for s in known_speakers if s not in mapping.values()]
+            if free:
+                mapping[local] = free[0]
+            else:
+                n = len(known_speakers)
+                while f"SPEAKER_{n:02d}" in known_speakers or f"SPEAKER_{n:02d}" in mapping.values():
+                    n += 1
+                mapping[local] = f"SPEAKER_{n:02d}"
+    return current[last_match + 1 :], mapping
+
+
+def stitch_transcripts(parts: List[Tuple[float, Any]]) -> Any:
+    """Join per-chunk transcripts in order
+
+    ``parts`` is a list of (chunk_start_s, transcript). Segment timestamps are
+    shifted onto the full timeline and speaker labels reconciled.
+    """
+    if all(isinstance(t, str) for _, t in parts):
+        return "\n".join(t for _, t in parts if t)
+
+    stitched: List[Dict[str, Any]] = []
+    known_speakers: List[str] = []
+    for chunk_start, transcript in parts:
+        segments = [dict(s) for s in (transcript or []) if isinstance(s, dict)]
+        for seg in segments:
+            for key in ("start", "end"):
+                if isinstance(seg.get(key), (int, float)):
+                    seg[key] = round(seg[key] + chunk_start, 3)
+        if stitched:
+            segments, mapping = _reconcile(stitched, segments, known_speakers)
+        else:
+            mapping = {s.get("speaker"): s.get("speaker") for s in segments if s.get("speaker")}
+        for seg in segments:
+            if seg.get("speaker") in mapping:
+                seg["speaker"] = mapping[seg["speaker"]]
+        for speaker in mapping.values():
+            if speaker not in known_speakers:
+                known_speakers.append(speaker)
+        stitched.extend(segments)
+    return stitched
+
+
+async def _transcribe_with_retry(transcribe: TranscribeFn, path: str, index: int) -> Any:
+    attempts = settings.asr_chunk_retries + 1
+    for attempt in range(1, attempts + 1):
+        try:
+            transcript = await transcribe(path)
+            if transcript is None:
+                raise Exception("empty ASR response")
+            return transcript
+        except BackendUnavailable:
+            raise
+        except Exception as e:
+            if attempt == attempts:
+                raise Exception(f"Chunk {index} failed after {attempts} attempts: {e}")
+            delay = min(2**attempt, 30) * (0.5 + random.random())
+            logger.warning(f"Chunk {index} attempt {attempt} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def chunk_key(start: float, end: float) -> str:
+    """Identifies a planned chunk in checkpoints of finished chunks"""
+    return f"{start:.3f}-{end:.3f}"
+
+
+async def transcribe_chunked(
+    audio_path: str,
+    duration: float,
+    transcribe: TranscribeFn,
+    temp_dir: str,
+    cut_points: Optional[List[float]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    completed: Optional[Dict[str, Any]] = None,
+    on_chunk: Optional[Callable[[str, Any], None]] = None,
+) -> Any:
+    """Transcribe ``audio_path`` in parallel chunks and return the stitched transcript
+
+    Args:
+        audio_path: Local audio file
+        duration: Its duration in seconds
+        transcribe: Coroutine taking a chunk path and returning its transcript
+        temp_dir: Where chunk files are written
+        cut_points: Preferred split times (silence boundaries) in seconds
+        progress: Optional callback(done, total) as chunks finish, run in a
+            thread like ``on_chunk``
+        completed: Transcripts of chunks finished by an earlier attempt, by
+            ``chunk_key``; these are not transcribed again
+        on_chunk: Optional callback(chunk_key, transcript) as chunks finish,
+            run in a thread so it may block, e.g. to checkpoint
+    """
+    chunks = plan_chunks(duration, cut_points or [], settings.asr_chunk_max_seconds, settings.asr_chunk_overlap_seconds)
+    keys = [chunk_key(start, end) for start, end in chunks]
+    transcripts: List[Any] = [(completed or {}).get(key) for key in keys]
+    pending = [i for i, transcript in enumerate(transcripts) if transcript is None]
+    logger.info(f"Transcribing {audio_path} ({duration:.0f}s) in {len(chunks)} chunks" + (f", {len(chunks) - len(pending)} already done" if len(pending) < len(chunks) else ""))
+
+    paths: Dict[int, str] = {}
+    semaphore = asyncio.Semaphore(max(1, settings.asr_chunk_concurrency))
+    done = len(chunks) - len(pending)
+
+    async def run(i: int) -> None:
+        nonlocal done
+        async with semaphore:
+            transcripts[i] = await _transcribe_with_retry(transcribe, paths[i], i)
+        if on_chunk:
+            await asyncio.to_thread(on_chunk, keys[i], transcripts[i])
+        done += 1
+        if progress:
+            # Reporting touches Redis; keep it off the shared worker loop
+            await asyncio.to_thread(progress, done, len(chunks))
+
+    try:
+        for i in pending:
+            start, end = chunks[i]
+            path = os.path.join(temp_dir, f"chunk_{i:04d}.flac")
+            paths[i] = path
+            await asyncio.to_thread(cut_chunk, audio_path, path, start, end)
+
+        tasks = [asyncio.ensure_future(run(i)) for i in pending]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One chunk failed (or we were cancelled): stop the others before
+            # their files go away, and free their backend slots
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+    return stitch_transcripts([(start, t) for (start, _), t in zip(chunks, transcripts)])
@@ -0,0 +1,99 @@
+"""
+Per-user fair-share queue for transcription work, kept in Redis
+
+Each user has a sorted set of pending recordings and users are served in
+round-robin order of when they were last served. A user who queued 200 files
+gets one dispatched, then every other waiting user gets one, and so on.
+
+Keys:
+    fairq:users          ZSET user_id -> last served time (0 = never)
+    fairq:user:<user_id> ZSET recording_id -> priority score (lower first)
+    fairq:items          HASH recording_id -> JSON task arguments
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import redis_client
+
+USERS_KEY = "fairq:users"
+USER_KEY_PREFIX = "fairq:user:"
+ITEMS_KEY = "fairq:items"
+
+# Short recordings sort ahead of every long one queued by the same user
+_LONG_TIER = 10_000_000_000
+
+# Pop the next item of the least recently served user atomically, so a push
+# can never land in a user queue that is being dropped from the rotation.
+_POP_SCRIPT = redis_client.register_script(
+    """
+    local users = redis.call('ZRANGE', KEYS[1], 0, 0)
+    if #users == 0 then
+        return nil
+    end
+    local user_id = users[1]
+    local user_key = ARGV[1] .. user_id
+    local popped = redis.call('ZPOPMIN', user_key)
+    if redis.call('ZCARD', user_key) == 0 then
+        redis.call('ZREM', KEYS[1], user_id)
+    else
+        redis.call('ZADD', KEYS[1], ARGV[2], user_id)
+    end
+    if #popped == 0 then
+        return {user_id}
+    end
+    local item = redis.call('HGET', KEYS[2], popped[1])
+    redis.call('HDEL', KEYS[2], popped[1])
+    return {user_id, popped[1], item}
+    """
+)
+
+
+def priority_score(enqueued_at: float, duration: Optional[float]) -> float:
+    threshold = settings.fair_short_priority_seconds
+    is_short = threshold > 0 and duration is not None and duration <= threshold
+    return enqueued_at if is_short else _LONG_TIER + enqueued_at
+
+
+def push(user_id: int, recording_id: int, duration: Optional[float], payload: Dict[str, Any]) -> None:
+    """Queue a recording for ``user_id``"""
+    enqueued_at = time.time()
+    item = json.dumps({"user_id": user_id, "enqueued_at": enqueued_at, **payload})
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(ITEMS_KEY, recording_id, item)
+    pipe.zadd(f"{USER_KEY_PREFIX}{user_id}", {recording_id: priority_score(enqueued_at, duration)})
+    pipe.zadd(USERS_KEY, {user_id: 0}, nx=True)
+    pipe.execute()
+
+
+def pop(limit: int) -> List[Dict[str, Any]]:
+    """Take up to ``limit`` items, interleaved across users"""
+    items = []
+    while len(items) < limit:
+        result = _POP_SCRIPT(keys=[USERS_KEY, ITEMS_KEY], args=[USER_KEY_PREFIX, time.time()])
+        if result is None:
+            break
+        if len(result) < 3 or result[2] is None:
+            continue
+        item = json.loads(result[2])
+        item["recording_id"] = int(result[1])
+        items.append(item)
+    return items
+
+
+def remove(user_id: int, recording_id: int) -> None:
+    """Drop a recording that is still waiting (e.g. deleted before dispatch)"""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.zrem(f"{USER_KEY_PREFIX}{user_id}", recording_id)
+    pipe.hdel(ITEMS_KEY, recording_id)
+    pipe.execute()
+
+
+def stats() -> Dict[str, int]:
+    users = redis_client.zrange(USERS_KEY, 0, -1)
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id in users:
+        pipe.zcard(f"{USER_KEY_PREFIX}{user_id}")
+    return {"users": len(users), "pending": sum(pipe.execute()) if users else 0}
@@ -0,0 +1,72 @@
+"""
+Pooled keep-alive HTTP clients shared by the AI services
+
+Clients are bound to the event loop they were created on, so one set is kept
+per loop: the worker runtime loop in Celery, the uvicorn loop in the API.
+Reusing them saves the TCP/TLS handshake and DNS lookup on every call.
+"""
+
+import asyncio
+import weakref
+from typing import Dict
+
+import aiohttp
+import httpx
+
+from app.core.config import settings
+
+
+class HttpClientPool:
+    def __init__(self) -> None:
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, object]]" = weakref.WeakKeyDictionary()
+
+    def _loop_clients(self) -> Dict[str, object]:
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            clients = {}
+            self._clients[loop] = clients
+        return clients
+
+    def aiohttp_session(self) -> aiohttp.ClientSession:
+        """Shared aiohttp session for the running loop"""
+        clients = self._loop_clients()
+        session = clients.get("aiohttp")
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.http_pool_size,
+                ttl_dns_cache=300,
+                keepalive_timeout=settings.http_keepalive_seconds,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None))
+            clients["aiohttp"] = session
+        return session
+
+    def httpx_client(self) -> httpx.AsyncClient:
+        """Shared httpx client for the running loop"""
+        clients = self._loop_clients()
+        client = clients.get("httpx")
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.http_pool_size,
+                    max_keepalive_connections=settings.http_pool_size,
+                    keepalive_expiry=settings.http_keepalive_seconds,
+                ),
+                timeout=httpx.Timeout(300.0),
+            )
+            clients["httpx"] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close the clients of the running loop"""
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        session = clients.get("aiohttp")
+        if session is not None and not session.closed:
+            await session.close()
+        client = clients.get("httpx")
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+http_clients = HttpClientPool()
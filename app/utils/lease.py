@@ -0,0 +1,88 @@
+"""
+Exclusive, self-renewing leases in Redis
+
+Used to make sure only one execution of a pipeline stage runs at a time for
+a recording, whichever task delivery it comes from (client retries, broker
+redeliveries after a crash, duplicate dispatches). The holder renews the
+lease while it works, so if its process dies the lease expires after
+``ttl`` seconds and a redelivered task can take over.
+
+If Redis is unavailable the block runs without a lease rather than failing.
+"""
+
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+_RENEW_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+)
+
+_RELEASE_SCRIPT = redis_client.register_script(
+    """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+)
+
+
+class LeaseBusy(Exception):
+    """Someone else holds the lease; it expires within ``retry_after`` seconds"""
+
+    def __init__(self, key: str, retry_after: float) -> None:
+        super().__init__(f"{key} is held by another worker, retry in {retry_after:.0f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+@contextmanager
+def lease(key: str, ttl: int):
+    """Hold ``key`` exclusively for the duration of the block
+
+    Raises:
+        LeaseBusy: The lease is held by someone else
+    """
+    token = uuid.uuid4().hex
+    try:
+        acquired = redis_client.set(key, token, nx=True, ex=ttl)
+        remaining = None if acquired else redis_client.ttl(key)
+    except Exception as e:
+        logger.warning(f"Lease {key} unavailable, running without it: {e}")
+        yield
+        return
+    if not acquired:
+        raise LeaseBusy(key, max(remaining or 0, 1))
+
+    stop = threading.Event()
+
+    def renew_forever():
+        while not stop.wait(ttl / 3):
+            try:
+                if not _RENEW_SCRIPT(keys=[key], args=[token, ttl]):
+                    logger.warning(f"Lease {key} was lost while held")
+                    return
+            except Exception as e:
+                logger.warning(f"Renewing lease {key} failed: {e}")
+
+    renewer = threading.Thread(target=renew_forever, name=f"lease-{key}", daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        try:
+            _RELEASE_SCRIPT(keys=[key], args=[token])
+        except Exception as e:
+            logger.warning(f"Releasing lease {key} failed: {e}")
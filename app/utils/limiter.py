@@ -0,0 +1,192 @@
+"""
+Cluster-wide concurrency limits for external ASR and LLM backends
+
+A fair counting semaphore in Redis bounds how many calls every API and worker
+process together make to one backend. Callers over the limit wait in arrival
+order instead of failing. Holders renew their slot while the call runs, so a
+crashed process frees it when its lease expires.
+
+Keys per backend:
+    limiter:<name>:holders  ZSET token -> lease expiry
+    limiter:<name>:waiters  ZSET token -> arrival time (queue order)
+    limiter:<name>:seen     ZSET token -> last poll time (drops dead waiters)
+
+Redis is reached through the asyncio client, so polling for a slot never
+blocks the event loop. If Redis is unavailable the call proceeds unlimited
+rather than failing.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.redis import async_redis_client
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_ACQUIRE_SCRIPT = async_redis_client.register_script(
+    """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local limit = tonumber(ARGV[1])
+    local lease = tonumber(ARGV[2])
+    local token = ARGV[3]
+    local stale = tonumber(ARGV[4])
+
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    local gone = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - stale)
+    for _, waiter in ipairs(gone) do
+        redis.call('ZREM', KEYS[2], waiter)
+        redis.call('ZREM', KEYS[3], waiter)
+    end
+
+    if redis.call('ZSCORE', KEYS[1], token) then
+        return 1
+    end
+    redis.call('ZADD', KEYS[2], 'NX', now, token)
+    redis.call('ZADD', KEYS[3], now, token)
+
+    local free = limit - redis.call('ZCARD', KEYS[1])
+    if free > 0 and redis.call('ZRANK', KEYS[2], token) < free then
+        redis.call('ZREM', KEYS[2], token)
+        redis.call('ZREM', KEYS[3], token)
+        redis.call('ZADD', KEYS[1], now + lease, token)
+        return 1
+    end
+    return 0
+    """
+)
+
+_RENEW_SCRIPT = async_redis_client.register_script(
+    """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    return redis.call('ZADD', KEYS[1], 'XX', 'CH', now + tonumber(ARGV[1]), ARGV[2])
+    """
+)
+
+
+class DistributedSemaphore:
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.holders_key = f"limiter:{name}:holders"
+        self.waiters_key = f"limiter:{name}:waiters"
+        self.seen_key = f"limiter:{name}:seen"
+
+    @property
+    def lease_seconds(self) -> float:
+        return settings.limiter_lease_seconds
+
+    async def _try_acquire(self, token: str) -> bool:
+        # A waiter that has not polled for a few poll intervals is considered gone
+        stale = max(settings.limiter_poll_max_seconds * 5, 10)
+        result = await _ACQUIRE_SCRIPT(
+            keys=[self.holders_key, self.waiters_key, self.seen_key],
+            args=[self.limit, self.lease_seconds, token, stale],
+        )
+        return bool(result)
+
+    async def _renew(self, token: str) -> None:
+        try:
+            await _RENEW_SCRIPT(keys=[self.holders_key], args=[self.lease_seconds, token])
+        except Exception as e:
+            logger.warning(f"Renewing {self.name} limiter slot failed: {e}")
+
+    async def _release(self, token: str) -> None:
+        try:
+            async with async_redis_client.pipeline(transaction=True) as pipe:
+                pipe.zrem(self.holders_key, token)
+                pipe.zrem(self.waiters_key, token)
+                pipe.zrem(self.seen_key, token)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Releasing {self.name} limiter slot failed: {e}")
+
+    def _delays(self):
+        delay = 0.05
+        while True:
+            yield delay * (0.5 + random.random())
+            delay = min(delay * 2, settings.limiter_poll_max_seconds)
+
+    async def _record(self, started: float, waited: bool) -> None:
+        await metrics.aincr(f"limiter.{self.name}.acquired")
+        if waited:
+            await metrics.aincr(f"limiter.{self.name}.waited")
+            await metrics.aincr(f"limiter.{self.name}.wait_seconds", time.monotonic() - started)
+
+    async def _acquire_async(self, token: str) -> bool:
+        started = time.monotonic()
+        waited = False
+        try:
+            for delay in self._delays():
+                if await self._try_acquire(token):
+                    break
+                waited = True
+                await asyncio.sleep(delay)
+        except Exception as e:
+            logger.warning(f"{self.name} limiter unavailable, calling unlimited: {e}")
+            return False
+        await self._record(started, waited)
+        return True
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """Hold one slot for the duration of the block, waiting for it if needed"""
+        token = uuid.uuid4().hex
+        if not await self._acquire_async(token):
+            yield
+            return
+
+        async def renew_forever():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                await self._renew(token)
+
+        renewer = asyncio.ensure_future(renew_forever())
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            await self._release(token)
+
+
+def backend_limits() -> Dict[str, int]:
+    return {
+        "asr": settings.limit_asr_concurrency,
+        "transcription": settings.limit_transcription_concurrency,
+        "summary": settings.limit_summary_concurrency,
+        "llm": settings.limit_llm_concurrency,
+    }
+
+
+_semaphores: Dict[str, DistributedSemaphore] = {}
+
+
+def get_semaphore(backend: str) -> Optional[DistributedSemaphore]:
+    """Semaphore of a backend, or None when it is unlimited (limit 0)"""
+    limit = backend_limits()[backend]
+    if limit <= 0:
+        return None
+    semaphore = _semaphores.get(backend)
+    if semaphore is None or semaphore.limit != limit:
+        semaphore = DistributedSemaphore(backend, limit)
+        _semaphores[backend] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def backend_slot(backend: str):
+    """Hold one ``backend`` slot for the duration of the block"""
+    semaphore = get_semaphore(backend)
+    if semaphore is None:
+        yield
+        return
+    async with semaphore.slot_async():
+        yield
@@ -0,0 +1,60 @@
+"""
+Lightweight pipeline counters stored in Redis
+
+Counters live in a single Redis hash so the API and every worker process add
+to the same totals. Recording a metric never raises: a Redis outage must not
+fail a pipeline task. Code running on an event loop uses ``aincr`` so the
+round trip does not block the loop.
+"""
+
+import json
+import logging
+from typing import Any, Dict
+
+from app.core.redis import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "metrics:counters"
+
+
+def incr(name: str, amount: float = 1) -> None:
+    try:
+        if isinstance(amount, int):
+            redis_client.hincrby(METRICS_KEY, name, amount)
+        else:
+            redis_client.hincrbyfloat(METRICS_KEY, name, amount)
+    except Exception as e:
+        logger.warning(f"Failed to record metric {name}: {e}")
+
+
+async def aincr(name: str, amount: float = 1) -> None:
+    """Async variant of ``incr``"""
+    try:
+        if isinstance(amount, int):
+            await async_redis_client.hincrby(METRICS_KEY, name, amount)
+        else:
+            await async_redis_client.hincrbyfloat(METRICS_KEY, name, amount)
+    except Exception as e:
+        logger.warning(f"Failed to record metric {name}: {e}")
+
+
+def get_counters() -> Dict[str, float]:
+    try:
+        raw = redis_client.hgetall(METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to read metrics: {e}")
+        return {}
+    return {name: float(value) for name, value in sorted(raw.items())}
+
+
+def json_size(value: Any) -> int:
+    """Size in bytes of ``value`` as Celery's JSON serializer would send it"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def record_handoff(stage: str, message: Any, payload: Any) -> None:
+    """Count a stage handoff: bytes actually sent vs. the payload left in storage"""
+    incr(f"handoff.{stage}.count")
+    incr(f"handoff.{stage}.message_bytes", json_size(message))
+    incr(f"handoff.{stage}.payload_bytes_avoided", json_size(payload))
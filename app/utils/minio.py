@@ -1,12 +1,51 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import BinaryIO, List, Optional
+
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
 
 from app.core.config import settings
 
 
+class MultipartMinio(Minio):
+    """Minio client exposing the low-level multipart upload calls
+
+    minio-py keeps these private (``put_object`` drives them internally), so
+    they may change in any release. This adapter is the only code calling
+    them; minio is pinned in requirements.txt, re-check these signatures
+    before upgrading it.
+    """
+
+    def create_multipart_upload(self, bucket_name: str, object_name: str, headers: dict) -> str:
+        return self._create_multipart_upload(bucket_name, object_name, headers)
+
+    def upload_part(self, bucket_name: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        return self._upload_part(bucket_name, object_name, data, None, upload_id, part_number)
+
+    def list_parts(self, bucket_name: str, object_name: str, upload_id: str, part_number_marker: Optional[str] = None):
+        return self._list_parts(bucket_name, object_name, upload_id, part_number_marker=part_number_marker)
+
+    def complete_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str, parts: List[Part]):
+        return self._complete_multipart_upload(bucket_name, object_name, upload_id, parts)
+
+    def abort_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str) -> None:
+        self._abort_multipart_upload(bucket_name, object_name, upload_id)
+
+
 class MinIOClient:
     def __init__(self):
-        self.client = Minio(settings.minio_endpoint, access_key=settings.minio_access_key, secret_key=settings.minio_secret_key, secure=settings.minio_secure)
+        self.client = MultipartMinio(settings.minio_endpoint, access_key=settings.minio_access_key, secret_key=settings.minio_secret_key, secure=settings.minio_secure)
+        # URLs handed to browsers must be signed for the host they will call.
+        # Region is fixed so signing never needs a round trip to the server.
+        self.public_client = Minio(
+            settings.minio_public_endpoint or settings.minio_endpoint,
+            access_key=settings.minio_access_key,
+            secret_key=settings.minio_secret_key,
+            secure=settings.minio_public_secure if settings.minio_public_endpoint else settings.minio_secure,
+            region=settings.minio_region,
+        )
 
     def ensure_bucket_exists(self, bucket_name: str):
         """Create bucket if it doesn't exist"""
@@ -24,6 +63,102 @@ class MinIOClient:
             print(f"Error uploading to MinIO: {e}")
             raise
 
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        bucket_name: str,
+        object_name: str,
+        content_type: Optional[str] = None,
+        part_size: Optional[int] = None,
+    ):
+        """Upload a stream of unknown length to MinIO as a multipart upload
+
+        Parts are read and sent one at a time so memory stays bounded to a
+        single part regardless of the object size.
+        """
+        try:
+            self.ensure_bucket_exists(bucket_name)
+            result = self.client.put_object(
+                bucket_name,
+                object_name,
+                stream,
+                length=-1,
+                content_type=content_type or "application/octet-stream",
+                part_size=part_size or settings.upload_part_size,
+                num_parallel_uploads=1,
+            )
+            return {"bucket_name": bucket_name, "object_name": object_name, "etag": result.etag, "version_id": result.version_id}
+        except S3Error as e:
+            print(f"Error uploading to MinIO: {e}")
+            raise
+
+    def create_multipart_upload(self, bucket_name: str, object_name: str, content_type: Optional[str] = None) -> str:
+        """Start a multipart upload and return its upload id"""
+        self.ensure_bucket_exists(bucket_name)
+        headers = {"Content-Type": content_type or "application/octet-stream"}
+        return self.client.create_multipart_upload(bucket_name, object_name, headers)
+
+    def upload_part(self, bucket_name: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Upload one part of a multipart upload and return its etag"""
+        return self.client.upload_part(bucket_name, object_name, upload_id, part_number, data)
+
+    def list_parts(self, bucket_name: str, object_name: str, upload_id: str) -> List[Part]:
+        """List all parts received so far for a multipart upload"""
+        parts: List[Part] = []
+        marker = None
+        while True:
+            result = self.client.list_parts(bucket_name, object_name, upload_id, part_number_marker=marker)
+            parts.extend(result.parts)
+            if not result.is_truncated or result.next_part_number_marker is None:
+                return parts
+            marker = str(result.next_part_number_marker)
+
+    def complete_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str, parts: List[Part]):
+        """Assemble the uploaded parts into the final object"""
+        result = self.client.complete_multipart_upload(bucket_name, object_name, upload_id, [Part(p.part_number, p.etag) for p in parts])
+        return {"bucket_name": bucket_name, "object_name": object_name, "etag": result.etag, "version_id": result.version_id}
+
+    def abort_multipart_upload(self, bucket_name: str, object_name: str, upload_id: str):
+        """Abort a multipart upload and drop its parts"""
+        self.client.abort_multipart_upload(bucket_name, object_name, upload_id)
+
+    def presigned_get_url(self, bucket_name: str, object_name: str, expires: timedelta = timedelta(minutes=15)) -> str:
+        """Get a short-lived URL for reading an object"""
+        return self.client.presigned_get_object(bucket_name, object_name, expires=expires)
+
+    def presigned_put_url(self, bucket_name: str, object_name: str, expires: timedelta = timedelta(hours=1)) -> str:
+        """Get a URL the client can PUT the object to directly"""
+        self.ensure_bucket_exists(bucket_name)
+        return self.public_client.presigned_put_object(bucket_name, object_name, expires=expires)
+
+    def stat_object(self, bucket_name: str, object_name: str):
+        """Get object metadata, or None if it does not exist"""
+        try:
+            return self.client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchBucket", "NoSuchObject"):
+                return None
+            raise
+
+    def read_range(self, bucket_name: str, object_name: str, offset: int, length: int) -> bytes:
+        """Read a byte range of an object"""
+        response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    @contextmanager
+    def open_object(self, bucket_name: str, object_name: str):
+        """Open an object as a file-like stream to ``read(size)`` from"""
+        response = self.client.get_object(bucket_name, object_name)
+        try:
+            yield response
+        finally:
+            response.close()
+            response.release_conn()
+
     def download_file(self, bucket_name: str, object_name: str, file_path: str):
         """Download a file from MinIO"""
         try:
@@ -33,6 +168,14 @@ class MinIOClient:
             print(f"Error downloading from MinIO: {e}")
             raise
 
+    def remove_object(self, bucket_name: str, object_name: str):
+        """Delete an object, missing objects are ignored"""
+        try:
+            self.client.remove_object(bucket_name, object_name)
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchBucket", "NoSuchObject"):
+                raise
+
 
 # Initialize MinIO client
 minio_client = MinIOClient()
@@ -0,0 +1,86 @@
+"""
+Live pipeline progress over Redis pub/sub
+
+Workers publish a snapshot of a recording's progress (status, current stage,
+percentage, message) on every stage transition and progress report. Each
+snapshot replaces the previous one, so a listener only ever needs the latest
+event. The last snapshot is also kept in a key, so a client connecting
+mid-pipeline gets the current state right away.
+
+Keys per recording:
+    progress:<id>           STRING last snapshot (JSON)
+    progress:<id>:events    pub/sub channel of snapshots
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.redis import async_redis_client, redis_client
+
+logger = logging.getLogger(__name__)
+
+# Recording statuses after which nothing more is published
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+# Last snapshots outlive the pipeline by this long
+STATE_TTL_SECONDS = 24 * 60 * 60
+
+
+def state_key(recording_id: int) -> str:
+    return f"progress:{recording_id}"
+
+
+def channel(recording_id: int) -> str:
+    return f"progress:{recording_id}:events"
+
+
+def publish(recording_id: int, snapshot: Dict[str, Any]) -> None:
+    """Store and broadcast a progress snapshot; never raises"""
+    payload = json.dumps({"recording_id": recording_id, "ts": time.time(), **snapshot}, ensure_ascii=False)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(state_key(recording_id), payload, ex=STATE_TTL_SECONDS)
+        pipe.publish(channel(recording_id), payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Publishing progress of recording {recording_id} failed: {e}")
+
+
+async def subscribe(
+    recording_id: int,
+    initial: Optional[Dict[str, Any]] = None,
+    keepalive_seconds: float = 15.0,
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """Yield progress snapshots of a recording until it completes or fails
+
+    Starts with the last published snapshot, or ``initial`` if there is none.
+    Yields None every ``keepalive_seconds`` without news so the caller can
+    keep its connection alive.
+    """
+    pubsub = async_redis_client.pubsub()
+    # Subscribe before reading the last state, so nothing falls in between
+    await pubsub.subscribe(channel(recording_id))
+    try:
+        last = await async_redis_client.get(state_key(recording_id))
+        snapshot = json.loads(last) if last else initial
+        if snapshot is not None:
+            yield snapshot
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive_seconds)
+            if message is None:
+                yield None
+                continue
+            snapshot = json.loads(message["data"])
+            yield snapshot
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        try:
+            await asyncio.shield(pubsub.aclose())
+        except Exception as e:
+            logger.warning(f"Closing progress subscription of recording {recording_id} failed: {e}")
@@ -1,3 +1,7 @@
+import hashlib
+import json
+from typing import Any, Dict
+
 from app.schemas.recording import RecordingUpdate
 from app.models.recording import Recording
 
@@ -10,3 +14,9 @@ def apply_recording_update(recording: Recording, update: RecordingUpdate) -> Non
             setattr(recording, field, value if value is not None else None)
         else:
             setattr(recording, field, value)
+
+
+def pipeline_fingerprint(params: Dict[str, Any]) -> str:
+    """Stable hash of the parameters that shape a recording's transcript and summary"""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,207 @@
+"""
+Resilience layer for outbound AI calls: timeouts, retries, circuit breaking
+
+Every call to an AI backend goes through ``call_backend``:
+
+- a timeout, scaled by audio length for transcription backends, so a hung
+  upstream cannot hold a worker forever;
+- retries with jittered exponential backoff on transient errors (timeouts,
+  connection errors, 429/5xx); these calls are idempotent;
+- a circuit breaker shared through Redis. After repeated transient failures
+  the backend is considered down and calls fail fast with
+  ``BackendUnavailable`` until a cooldown passes and one probe call succeeds.
+  Celery tasks requeue themselves on ``BackendUnavailable`` instead of
+  failing the recording;
+- the cluster-wide concurrency slot from ``app.utils.limiter``, held per
+  attempt so backoff sleeps do not keep a slot busy.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import aiohttp
+import httpx
+import requests
+
+from app.core.config import settings
+from app.core.redis import async_redis_client
+from app.utils import metrics
+from app.utils.limiter import backend_slot
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackendUnavailable(Exception):
+    """The backend's circuit is open; retry after ``retry_after`` seconds"""
+
+    def __init__(self, backend: str, retry_after: float) -> None:
+        super().__init__(f"{backend} backend unavailable, retry in {retry_after:.0f}s")
+        self.backend = backend
+        self.retry_after = retry_after
+
+
+def audio_timeout(duration: Optional[float]) -> float:
+    """Timeout for transcribing ``duration`` seconds of audio"""
+    if not duration:
+        return settings.ai_timeout_max_seconds
+    timeout = settings.ai_timeout_base_seconds + duration * settings.ai_timeout_realtime_factor
+    return min(timeout, settings.ai_timeout_max_seconds)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Errors worth retrying and counting against the backend's health"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, httpx.TransportError)):
+        return True
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status = None
+    if isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    elif isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    elif isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    return status is not None and (status == 429 or status >= 500)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (1-based)"""
+    return random.uniform(0, min(settings.ai_retry_base_seconds * 2**attempt, 60))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with its state in Redis
+
+    Keys:
+        breaker:<name>        HASH failures, opened_until
+        breaker:<name>:probe  set while one half-open probe call is in flight
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.key = f"breaker:{name}"
+        self.probe_key = f"breaker:{name}:probe"
+
+    async def before_call(self) -> bool:
+        """Raise ``BackendUnavailable`` while the circuit is open
+
+        Returns True when the call is the half-open probe.
+        """
+        try:
+            opened_until = await async_redis_client.hget(self.key, "opened_until")
+            if opened_until is None:
+                return False
+            remaining = float(opened_until) - time.time()
+            # Cooldown over: half-open, let exactly one probe through
+            if remaining <= 0 and await async_redis_client.set(self.probe_key, 1, nx=True, ex=int(settings.breaker_cooldown_seconds)):
+                return True
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {e}")
+            return False
+        await metrics.aincr(f"breaker.{self.name}.rejected")
+        raise BackendUnavailable(self.name, max(remaining, 1.0))
+
+    @asynccontextmanager
+    async def guard(self):
+        """Around one call: check the circuit, then record how the call went
+
+        A transient error counts as a failure; success and any other error
+        (the backend answered) as a success. A call abandoned midway, e.g.
+        cancelled or a stream closed early, records nothing but still frees
+        the probe, so the next caller can probe instead of waiting out the
+        probe key's expiry.
+        """
+        probing = await self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_transient(e):
+                await self.record_failure()
+            else:
+                await self.record_success()
+            raise
+        except BaseException:
+            if probing:
+                await self.release_probe()
+            raise
+        await self.record_success()
+
+    async def release_probe(self) -> None:
+        try:
+            await async_redis_client.delete(self.probe_key)
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {e}")
+
+    async def record_success(self) -> None:
+        try:
+            await async_redis_client.delete(self.key, self.probe_key)
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {e}")
+
+    async def record_failure(self) -> None:
+        try:
+            async with async_redis_client.pipeline(transaction=True) as pipe:
+                pipe.hincrby(self.key, "failures", 1)
+                pipe.expire(self.key, int(settings.breaker_failure_window_seconds))
+                failures = (await pipe.execute())[0]
+            probing = await async_redis_client.delete(self.probe_key)
+            if failures >= settings.breaker_failure_threshold or probing:
+                opened_until = time.time() + settings.breaker_cooldown_seconds
+                async with async_redis_client.pipeline(transaction=True) as pipe:
+                    pipe.hset(self.key, "opened_until", opened_until)
+                    pipe.expire(self.key, int(settings.breaker_cooldown_seconds + settings.breaker_failure_window_seconds))
+                    await pipe.execute()
+                await metrics.aincr(f"breaker.{self.name}.opened")
+                logger.warning(f"Circuit for {self.name} opened for {settings.breaker_cooldown_seconds:.0f}s after {failures} failures")
+        except Exception as e:
+            logger.warning(f"Circuit breaker {self.name} unavailable: {e}")
+
+
+_breakers = {}
+
+
+def get_breaker(backend: str) -> CircuitBreaker:
+    if backend not in _breakers:
+        _breakers[backend] = CircuitBreaker(backend)
+    return _breakers[backend]
+
+
+async def call_backend(
+    backend: str,
+    call: Callable[[], Awaitable[T]],
+    timeout: float,
+    retries: Optional[int] = None,
+) -> T:
+    """Run ``call`` against ``backend`` with timeout, retries and circuit breaking"""
+    breaker = get_breaker(backend)
+    retries = settings.ai_retries if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            async with breaker.guard():
+                async with backend_slot(backend):
+                    return await asyncio.wait_for(call(), timeout)
+        except Exception as e:
+            if not is_transient(e) or attempt == retries:
+                raise
+            delay = backoff_delay(attempt + 1)
+            logger.warning(f"{backend} call failed ({type(e).__name__}: {e}), retry {attempt + 1}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def stream_backend(backend: str, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+    """Relay a streamed response from ``backend`` under its breaker and concurrency slot
+
+    Not retried: part of the output may already have reached the client.
+    """
+    async with get_breaker(backend).guard():
+        async with backend_slot(backend):
+            async for item in open_stream():
+                yield item
@@ -0,0 +1,176 @@
+"""
+Stream helpers for moving uploads without buffering whole files
+"""
+
+import asyncio
+import hashlib
+from typing import BinaryIO, Dict, List, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class HashingReader:
+    """File-like wrapper that hashes and counts bytes as they are read.
+
+    MinIO pulls data through ``read(size)`` one part at a time, so wrapping the
+    upload stream lets us get the size and digest of the object in the same
+    pass that ships it, without keeping more than one part in memory.
+
+    The first ``head_size`` and last ``tail_size`` bytes are kept as well so
+    container headers can be probed without reading the object back.
+    """
+
+    def __init__(self, stream: BinaryIO, head_size: int = 0, tail_size: int = 0) -> None:
+        self.stream = stream
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._head_size = head_size
+        self._tail_size = tail_size
+        self._head = bytearray()
+        self._tail = b""
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        if chunk:
+            self.size += len(chunk)
+            self._sha256.update(chunk)
+            if len(self._head) < self._head_size:
+                self._head.extend(chunk[: self._head_size - len(self._head)])
+            if self._tail_size:
+                self._tail = (self._tail + chunk[-self._tail_size :])[-self._tail_size :]
+        return chunk
+
+    @property
+    def head(self) -> bytes:
+        return bytes(self._head)
+
+    @property
+    def tail(self) -> bytes:
+        return self._tail
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+
+class ChunkQueueReader:
+    """File-like ``read(size)`` over byte chunks produced on an event loop
+
+    Lets a blocking consumer in a worker thread (the MinIO client) pull a
+    request body while the event loop is still receiving it. The bounded
+    queue keeps only a few chunks in memory and holds the producer back
+    when the consumer is slower.
+    """
+
+    _EOF = object()
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int = 64) -> None:
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(max_chunks)
+        self._buffer = bytearray()
+        self._eof = False
+        self._error: Optional[BaseException] = None
+
+    async def put(self, chunk: bytes) -> None:
+        if chunk:
+            await self._queue.put(chunk)
+
+    async def finish(self) -> None:
+        """End of the stream"""
+        await self._queue.put(self._EOF)
+
+    def abort(self, error: BaseException) -> None:
+        """Make the consumer's next read raise ``error``; never blocks (call on the loop)"""
+        self._error = error
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(self._EOF)
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            item = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+            if self._error is not None:
+                raise self._error
+            if item is self._EOF:
+                self._eof = True
+            else:
+                self._buffer.extend(item)
+        n = len(self._buffer) if size < 0 else min(size, len(self._buffer))
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+
+class MultipartFileParser:
+    """Incremental multipart/form-data parser that passes one file field through
+
+    Fed the request body as it arrives, it returns the bytes of the field
+    named ``field_name`` and discards everything else, so an upload never has
+    to be spooled to disk the way ``UploadFile`` is.
+    """
+
+    def __init__(self, content_type: str, field_name: str = "file") -> None:
+        mime, params = parse_options_header(content_type)
+        if mime != b"multipart/form-data" or not params.get(b"boundary"):
+            raise ValueError("Expected a multipart/form-data body")
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        # The file part's headers are parsed and its data starts
+        self.started = False
+        self.finished = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+        self._chunks: List[bytes] = []
+        self._parser = MultipartParser(
+            params[b"boundary"],
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Parse the next piece of the body; returns the file bytes it contained"""
+        self._parser.write(data)
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        if name != self.field_name or self.started or b"filename" not in params:
+            return
+        self._in_file = self.started = True
+        self.filename = params[b"filename"].decode("utf-8", "replace")
+        content_type = self._headers.get(b"content-type")
+        self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._chunks.append(bytes(data[start:end]))
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self.finished = True
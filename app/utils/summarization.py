@@ -0,0 +1,208 @@
+"""
+Map-reduce summarization of long transcripts
+
+The transcript is cut into windows of whole speaker turns, each window is
+summarized on its own (concurrently), and the partial summaries are reduced
+into the final meeting note, in several rounds if they are still too long
+for one request. Reduce requests carry their own prompt telling the model
+that its input is a set of partial notes to merge, not a transcript.
+
+Window boundaries are content-defined: a turn closes a window when the
+window is at least half full and the turn's hash says so, or when the next
+turn would not fit. An edit therefore only moves the boundaries around the
+edited turns, and the partial summaries of the other windows, cached in
+Redis by content, are reused.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.redis import async_redis_client
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SummarizeFn = Callable[[str], Awaitable[str]]
+
+_CACHE_PREFIX = "summary:partial:v1:"
+# On average one turn in this many closes a window once it is half full
+_BOUNDARY_DIVISOR = 4
+# How the partial summaries are framed for a reduce round
+REDUCE_TEMPLATE = "[Phần {index}/{total}]\n{partial}"
+REDUCE_PROMPT = """Below are the meeting notes of {total} consecutive parts of one meeting, in order. They are partial notes written from the transcript of each part, not a transcript.
+Merge them into a single meeting note for the whole meeting, in the same language and format as the notes. Keep every decision, task, owner, deadline and number; merge items that appear in several parts; drop repetition. Do not add anything the notes do not say.
+
+{notes}
+"""
+
+
+def transcript_turns(transcription: Any) -> List[str]:
+    """Transcription as "SPEAKER: text" turns, consecutive segments of a speaker merged"""
+    if isinstance(transcription, dict):
+        transcription = transcription.get("segments") or transcription.get("transcript") or transcription.get("text") or ""
+    if isinstance(transcription, str):
+        return [line.strip() for line in transcription.split("\n") if line.strip()]
+
+    turns: List[str] = []
+    previous = None
+    for segment in transcription or []:
+        if not isinstance(segment, dict):
+            text, speaker = str(segment).strip(), None
+        else:
+            text = str(segment.get("sentence") or segment.get("text") or "").strip()
+            speaker = segment.get("speaker")
+        if not text:
+            continue
+        if turns and speaker is not None and speaker == previous:
+            turns[-1] += " " + text
+        else:
+            turns.append(f"{speaker}: {text}" if speaker else text)
+        previous = speaker
+    return turns
+
+
+def _split_long(turn: str, max_chars: int) -> List[str]:
+    """Split a turn longer than a window at word boundaries"""
+    pieces, current = [], ""
+    for word in turn.split(" "):
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _closes_window(turn: str) -> bool:
+    return int(hashlib.sha1(turn.encode("utf-8")).hexdigest()[:8], 16) % _BOUNDARY_DIVISOR == 0
+
+
+def plan_windows(turns: List[str], max_chars: int) -> List[str]:
+    """Group turns into windows of at most ``max_chars`` characters"""
+    windows: List[str] = []
+    current: List[str] = []
+    size = 0
+    for turn in (piece for turn in turns for piece in _split_long(turn, max_chars)):
+        if current and size + len(turn) + 1 > max_chars:
+            windows.append("\n".join(current))
+            current, size = [], 0
+        current.append(turn)
+        size += len(turn) + 1
+        if size >= max_chars // 2 and _closes_window(turn):
+            windows.append("\n".join(current))
+            current, size = [], 0
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+def _cache_key(text: str, namespace: str) -> str:
+    return _CACHE_PREFIX + hashlib.sha256(f"{namespace}\n{text}".encode("utf-8")).hexdigest()
+
+
+async def _summarize_cached(text: str, summarize: SummarizeFn, namespace: str, stats: Dict[str, int]) -> str:
+    key = _cache_key(text, namespace)
+    try:
+        cached = await async_redis_client.get(key)
+    except Exception as e:
+        logger.warning(f"Summary cache unavailable: {e}")
+        cached = None
+    if cached is not None:
+        stats["cached"] += 1
+        await metrics.aincr("summary.partial.hit")
+        return cached
+
+    summary = await summarize(text)
+    stats["summarized"] += 1
+    await metrics.aincr("summary.partial.miss")
+    if summary:
+        try:
+            await async_redis_client.set(key, summary, ex=settings.summary_partial_ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Summary cache unavailable: {e}")
+    return summary
+
+
+def _reduce_input(partials: List[str]) -> str:
+    notes = "\n\n".join(REDUCE_TEMPLATE.format(index=i, total=len(partials), partial=partial) for i, partial in enumerate(partials, 1))
+    return REDUCE_PROMPT.format(total=len(partials), notes=notes)
+
+
+def plan_signature() -> str:
+    """Hash of what shapes a map-reduce summary besides the transcript and the summarizer
+
+    The window size and boundary rule decide what each request sees, the
+    reduce prompt and template how partials are combined.
+    """
+    plan = [settings.summary_window_chars, _BOUNDARY_DIVISOR, REDUCE_TEMPLATE, REDUCE_PROMPT]
+    return hashlib.sha256(json.dumps(plan, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+async def summarize_transcript(
+    transcription: Any,
+    summarize: SummarizeFn,
+    reduce: SummarizeFn,
+    namespace: str = "",
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Summarize a transcription window by window, then reduce the partials
+
+    Args:
+        transcription: Stored transcription (segments list, dict or text)
+        summarize: Coroutine turning a transcript window into a meeting note
+        reduce: Coroutine turning a reduce prompt (partial notes) into one note
+        namespace: Identifies the summarizer in cache keys (endpoint, prompt, ...)
+        progress: Optional callback(done, total) as windows finish, run in a thread
+
+    Returns:
+        ``summary`` plus counts of ``windows``, ``rounds`` and ``cached`` /
+        ``summarized`` calls.
+    """
+    max_chars = settings.summary_window_chars
+    windows = plan_windows(transcript_turns(transcription), max_chars)
+    stats = {"cached": 0, "summarized": 0}
+    if not windows:
+        return {"summary": "", "windows": 0, "rounds": 0, **stats}
+    if len(windows) == 1:
+        summary = await _summarize_cached(windows[0], summarize, namespace, stats)
+        return {"summary": summary, "windows": 1, "rounds": 1, **stats}
+
+    semaphore = asyncio.Semaphore(max(1, settings.summary_map_concurrency))
+    done = 0
+
+    async def run(text: str) -> str:
+        nonlocal done
+        async with semaphore:
+            partial = await _summarize_cached(text, summarize, namespace, stats)
+        done += 1
+        if progress:
+            # Reporting touches Redis; keep it off the shared worker loop
+            await asyncio.to_thread(progress, done, len(windows))
+        return partial
+
+    logger.info(f"Summarizing transcript in {len(windows)} windows")
+    partials = list(await asyncio.gather(*(run(w) for w in windows)))
+    rounds = 1
+    # Reduce until the partials fit in one request; each round shrinks them
+    while len(partials) > 1 and len(_reduce_input(partials)) > max_chars:
+        groups: List[List[str]] = [[]]
+        for partial in partials:
+            if groups[-1] and len(_reduce_input(groups[-1] + [partial])) > max_chars:
+                groups.append([])
+            groups[-1].append(partial)
+        if len(groups) == len(partials):
+            # Partials too long to pair up; reduce them in pairs regardless
+            groups = [partials[i : i + 2] for i in range(0, len(partials), 2)]
+        partials = list(await asyncio.gather(*(_summarize_cached(_reduce_input(g), reduce, namespace, stats) for g in groups)))
+        rounds += 1
+
+    if len(partials) > 1:
+        partials = [await _summarize_cached(_reduce_input(partials), reduce, namespace, stats)]
+        rounds += 1
+    return {"summary": partials[0], "windows": len(windows), "rounds": rounds, **stats}
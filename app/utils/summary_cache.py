@@ -0,0 +1,96 @@
+"""
+Persistent cache of final meeting notes
+
+Keyed on everything the summary depends on: the transcript, the summarizer
+as the pipeline calls it (a hash of its endpoint and request template, the
+mode and, for map-reduce, the windowing and reduce template) and
+SUMMARY_MODEL_VERSION, to be bumped when the model behind the endpoint
+changes. Entries expire after SUMMARY_CACHE_TTL_DAYS, and the maintenance
+beat evicts the least recently used ones once the cache grows past
+SUMMARY_CACHE_MAX_MB.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pytz import timezone
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import SummaryCache
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def now() -> datetime:
+    return datetime.now(timezone("Asia/Ho_Chi_Minh"))
+
+
+def cache_key(transcription: Optional[str], summarizer: str) -> str:
+    inputs = [transcription or "", summarizer, settings.summary_model_version]
+    return hashlib.sha256(json.dumps(inputs, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def get(db: Session, key: str) -> Optional[str]:
+    """Cached summary for ``key``, or None; counts the hit or miss"""
+    entry = db.query(SummaryCache).filter(SummaryCache.cache_key == key).first()
+    if entry is not None and entry.expires_at is not None and _aware(entry.expires_at) <= now():
+        db.delete(entry)
+        entry = None
+    if entry is None:
+        metrics.incr("summary.cache.miss")
+        return None
+    entry.hits += 1
+    entry.last_used_at = now()
+    metrics.incr("summary.cache.hit")
+    return entry.summary
+
+
+def put(db: Session, key: str, summary: str) -> None:
+    """Store a summary; flushed in a savepoint, committed with the caller's transaction"""
+    if not summary:
+        return
+    try:
+        with db.begin_nested():
+            db.add(
+                SummaryCache(
+                    cache_key=key,
+                    summary=summary,
+                    size=len(summary.encode("utf-8")),
+                    hits=0,
+                    last_used_at=now(),
+                    expires_at=now() + timedelta(days=settings.summary_cache_ttl_days),
+                )
+            )
+    except IntegrityError:
+        # Stored meanwhile by another worker summarizing the same input
+        pass
+
+
+def prune(db: Session) -> int:
+    """Drop expired entries, then the least recently used beyond the size limit"""
+    removed = db.query(SummaryCache).filter(SummaryCache.expires_at <= now()).delete(synchronize_session=False)
+    excess = (db.query(func.sum(SummaryCache.size)).scalar() or 0) - settings.summary_cache_max_mb * 1024 * 1024
+    if excess > 0:
+        ids = []
+        for entry_id, size in db.query(SummaryCache.id, SummaryCache.size).order_by(SummaryCache.last_used_at).yield_per(500):
+            ids.append(entry_id)
+            excess -= size
+            if excess <= 0:
+                break
+        for start in range(0, len(ids), 500):
+            db.query(SummaryCache).filter(SummaryCache.id.in_(ids[start : start + 500])).delete(synchronize_session=False)
+        removed += len(ids)
+    db.commit()
+    return removed
+
+
+def _aware(value: datetime) -> datetime:
+    # MySQL DATETIME comes back naive, in the timezone it was written in
+    return value if value.tzinfo else value.replace(tzinfo=now().tzinfo)
@@ -2,6 +2,7 @@
 Text processing utilities
 """
 
+import json
 import re
 import markdown
 from typing import Optional
@@ -49,6 +50,24 @@ def format_transcription_for_llm(transcription: str, speaker_map: Optional[dict]
     return transcription
 
 
+def format_transcript_turns(transcription: str) -> str:
+    """Stored transcription as "SPEAKER: text" turns, consecutive sentences merged
+
+    Transcriptions that are not a list of speaker segments are returned as is.
+    """
+    try:
+        segments = json.loads(transcription.replace("'", '"'))
+        formatted = f"{segments[0]['speaker']}:{segments[0]['sentence']}"
+        for previous, turn in zip(segments, segments[1:]):
+            if turn["speaker"] == previous["speaker"]:
+                formatted += " " + turn["sentence"]
+            else:
+                formatted += f"\n\n{turn['speaker']}:{turn['sentence']}"
+        return formatted
+    except Exception:
+        return transcription
+
+
 def clean_text(text: str) -> str:
     """Clean and normalize text"""
     if not text:
@@ -0,0 +1,188 @@
+"""
+Voice activity detection and silence trimming for the ASR pipeline
+
+Audio is decoded to 16-bit mono PCM with ffmpeg and streamed through in
+blocks, so memory stays bounded for multi-hour recordings. Speech frames are
+found with vectorized short-time energy and zero-crossing analysis, then a
+speech-only WAV is written together with an offset map that translates
+timestamps on the trimmed audio back to the original timeline.
+"""
+
+import bisect
+import subprocess
+import wave
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+FRAME_MS = 30
+# Frames decoded per block, ~1 minute of audio
+BLOCK_FRAMES = 2000
+
+
+@dataclass
+class VadResult:
+    # (start_s, end_s) speech regions on the original timeline
+    regions: List[Tuple[float, float]]
+    # (trimmed_start_s, original_start_s, duration_s) for each kept region
+    offset_map: List[Tuple[float, float, float]] = field(default_factory=list)
+    original_duration: float = 0.0
+    speech_duration: float = 0.0
+
+    @property
+    def removed_ratio(self) -> float:
+        if not self.original_duration:
+            return 0.0
+        return max(0.0, 1.0 - self.speech_duration / self.original_duration)
+
+
+def _iter_pcm_blocks(path: str, sample_rate: int, block_samples: int) -> Iterator[np.ndarray]:
+    proc = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            data = proc.stdout.read(block_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[: len(data) - len(data) % 2], dtype=np.int16)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {path} (exit {returncode})")
+
+
+def _frame_features(block: np.ndarray, frame_len: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and zero-crossing rate for one block"""
+    n_frames = -(-len(block) // frame_len)
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[: len(block)] = block
+    frames = padded.reshape(n_frames, frame_len) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(frames**2, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr
+
+
+def _runs(mask: np.ndarray, value: bool) -> List[Tuple[int, int]]:
+    """[start, end) index ranges where mask == value"""
+    target = mask if value else ~mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], target, [False])).astype(np.int8)))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def detect_speech(energy_db: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+    """Boolean speech mask per frame"""
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    # Adaptive threshold above the noise floor, never below an absolute minimum
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + settings.vad_threshold_db, settings.vad_min_energy_db)
+    # Quieter frames still count if they look like fricatives (high zero-crossing rate)
+    speech = (energy_db > threshold) | ((energy_db > threshold - 6.0) & (zcr > 0.25))
+
+    # Pad every speech frame on both sides so word onsets/tails are kept
+    pad = max(1, settings.vad_padding_ms // FRAME_MS)
+    speech = np.convolve(speech.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+
+    # Only cut silences long enough to be worth removing
+    min_silence = max(1, settings.vad_min_silence_ms // FRAME_MS)
+    for start, end in _runs(speech, False):
+        if end - start < min_silence and start > 0 and end < len(speech):
+            speech[start:end] = True
+    return speech
+
+
+def trim_silence(src_path: str, dst_path: str, sample_rate: int = 16000) -> VadResult:
+    """Write the speech-only part of ``src_path`` to a WAV at ``dst_path``"""
+    frame_len = sample_rate * FRAME_MS // 1000
+    block_samples = BLOCK_FRAMES * frame_len
+
+    # Pass 1: frame features
+    energies, zcrs = [], []
+    total_samples = 0
+    for block in _iter_pcm_blocks(src_path, sample_rate, block_samples):
+        energy_db, zcr = _frame_features(block, frame_len)
+        energies.append(energy_db)
+        zcrs.append(zcr)
+        total_samples += len(block)
+    energy_db = np.concatenate(energies) if energies else np.zeros(0)
+    zcr = np.concatenate(zcrs) if zcrs else np.zeros(0)
+    speech = detect_speech(energy_db, zcr)
+
+    frame_s = frame_len / sample_rate
+    original_duration = total_samples / sample_rate
+    regions = [(start * frame_s, min(end * frame_s, original_duration)) for start, end in _runs(speech, True)]
+    offset_map = []
+    trimmed = 0.0
+    for start, end in regions:
+        offset_map.append((trimmed, start, end - start))
+        trimmed += end - start
+    result = VadResult(regions=regions, offset_map=offset_map, original_duration=original_duration, speech_duration=trimmed)
+
+    # Pass 2: write the speech frames
+    with wave.open(dst_path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        frame_offset = 0
+        for block in _iter_pcm_blocks(src_path, sample_rate, block_samples):
+            n_frames = -(-len(block) // frame_len)
+            keep = np.repeat(speech[frame_offset : frame_offset + n_frames], frame_len)[: len(block)]
+            out.writeframes(block[keep].tobytes())
+            frame_offset += n_frames
+    return result
+
+
+def silence_cut_points(result: VadResult, trimmed: bool) -> List[float]:
+    """Times between speech regions, on the trimmed or the original timeline"""
+    if trimmed:
+        return [entry[0] for entry in result.offset_map[1:]]
+    return [(prev_end + next_start) / 2 for (_, prev_end), (next_start, _) in zip(result.regions, result.regions[1:])]
+
+
+def to_original_time(t: float, offset_map: List[Tuple[float, float, float]]) -> float:
+    """Map a timestamp on the trimmed audio back to the original recording"""
+    if not offset_map:
+        return t
+    starts = [entry[0] for entry in offset_map]
+    i = max(bisect.bisect_right(starts, t) - 1, 0)
+    trimmed_start, original_start, duration = offset_map[i]
+    return original_start + min(max(t - trimmed_start, 0.0), duration)
+
+
+def remap_timestamps(transcript: Any, offset_map: List[Tuple[float, float, float]]) -> Any:
+    """Rewrite ``start``/``end`` of transcript segments onto the original timeline"""
+    if not offset_map or not isinstance(transcript, list):
+        return transcript
+    for segment in transcript:
+        if isinstance(segment, dict):
+            for key in ("start", "end"):
+                if isinstance(segment.get(key), (int, float)):
+                    segment[key] = round(to_original_time(float(segment[key]), offset_map), 3)
+    return transcript
+
+
+def offset_map_to_json(result: VadResult) -> Dict[str, Any]:
+    return {
+        "original_duration": result.original_duration,
+        "speech_duration": result.speech_duration,
+        "removed_ratio": result.removed_ratio,
+        "offset_map": result.offset_map,
+    }
+
+
+def vad_result_from_json(data: Dict[str, Any]) -> VadResult:
+    offset_map = [tuple(entry) for entry in data.get("offset_map", [])]
+    return VadResult(
+        regions=[(original_start, original_start + duration) for _, original_start, duration in offset_map],
+        offset_map=offset_map,
+        original_duration=data.get("original_duration", 0.0),
+        speech_duration=data.get("speech_duration", 0.0),
+    )
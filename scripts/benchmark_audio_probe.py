@@ -0,0 +1,84 @@
+"""
+Benchmark in-process header probing against the ffprobe subprocess
+
+Usage:
+    python -m scripts.benchmark_audio_probe [audio_file ...] [--runs N]
+
+Without files, a 10 minute 48 kHz stereo WAV is generated in a temp dir.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import wave
+
+from app.utils.audio_meta import HEAD_BYTES, TAIL_BYTES, ffprobe_duration, probe_audio_header
+
+
+def _make_wav(path: str, seconds: int = 600) -> None:
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(48000)
+        silence = b"\0" * 48000 * 4
+        for _ in range(seconds):
+            w.writeframes(silence)
+
+
+def _header_probe(path: str):
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+        f.seek(max(size - TAIL_BYTES, 0))
+        tail = f.read(TAIL_BYTES)
+
+    def read_range(offset: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    return probe_audio_header(head, tail, size, read_range)
+
+
+def _time(fn, path: str, runs: int):
+    result = fn(path)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(path)
+    return result, (time.perf_counter() - start) / runs * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    files = args.files
+    if not files:
+        tmp_dir = tempfile.mkdtemp()
+        files = [os.path.join(tmp_dir, "sample.wav")]
+        _make_wav(files[0])
+
+    has_ffprobe = shutil.which("ffprobe") is not None
+    try:
+        for path in files:
+            info, header_ms = _time(_header_probe, path, args.runs)
+            print(f"{os.path.basename(path)}")
+            print(f"  header : {header_ms:8.3f} ms/probe -> {info}")
+            if has_ffprobe:
+                duration, ffprobe_ms = _time(ffprobe_duration, path, args.runs)
+                print(f"  ffprobe: {ffprobe_ms:8.3f} ms/probe -> duration={duration}")
+                print(f"  speedup: {ffprobe_ms / header_ms:8.1f}x")
+            else:
+                print("  ffprobe: not installed, skipped")
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
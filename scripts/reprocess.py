@@ -0,0 +1,81 @@
+"""
+Bulk reprocessing of existing recordings from the command line
+
+Usage:
+    python -m scripts.reprocess create --from-stage summarize [--user ID]
+        [--since 2025-01-01] [--until 2025-06-30] [--status COMPLETED]
+        [--rate 10] [--max-in-flight 10]
+    python -m scripts.reprocess list
+    python -m scripts.reprocess show BATCH_ID
+    python -m scripts.reprocess {pause,resume,cancel} BATCH_ID
+
+--from-stage fetch re-transcribes, index re-indexes and summarize
+re-summarizes; the stages after it run again too. The batch is worked off by
+the Celery beat (advance_reprocess_batches_task), same as batches created
+through POST /admin/reprocess.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.core.database import SessionLocal
+from app.schemas.admin import ReprocessBatchCreate
+from app.services import reprocess_service
+
+
+def _print(batch) -> None:
+    print(f"#{batch.id} {batch.status:<9} from {batch.from_stage:<9} {batch.enqueued}/{batch.total} queued, {batch.skipped} skipped, {batch.in_flight} in flight, {batch.completed} completed, {batch.failed} failed filters={batch.filters}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="start a new batch")
+    create.add_argument("--from-stage", required=True, choices=["fetch", "index", "summarize"])
+    create.add_argument("--user", type=int, help="only this user's recordings")
+    create.add_argument("--since", type=datetime.fromisoformat, help="created at or after (ISO date)")
+    create.add_argument("--until", type=datetime.fromisoformat, help="created at or before (ISO date)")
+    create.add_argument("--status", help="only recordings in this status, e.g. COMPLETED")
+    create.add_argument("--rate", type=int, default=10, help="recordings queued per minute")
+    create.add_argument("--max-in-flight", type=int, default=10, help="recordings processing at once")
+
+    commands.add_parser("list", help="list batches")
+    for name in ("show", "pause", "resume", "cancel"):
+        command = commands.add_parser(name, help=f"{name} a batch")
+        command.add_argument("batch_id", type=int)
+
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.command == "create":
+            payload = ReprocessBatchCreate(
+                from_stage=args.from_stage,
+                user_id=args.user,
+                created_from=args.since,
+                created_to=args.until,
+                status=args.status,
+                rate_per_minute=args.rate,
+                max_in_flight=args.max_in_flight,
+            )
+            _print(reprocess_service.create_batch(db, payload))
+        elif args.command == "list":
+            for batch in reprocess_service.get_batches(db):
+                _print(batch)
+        elif args.command == "show":
+            _print(reprocess_service.get_batch(db, args.batch_id))
+        else:
+            _print(reprocess_service.set_batch_state(db, args.batch_id, args.command))
+    except HTTPException as e:
+        print(f"error: {e.detail}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import io
+import struct
+import wave
+
+import pytest
+
+from app.utils.audio_meta import BufferedSource, probe_audio_header
+
+
+def make_wav(seconds: float, sample_rate: int = 16000, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * channels * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def box(box_type: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+
+def test_wav():
+    info = probe_audio_header(make_wav(2.5, sample_rate=8000, channels=2))
+
+    assert (info.format, info.sample_rate, info.channels) == ("wav", 8000, 2)
+    assert info.duration == pytest.approx(2.5)
+
+
+def test_streamed_wav_without_data_size_uses_file_size():
+    data = bytearray(make_wav(1.0))
+    data[40:44] = struct.pack("<I", 0xFFFFFFFF)
+
+    assert probe_audio_header(bytes(data)).duration == pytest.approx(1.0)
+
+
+def test_wav_duration_from_head_only():
+    data = make_wav(60.0)
+
+    info = probe_audio_header(data[:4096], total_size=len(data))
+
+    assert info.duration == pytest.approx(60.0)
+
+
+def test_flac_streaminfo():
+    sample_rate, channels, samples = 44100, 2, 44100 * 3
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | samples
+    head = b"fLaC" + b"\x80\x00\x00\x22" + b"\x00" * 10 + packed.to_bytes(8, "big") + b"\x00" * 16
+
+    info = probe_audio_header(head)
+
+    assert (info.format, info.sample_rate, info.channels) == ("flac", 44100, 2)
+    assert info.duration == pytest.approx(3.0)
+
+
+def test_cbr_mp3_duration_from_file_size():
+    # MPEG-1 layer III, 128 kbps, 44.1 kHz, joint stereo
+    frame = b"\xff\xfb\x90\x44" + b"\x00" * 413
+    data = frame * 100
+
+    info = probe_audio_header(data[:1024], total_size=len(data))
+
+    assert (info.format, info.sample_rate, info.channels) == ("mp3", 44100, 2)
+    assert info.duration == pytest.approx(len(data) * 8 / 128000)
+
+
+def test_vbr_mp3_uses_xing_frame_count():
+    # ID3v2 tag, then a mono MPEG-1 frame whose Xing header says 1000 frames
+    id3 = b"ID3\x03\x00\x00" + bytes([0, 0, 0, 20]) + b"\x00" * 20
+    frame = b"\xff\xfb\x90\xc4" + b"\x00" * 17 + b"Xing" + struct.pack(">II", 1, 1000) + b"\x00" * 100
+
+    info = probe_audio_header(id3 + frame, total_size=10_000_000)
+
+    assert info.channels == 1
+    assert info.duration == pytest.approx(1000 * 1152 / 44100)
+
+
+def test_mp4_with_moov_at_the_end_reads_the_range():
+    mvhd = box(b"mvhd", b"\x00" * 12 + struct.pack(">II", 1000, 90_500) + b"\x00" * 80)
+    entry = struct.pack(">I4s", 36, b"mp4a") + b"\x00" * 16 + struct.pack(">HHI", 1, 16, 0) + struct.pack(">I", 48000 << 16)
+    stsd = box(b"stsd", b"\x00" * 4 + struct.pack(">I", 1) + entry)
+    moov = box(b"moov", mvhd + box(b"trak", box(b"mdia", box(b"minf", box(b"stbl", stsd)))))
+    data = box(b"ftyp", b"M4A \x00\x00\x00\x00") + box(b"mdat", b"\x00" * 500_000) + moov
+    source = BufferedSource(data, total_size=len(data))
+
+    info = probe_audio_header(data[:1024], total_size=len(data), read_range=source.read)
+
+    assert (info.format, info.sample_rate, info.channels) == ("m4a", 48000, 1)
+    assert info.duration == pytest.approx(90.5)
+
+
+def test_ogg_opus_duration_from_last_page():
+    opus_head = b"OpusHead" + bytes([1, 2]) + struct.pack("<HI", 312, 16000) + b"\x00\x00\x00"
+    head = b"OggS" + b"\x00" * 22 + bytes([1, len(opus_head)]) + opus_head
+    tail = b"\x00" * 50 + b"OggS\x00\x04" + struct.pack("<q", 48000 * 10 + 312) + b"\x00" * 20
+
+    info = probe_audio_header(head, tail=tail, total_size=1_000_000)
+
+    assert (info.format, info.sample_rate, info.channels) == ("ogg", 16000, 2)
+    assert info.duration == pytest.approx(10.0)
+
+
+def test_webm_without_duration_leaves_it_to_ffprobe():
+    ebml_header = b"\x1a\x45\xdf\xa3\x80"
+    audio = b"\xe1\x86" + b"\xb5\x84" + struct.pack(">f", 48000.0)
+    segment = b"\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff" + b"\x16\x54\xae\x6b\x8a" + b"\xae\x88" + audio
+
+    info = probe_audio_header(ebml_header + segment + b"\x1f\x43\xb6\x75\x80")
+
+    assert (info.format, info.sample_rate, info.duration) == ("webm", 48000, None)
+
+
+@pytest.mark.parametrize("head", [b"", b"not audio at all", b"RIFF\x00\x00\x00\x00WAVEfmt ", b"fLaC\x00"])
+def test_unknown_or_truncated_headers(head):
+    info = probe_audio_header(head)
+
+    assert info is None or info.duration is None
@@ -0,0 +1,98 @@
+from app.utils.chunked_transcription import _reconcile, plan_chunks, stitch_transcripts
+
+
+def seg(speaker, sentence, start=0.0, end=1.0):
+    return {"speaker": speaker, "sentence": sentence, "start": start, "end": end}
+
+
+def test_plan_chunks_short_audio_is_one_chunk():
+    assert plan_chunks(300.0, [100.0, 200.0], max_chunk_s=600.0, overlap_s=5.0) == [(0.0, 300.0)]
+    assert plan_chunks(600.0, [], max_chunk_s=600.0, overlap_s=5.0) == [(0.0, 600.0)]
+
+
+def test_plan_chunks_without_cut_points_cuts_hard():
+    chunks = plan_chunks(1500.0, [], max_chunk_s=600.0, overlap_s=5.0)
+
+    assert chunks == [(0.0, 595.0), (590.0, 1190.0), (1185.0, 1500.0)]
+    assert all(end - start <= 600.0 for start, end in chunks)
+
+
+def test_plan_chunks_prefers_latest_silence_in_bounds():
+    # 700 is past the chunk limit and 50 too early to be worth a chunk
+    chunks = plan_chunks(1000.0, [50.0, 400.0, 550.0, 700.0], max_chunk_s=600.0, overlap_s=5.0)
+
+    assert chunks == [(0.0, 550.0), (545.0, 1000.0)]
+
+
+def test_plan_chunks_ignores_cut_points_outside_the_audio():
+    chunks = plan_chunks(900.0, [-10.0, 0.0, 500.0, 900.0, 1200.0], max_chunk_s=600.0, overlap_s=5.0)
+
+    assert chunks == [(0.0, 500.0), (495.0, 900.0)]
+
+
+def test_plan_chunks_covers_the_whole_timeline():
+    chunks = plan_chunks(3600.0, [610.0, 1150.0, 1800.0, 2333.0, 3000.0], max_chunk_s=600.0, overlap_s=5.0)
+
+    assert chunks[0][0] == 0.0
+    assert chunks[-1][1] == 3600.0
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert start == end - 5.0
+
+
+def test_stitch_joins_plain_text():
+    assert stitch_transcripts([(0.0, "hello"), (600.0, ""), (1200.0, "world")]) == "hello\nworld"
+
+
+def test_stitch_shifts_timestamps_onto_the_full_timeline():
+    stitched = stitch_transcripts(
+        [
+            (0.0, [seg("SPEAKER_00", "first part", 1.0, 2.0)]),
+            (595.0, [seg("SPEAKER_00", "second part", 10.0, 12.5)]),
+        ]
+    )
+
+    assert [(s["start"], s["end"]) for s in stitched] == [(1.0, 2.0), (605.0, 607.5)]
+
+
+def test_stitch_drops_duplicated_overlap_and_maps_speakers():
+    first = [
+        seg("SPEAKER_00", "Chào mọi người, hôm nay họp về ngân sách"),
+        seg("SPEAKER_01", "Tôi đã gửi bảng số liệu hôm qua"),
+    ]
+    # The next chunk hears the last sentence again, with its own speaker labels
+    second = [
+        seg("SPEAKER_00", "tôi đã gửi bảng số liệu hôm qua."),
+        seg("SPEAKER_00", "Vậy chúng ta chốt con số cuối tuần"),
+        seg("SPEAKER_01", "Đồng ý"),
+    ]
+
+    stitched = stitch_transcripts([(0.0, first), (595.0, second)])
+
+    assert [s["sentence"] for s in stitched] == [
+        "Chào mọi người, hôm nay họp về ngân sách",
+        "Tôi đã gửi bảng số liệu hôm qua",
+        "Vậy chúng ta chốt con số cuối tuần",
+        "Đồng ý",
+    ]
+    assert [s["speaker"] for s in stitched] == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_01", "SPEAKER_00"]
+
+
+def test_reconcile_without_overlap_keeps_everything():
+    previous = [seg("SPEAKER_00", "một chủ đề hoàn toàn khác")]
+    current = [seg("SPEAKER_00", "nội dung mới"), seg("SPEAKER_01", "câu trả lời")]
+
+    kept, mapping = _reconcile(previous, current, ["SPEAKER_00"])
+
+    assert kept == current
+    assert mapping == {"SPEAKER_00": "SPEAKER_00", "SPEAKER_01": "SPEAKER_01"}
+
+
+def test_reconcile_gives_new_speakers_unused_labels():
+    previous = [seg("SPEAKER_00", "phần trùng lặp ở cuối")]
+    # Locally SPEAKER_01 is the known SPEAKER_00; local SPEAKER_00 is someone new
+    current = [seg("SPEAKER_01", "phần trùng lặp ở cuối"), seg("SPEAKER_00", "người mới nói")]
+
+    kept, mapping = _reconcile(previous, current, ["SPEAKER_00", "SPEAKER_01"])
+
+    assert [s["sentence"] for s in kept] == ["người mới nói"]
+    assert mapping == {"SPEAKER_01": "SPEAKER_00", "SPEAKER_00": "SPEAKER_01"}
@@ -0,0 +1,66 @@
+from app.utils.summarization import plan_windows, transcript_turns
+
+
+def make_turns(count: int):
+    return [f"SPEAKER_{i % 3:02d}: câu nói số {i} trong cuộc họp về kế hoạch quý tới" for i in range(count)]
+
+
+def test_transcript_turns_merges_consecutive_segments_of_a_speaker():
+    segments = [
+        {"speaker": "A", "sentence": "Xin chào"},
+        {"speaker": "A", "sentence": "mọi người"},
+        {"speaker": "B", "text": "Chào anh"},
+        {"speaker": "B", "sentence": "  "},
+        {"speaker": "A", "sentence": "Bắt đầu nhé"},
+    ]
+
+    assert transcript_turns(segments) == ["A: Xin chào mọi người", "B: Chào anh", "A: Bắt đầu nhé"]
+
+
+def test_transcript_turns_accepts_text_and_wrapped_segments():
+    assert transcript_turns("A: một\n\n B: hai \n") == ["A: một", "B: hai"]
+    assert transcript_turns({"segments": [{"sentence": "không rõ người nói"}]}) == ["không rõ người nói"]
+    assert transcript_turns(None) == []
+
+
+def test_plan_windows_empty():
+    assert plan_windows([], 1000) == []
+
+
+def test_plan_windows_short_transcript_is_one_window():
+    turns = make_turns(3)
+
+    assert plan_windows(turns, 10_000) == ["\n".join(turns)]
+
+
+def test_plan_windows_keep_every_turn_in_order_within_the_limit():
+    turns = make_turns(200)
+
+    windows = plan_windows(turns, 1000)
+
+    assert len(windows) > 1
+    assert all(len(window) <= 1000 for window in windows)
+    assert "\n".join(windows).split("\n") == turns
+
+
+def test_plan_windows_split_a_turn_longer_than_a_window():
+    turn = "A: " + " ".join(f"từ{i}" for i in range(500))
+
+    windows = plan_windows([turn], 300)
+
+    assert all(len(window) <= 300 for window in windows)
+    assert " ".join(" ".join(windows).split()) == turn
+
+
+def test_plan_windows_edit_only_moves_nearby_boundaries():
+    turns = make_turns(400)
+    edited = list(turns)
+    edited[200] = "SPEAKER_00: câu này đã được sửa lại"
+
+    before = plan_windows(turns, 1000)
+    after = plan_windows(edited, 1000)
+
+    # Content-defined boundaries resynchronize after the edit, so most windows are unchanged
+    unchanged = set(before) & set(after)
+    assert len(unchanged) >= len(before) - 3
+    assert before[0] == after[0] and before[-1] == after[-1]